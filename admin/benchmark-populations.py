@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Times the tree-structured population classes against each other on the same model, so that the alternative
+trait set backends can be compared with TreeTraitStructurePopulation.  For each class, the semantic rule is
+run for the given number of steps from the same seed, and then the Klemm potential and a population
+snapshot are sampled, and random traits are drawn from each agent as the rules draw them.  Each measurement
+is the best of several repeats.
+
+"""
+
+
+import logging as log
+import argparse
+import time
+import madsenlab.axelrod.utils as utils
+import madsenlab.axelrod.population as pop
+import madsenlab.axelrod.traits as traits
+import madsenlab.axelrod.rules as rules
+import madsenlab.axelrod.analysis as analysis
+
+
+DEFAULT_POPULATIONS = "TreeTraitStructurePopulation,TreeTraitBitsetPopulation,TreeTraitIndexedPopulation,TreeTraitInternedPopulation"
+
+
+def setup():
+    global args
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--debug", help="turn on debugging output")
+    parser.add_argument("--configuration", help="Configuration file for experiment", required=True)
+    parser.add_argument("--popsize", help="Population size", default="400")
+    parser.add_argument("--numtraittrees", help="Number of trait trees in the design space", default="16")
+    parser.add_argument("--branchingfactor", help="Tree branching factor", default="5")
+    parser.add_argument("--depthfactor", help="Tree depth factor", default="5")
+    parser.add_argument("--steps", help="Number of steps of the rule to time", default="20000")
+    parser.add_argument("--samples", help="Number of Klemm potential and snapshot samples to time", default="5")
+    parser.add_argument("--draws", help="Number of random traits to draw from each agent", default="50")
+    parser.add_argument("--repeats", help="Number of times each measurement is repeated", default="2")
+    parser.add_argument("--populations", help="Comma separated population classes to compare", default=DEFAULT_POPULATIONS)
+
+    args = parser.parse_args()
+
+    if args.debug == '1':
+        log.basicConfig(level=log.DEBUG, format='%(asctime)s %(levelname)s: %(message)s')
+    else:
+        log.basicConfig(level=log.INFO, format='%(asctime)s %(levelname)s: %(message)s')
+
+
+def build_model(constructor):
+    simconfig = utils.TreeStructuredConfiguration(args.configuration)
+    simconfig.popsize = int(args.popsize)
+    simconfig.maxtraits = 4
+    simconfig.num_trees = int(args.numtraittrees)
+    simconfig.branching_factor = int(args.branchingfactor)
+    simconfig.depth_factor = int(args.depthfactor)
+    simconfig.learning_rate = 0.2
+    simconfig.loss_rate = 0.01
+    simconfig.innov_rate = 0.01
+    simconfig.periodic = 1
+    simconfig.sim_id = "benchmark"
+    simconfig.random_seed = 1
+    simconfig.seed_random_streams()
+
+    model = constructor(simconfig, pop.SquareLatticeFactory(simconfig),
+                        traits.MultipleBalancedTreeStructuredTraitFactory(simconfig))
+    model.initialize_population()
+    return (simconfig, model, rules.MultipleTreePrerequisitesLearningCopyingRule(model))
+
+
+def time_population(constructor):
+    steps = int(args.steps)
+    samples = int(args.samples)
+    draws = int(args.draws)
+    step_time = None
+    sample_time = None
+    draw_time = None
+    for repeat in range(0, int(args.repeats)):
+        (simconfig, model, rule) = build_model(constructor)
+
+        start = time.time()
+        for timestep in range(1, steps + 1):
+            rule.step(timestep)
+        elapsed = time.time() - start
+        if step_time is None or elapsed < step_time:
+            step_time = elapsed
+
+        start = time.time()
+        for sample in range(0, samples):
+            analysis.klemm_normalized_L_extensible(model, simconfig)
+            analysis.take_population_snapshot(model, simconfig)
+        elapsed = time.time() - start
+        if sample_time is None or elapsed < sample_time:
+            sample_time = elapsed
+
+        agents = [agent_id for agent_id in range(0, model.num_agents) if len(model.agent_traits[agent_id]) > 0]
+        start = time.time()
+        for draw in range(0, draws):
+            for agent_id in agents:
+                model.get_random_agent_trait(agent_id)
+        elapsed = time.time() - start
+        if draw_time is None or elapsed < draw_time:
+            draw_time = elapsed
+
+    return (step_time, sample_time, draw_time)
+
+
+def main():
+    log.info("N=%s trees=%s r=%s h=%s: %s steps, %s samples, %s draws per agent", args.popsize, args.numtraittrees,
+             args.branchingfactor, args.depthfactor, args.steps, args.samples, args.draws)
+    for name in args.populations.split(","):
+        (step_time, sample_time, draw_time) = time_population(getattr(pop, name))
+        log.info("%-30s steps: %7.3fs  samples: %7.3fs  draws: %7.3fs", name, step_time, sample_time, draw_time)
+
+
+if __name__ == "__main__":
+    setup()
+    main()
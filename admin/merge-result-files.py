@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Merges the SQLite or NDJSON files written by simulations run with a file-based result sink (--sink sqlite
+or --sink ndjson) into the experiment's MongoDB collections, or into another result file.
+
+"""
+
+import ming
+import logging as log
+import argparse
+import madsenlab.axelrod.data as data
+
+
+## setup
+
+def setup():
+    global args, config
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--experiment", help="provide name for experiment, to be used as prefix for database collections", required=True)
+    parser.add_argument("--debug", help="turn on debugging output")
+    parser.add_argument("--dbhost", help="database hostname, defaults to localhost", default="localhost")
+    parser.add_argument("--dbport", help="database port, defaults to 27017", default="27017")
+    parser.add_argument("--sink", help="Destination for the merged results, defaults to mongo", choices=data.SINK_TYPES, default="mongo")
+    parser.add_argument("--sinkpath", help="Path of the destination file, for the sqlite and ndjson sinks")
+    parser.add_argument("--sinkbatch", help="Number of results written to the destination together, defaults to 1000", default="1000")
+    parser.add_argument("files", help="Result files to merge", nargs="+")
+
+    args = parser.parse_args()
+
+    if args.debug is not None and int(args.debug) == 1:
+        log.basicConfig(level=log.DEBUG, format='%(asctime)s %(levelname)s: %(message)s')
+    else:
+        log.basicConfig(level=log.INFO, format='%(asctime)s %(levelname)s: %(message)s')
+
+    #### main program ####
+    log.info("MERGE RESULT FILES - Experiment: %s", args.experiment)
+    data.set_experiment_name(args.experiment)
+    data.set_database_hostname(args.dbhost)
+    data.set_database_port(args.dbport)
+    # Ming connects to MongoDB as soon as a document class is used, so it is only configured for the mongo sink
+    if args.sink == 'mongo':
+        config = data.getMingConfiguration(data.modules)
+        ming.configure(**config)
+    data.configure_result_sink(args.sink, args.sinkpath, int(args.sinkbatch))
+
+
+if __name__ == "__main__":
+    setup()
+
+    sink = data.get_result_sink()
+    total = 0
+    for filename in args.files:
+        count = 0
+        for (doc_class, doc) in data.read_result_file(filename, data.document_classes):
+            sink.write(doc_class, doc)
+            count += 1
+        sink.flush()
+        log.info("Merged %s results from %s", count, filename)
+        total += count
+    sink.close()
+
+    log.info("COMPLETE:  %s results merged from %s files", total, len(args.files))
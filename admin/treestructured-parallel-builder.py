@@ -13,6 +13,7 @@ import logging as log
 import argparse
 import itertools
 import madsenlab.axelrod.utils as utils
+import madsenlab.axelrod.data as data
 
 
 
@@ -28,9 +29,18 @@ def setup():
     parser.add_argument("--configuration", help="Configuration file for experiment", required=True)
     parser.add_argument("--parallelism", help="Number of concurrent processes to run", default="4")
     parser.add_argument("--savetraitgraphs", help="Saves a snapshot of trait tree graphs", action="store_true")
+    parser.add_argument("--queue", help="Database file on a shared filesystem to which the runs are added, for sim-queue-worker.py processes to claim, instead of writing shell scripts", required=False)
+    parser.add_argument("--sink", help="Where the runs write their results: mongo (the default), or the sqlite or ndjson files given by --sinkpath", choices=data.SINK_TYPES, default="mongo")
+    parser.add_argument("--sinkpath", help="Base path of the result files for the sqlite or ndjson sinks; each run writes its own file, named by its parameters and replicate, for merge-result-files.py", required=False)
+    parser.add_argument("--sinkbatch", help="Number of result documents buffered and written together, defaults to 100", default="100")
+    parser.add_argument("--sinkthread", help="Runs write results on a background thread", action="store_true")
+    parser.add_argument("--ledger", help="Database file recording the completed runs of the sweep; runs already completed are left out of the scripts", required=False)
 
     args = parser.parse_args()
 
+    if args.sink != 'mongo' and args.sinkpath is None:
+        parser.error("--sinkpath is required for the %s sink" % args.sink)
+
     simconfig = utils.TreeStructuredConfiguration(args.configuration)
 
     if args.debug == '1':
@@ -48,27 +58,6 @@ def main():
     log.info("Configuring TreeStructured Axelrod model with structure class: %s", structure_class_name)
 
 
-    log.debug("Opening %s output files given parallelism", args.parallelism)
-    num_files = int(args.parallelism)
-    file_list = []
-    base_name = "simrunner-exp-"
-    base_name += args.experiment
-    base_name += "-"
-
-    for i in range(0, num_files):
-        filename = ''
-        filename += base_name
-        filename += str(i)
-        filename += ".sh"
-
-        f = open(filename, 'w')
-
-        f.write("#!/bin/sh\n\n")
-        file_list.append(f)
-
-    file_cycle = itertools.cycle(file_list)
-
-
     basic_config = utils.TreeStructuredConfiguration(args.configuration)
 
     if basic_config.INTERACTION_RULE_CLASS == 'madsenlab.axelrod.rules.MultipleTreePrerequisitesLearningCopyingRule':
@@ -91,53 +80,116 @@ def main():
         state_space.append(basic_config.WS_REWIRING_FACTOR)
 
 
-    for param_combination in itertools.product(*state_space):
-        for replication in range(0, basic_config.REPLICATIONS_PER_PARAM_SET):
-            cmd = "simulations/sim-treestructured-single.py "
-            cmd += " --experiment "
-            cmd += args.experiment
-            cmd += " --configuration "
-            cmd += args.configuration
-            cmd += " --popsize "
-            cmd += str(param_combination[0])
-            cmd += " --maxinittraits "
-            cmd += str(param_combination[2])
-            cmd += " --learningrate "
-            cmd += str(param_combination[1])
-            cmd += " --lossrate "
-            cmd += str(param_combination[6])
-            cmd += " --innovrate "
-            cmd += str(param_combination[7])
-            cmd += " --periodic 0 "
-            cmd += " --numtraittrees "
-            cmd += str(param_combination[3])
-            cmd += " --branchingfactor "
-            cmd += str(param_combination[4])
-            cmd += " --depthfactor "
-            cmd += str(param_combination[5])
-            cmd += " --debug "
-            cmd += args.debug
-
-            if len(param_combination) == 9:
-                cmd += " --swrewiring "
-                cmd += str(param_combination[8])
-
-            if args.savetraitgraphs:
-                cmd += " --savetraitgraphs "
-
-            cmd += " --samplingstarttime 5000000"
-            cmd += " --samplinginterval 1000000"
-
-            cmd += '\n'
-
-            fc = file_cycle.next()
-            fc.write(cmd)
+    tasks = ((param_combination, replication)
+             for param_combination in itertools.product(*state_space)
+             for replication in range(0, basic_config.REPLICATIONS_PER_PARAM_SET))
+    if args.ledger is not None:
+        ledger = utils.SweepLedger(args.ledger, args.experiment)
+        tasks = ledger.get_missing(tasks)
+
+    if args.queue is not None:
+        queue = utils.SweepQueue(args.queue, args.experiment)
+        queue.add_tasks((param_combination, replication, get_command(param_combination, replication))
+                        for (param_combination, replication) in tasks)
+        queue.close()
+        return
+
+    log.debug("Opening %s output files given parallelism", args.parallelism)
+    num_files = int(args.parallelism)
+    file_list = []
+    base_name = "simrunner-exp-"
+    base_name += args.experiment
+    base_name += "-"
+
+    for i in range(0, num_files):
+        filename = ''
+        filename += base_name
+        filename += str(i)
+        filename += ".sh"
+
+        f = open(filename, 'w')
+
+        f.write("#!/bin/sh\n\n")
+        file_list.append(f)
+
+    file_cycle = itertools.cycle(file_list)
+
+    for (param_combination, replication) in tasks:
+        fc = file_cycle.next()
+        fc.write(get_command(param_combination, replication))
+        fc.write('\n')
 
 
     for fh in file_list:
         fh.close()
 
 
+def get_sink_path(param_combination, replication):
+    suffix = "-".join(str(param) for param in param_combination)
+    return "%s.%s-%s" % (args.sinkpath, suffix, replication)
+
+
+def get_command(param_combination, replication):
+    cmd = "simulations/sim-treestructured-single.py "
+    cmd += " --experiment "
+    cmd += args.experiment
+    cmd += " --configuration "
+    cmd += args.configuration
+    cmd += " --popsize "
+    cmd += str(param_combination[0])
+    cmd += " --maxinittraits "
+    cmd += str(param_combination[2])
+    cmd += " --learningrate "
+    cmd += str(param_combination[1])
+    cmd += " --lossrate "
+    cmd += str(param_combination[6])
+    cmd += " --innovrate "
+    cmd += str(param_combination[7])
+    cmd += " --periodic 0 "
+    cmd += " --numtraittrees "
+    cmd += str(param_combination[3])
+    cmd += " --branchingfactor "
+    cmd += str(param_combination[4])
+    cmd += " --depthfactor "
+    cmd += str(param_combination[5])
+    cmd += " --debug "
+    cmd += args.debug
+    cmd += " --dbhost "
+    cmd += args.dbhost
+    cmd += " --dbport "
+    cmd += args.dbport
+    cmd += " --sink "
+    cmd += args.sink
+    cmd += " --sinkbatch "
+    cmd += args.sinkbatch
+
+    if args.sinkpath is not None:
+        # runs may execute at the same time, so each writes its own file
+        cmd += " --sinkpath "
+        cmd += get_sink_path(param_combination, replication)
+
+    if args.sinkthread:
+        cmd += " --sinkthread "
+
+    if len(param_combination) == 9:
+        cmd += " --swrewiring "
+        cmd += str(param_combination[8])
+
+    if args.savetraitgraphs:
+        cmd += " --savetraitgraphs "
+
+    cmd += " --samplingstarttime 5000000"
+    cmd += " --samplinginterval 1000000"
+
+    if args.ledger is not None:
+        cmd += " --ledger "
+        cmd += args.ledger
+        cmd += " --replicate "
+        cmd += str(replication)
+
+    return cmd
+
+
 if __name__ == "__main__":
     setup()
     main()
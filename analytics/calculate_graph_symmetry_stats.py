@@ -8,11 +8,11 @@ import ming
 
 import logging as log
 import argparse
+import os
+from bson.objectid import ObjectId
 import madsenlab.axelrod.analysis as maa
 import madsenlab.axelrod.data as data
 import madsenlab.axelrod.utils as utils
-import numpy as np
-import scipy.misc as spm
 
 
 
@@ -28,13 +28,17 @@ def setup():
     parser.add_argument("--dbport", help="database port, defaults to 27017", default="27017")
     parser.add_argument("--dryrun", help="Do the calculations but do not change the database (handiest with --debug 1 to see the results", action="store_true")
     parser.add_argument("--configuration", help="Configuration file for experiment", required=True)
+    parser.add_argument("--symmetrycache", help="Database file in which to keep automorphism group sizes between runs", required=False)
+    parser.add_argument("--chunksize", help="Number of rows read, calculated, and written back together, defaults to 500", default="500")
+    parser.add_argument("--progressfile", help="File recording the last row completed, so an interrupted pass can be resumed; defaults to <experiment>-symmetry-progress.txt", required=False)
+    parser.add_argument("--restart", help="Ignore any recorded progress and process every row", action="store_true")
 
     args = parser.parse_args()
 
     simconfig = utils.TreeStructuredConfiguration(args.configuration)
 
 
-    if int(args.debug) == 1:
+    if args.debug is not None and int(args.debug) == 1:
         log.basicConfig(level=log.DEBUG, format='%(asctime)s %(levelname)s: %(message)s')
     else:
         log.basicConfig(level=log.INFO, format='%(asctime)s %(levelname)s: %(message)s')
@@ -49,98 +53,157 @@ def setup():
     ming.configure(**config)
 
 
+def get_progress_filename():
+    if args.progressfile is not None:
+        return args.progressfile
+    return "%s-symmetry-progress.txt" % args.experiment
+
+
+def read_progress():
+    """
+    Returns the ID of the last row whose statistics were written back, or None if there is no record.
+    """
+    filename = get_progress_filename()
+    if args.restart == True or os.path.exists(filename) == False:
+        return None
+    with open(filename, 'r') as f:
+        last_id = f.read().strip()
+    if last_id == '':
+        return None
+    log.info("Resuming after row %s", last_id)
+    return ObjectId(last_id)
+
+
+def write_progress(last_id):
+    # write and rename, so a crash never leaves a truncated progress file
+    filename = get_progress_filename()
+    tmpname = filename + ".tmp"
+    with open(tmpname, 'w') as f:
+        f.write(str(last_id))
+    os.rename(tmpname, filename)
+
+
+def get_forest_order(r, h, n):
+    """
+    Returns the automorphism group size of a balanced tree (or its log, for trees too large for nauty to
+    have handled), and whether the value is a log.
+    """
+    t = "balanced-forest:%s:%s:%s" % (r,h,n)
+    cached = forest_cache.get(t)
+    if cached is not None:
+        return (cached['forest_order'], cached['manual'])
+
+    simconfig.branching_factor =  r
+    simconfig.depth_factor = h
+    simconfig.num_trees = n
+
+    # hack - nauty takes *forever* to calculate the automorphism group size of a really large group
+    #        so I did it once and we're caching the results.  r=6, h=6 is too big, nauty core dumps.
+    manual = False
+    if r == 4 and h == 6:
+        forest_order = 4338.043478424945794
+        manual = True
+    elif r == 6 and h == 4:
+        forest_order = 1704.026063910616259
+        manual = True
+    elif r == 6 and h == 6:
+        forest_order = float("inf")
+        manual = True
+    else:
+        sym = maa.BalancedTreeAutomorphismStatistics(simconfig)
+        (forest,roots) = utils.generate_forest_balanced_trees(r,h,1)
+        log.debug("calculating the aut group size for r=%s, h=%s", r, h)
+        res = sym.calculate_graph_symmetries(forest)
+        forest_order = res["groupsize"]
+
+    forest_cache.put(t, dict(forest_order=forest_order, manual=manual))
+    return (forest_order, manual)
+
+
+def calculate_ratios(task):
+    (o_mult, autgroupsize, n, forest_order, manual) = task
+    return maa.calculate_trait_graph_symmetry_ratios(list(o_mult), autgroupsize, n, forest_order, manual)
+
+
+def process_chunk(rows):
+    """
+    Calculates the symmetry statistics for every culture in a chunk of rows.  Cultures with the same
+    orbit structure and group size in the same trait space have identical statistics, so each distinct
+    combination is calculated once, across all chunks.
+    """
+    row_tasks = []
+    resolved = dict()
+    pending = dict()
+    for row in rows:
+        (forest_order, manual) = get_forest_order(row['branching_factor'], row['depth_factor'], row['num_trait_trees'])
+        tasks = []
+        for tgs in row["trait_graph_stats"]:
+            task = (tuple(tgs["orbit_multiplicities"]), tgs['autgroupsize'], row['num_trait_trees'], forest_order, manual)
+            key = repr(task)
+            tasks.append(key)
+            if key not in resolved and key not in pending:
+                cached = ratio_cache.get(key)
+                if cached is not None:
+                    resolved[key] = cached
+                else:
+                    pending[key] = task
+        row_tasks.append(tasks)
+
+    keys = pending.keys()
+    if len(keys) > 0:
+        for key in keys:
+            result = calculate_ratios(pending[key])
+            resolved[key] = result
+            ratio_cache.put(key, result)
+    log.debug("chunk of %s rows: %s distinct cultures calculated", len(rows), len(keys))
+
+    updates = []
+    num_cultures = 0
+    for row, tasks in zip(rows, row_tasks):
+        tgs_out = []
+        for tgs, key in zip(row["trait_graph_stats"], tasks):
+            tgs.update(resolved[key])
+            log.debug("order: %s  msg_lambda: %s  msg_beta: %s mem_beta: %s",
+                      tgs["order"], tgs["msg_lambda"], tgs["msg_beta"], tgs["mem_beta"])
+            tgs_out.append(tgs)
+            num_cultures += 1
+        updates.append((row["_id"], tgs_out))
+
+    if args.dryrun == False:
+        data.bulk_update_field_axelrod_treestructured("trait_graph_stats", updates)
+        write_progress(rows[-1]["_id"])
+    return num_cultures
+
+
 
 if __name__ == "__main__":
     setup()
 
     # cache the values of the total automorphism group for a balanced forest, so we can avoid
     # calling nauty for each row once the cache is primed.
-    forest_cache = dict()
+    forest_cache = maa.SymmetryStatisticsCache(path=args.symmetrycache)
 
+    # statistics already calculated for an orbit structure, so that duplicate cultures across rows
+    # are only calculated once
+    ratio_cache = maa.SymmetryStatisticsCache(maxsize=1000000)
 
+    chunksize = int(args.chunksize)
 
+    fields = ["branching_factor", "depth_factor", "num_trait_trees", "trait_graph_stats"]
+    row_cursor = data.find_stats_axelrod_treestructured_after(read_progress(), fields, batch_size=chunksize)
 
-
-
-    # get all simulation run id's
     num_processed = 0
-    row_cursor = data.AxelrodStatsTreestructured.m.find()
+    num_rows = 0
+    rows = []
     for row in row_cursor:
-        row_id = row["_id"]
-
-        r = row['branching_factor']
-        h = row['depth_factor']
-        n = row['num_trait_trees']
-
-        t = (r,h,n)
-        if t in forest_cache:
-            forest_order = forest_cache[t]
-        else:
-            simconfig.branching_factor =  r
-            simconfig.depth_factor = h
-            simconfig.num_trees = n
-
-            # hack - nauty takes *forever* to calculate the automorphism group size of a really large group
-            #        so I did it once and we're caching the results.  r=6, h=6 is too big, nauty core dumps.
-            manual = False
-            if r == 4 and h == 6:
-                forest_order = 4338.043478424945794
-                manual = True
-            elif r == 6 and h == 4:
-                forest_order = 1704.026063910616259
-                manual = True
-            elif r == 6 and h == 6:
-                forest_order = float("inf")
-                manual = True
-            else:
-                sym = maa.BalancedTreeAutomorphismStatistics(simconfig)
-                (forest,roots) = utils.generate_forest_balanced_trees(r,h,1)
-                log.debug("asking nauty for the aut group size for r=%s, h=%s", r, h)
-                res = sym.calculate_graph_symmetries(forest)
-                forest_order = res["groupsize"]
-
-            forest_cache[t] = forest_order
-
-        trait_graph_stats_list = row["trait_graph_stats"]
-
-        tgs_out = []
-
-        for tgs in trait_graph_stats_list:
-            # first calculate the number of remaining vertices in the forest and store it
-            o_mult = tgs["orbit_multiplicities"]
-            order = np.sum(np.asarray(o_mult))
-
-            # calculate the size of the automorphism group relative to Kn (as a reference), and
-            # relative to order N corolla (maximally symmetric tree)
-            autgroupsize = tgs['autgroupsize']
-
-            beta_g = maa.ratio_order_automorphism_to_symmetric_group(autgroupsize,order)
-            if manual == False:
-                beta_f = maa.ratio_log_order_automorphism_to_order_balanced_forest(autgroupsize,forest_order,n,order)
-            else:
-                beta_f = maa.ratio_log_order_automorphism_to_order_balanced_forest_large_forest(autgroupsize,forest_order,n,order)
-
-            # calculate the fraction of vertices that belong to nontrivial orbits
-            nontrivial_mult = [ mult for mult in o_mult if mult > 1 ]
-            lambda_g = float(len(nontrivial_mult)) / float(order)
-
-            tgs["order"] = order
-            tgs["msg_beta"] = beta_g
-            tgs["msg_lambda"] = lambda_g
-            tgs["mem_beta"] = beta_f
-
-            log.debug("order: %s  msg_lambda: %s  msg_beta: %s mem_beta: %s",
-                      order, lambda_g, beta_g, beta_f)
-
-            tgs_out.append(tgs)
-
-            num_processed += 1
-
-        #log.debug("tgs: %s", tgs_out)
-        if  args.dryrun == False:
-            data.updateFieldAxelrodStatsTreestructured(row_id, "trait_graph_stats", tgs_out)
-
-    log.info("COMPLETE:  %s rows processed for additional graph symmetry statistics", num_processed)
-
-
-
+        rows.append(row)
+        if len(rows) == chunksize:
+            num_processed += process_chunk(rows)
+            num_rows += len(rows)
+            log.info("%s rows processed", num_rows)
+            rows = []
+    if len(rows) > 0:
+        num_processed += process_chunk(rows)
+        num_rows += len(rows)
+
+    log.info("COMPLETE:  %s rows and %s cultures processed for additional graph symmetry statistics", num_rows, num_processed)
@@ -10,7 +10,14 @@ Description here
 from descriptive_stats import get_culture_counts_dbformat, get_num_traits_per_individual_stats, PopulationTraitFrequencyAnalyzer, get_culture_count_map
 from overlap import calc_probability_interaction_axelrod, get_different_feature_positions_axelrod, calc_overlap_axelrod, calc_overlap_extensible, calc_probability_interaction_extensible, \
     get_traits_differing_from_focal_extensible
-from order_parameters import klemm_normalized_L_axelrod, klemm_normalized_L_extensible
+from order_parameters import klemm_normalized_L_axelrod, klemm_normalized_L_extensible, get_edge_index_arrays, \
+    calc_edge_overlaps_axelrod, calc_edge_overlaps_bitset, calc_edge_overlaps_sets, calc_edge_overlaps_extensible, \
+    get_trait_set_sizes, popcount_rows
+from incremental_stats import IncrementalPopulationStatistics
+from snapshot import PopulationSnapshot, take_population_snapshot
 from trait_tree_statistics import BalancedTreeAutomorphismStatistics
+from tree_automorphisms import calculate_forest_symmetries, is_forest, get_forest_canonical_form
+from symmetry_cache import SymmetryStatisticsCache, get_forest_canonical_key
 from math_functions import num_leaves_in_tree, num_ordered_trees_by_leaves, num_nodes_balanced_tree, num_rooted_trees_otter_approx, \
-    ratio_order_automorphism_to_symmetric_group, ratio_log_order_automorphism_to_order_balanced_forest, ratio_log_order_automorphism_to_order_balanced_forest_large_forest
+    ratio_order_automorphism_to_symmetric_group, ratio_log_order_automorphism_to_order_balanced_forest, ratio_log_order_automorphism_to_order_balanced_forest_large_forest, \
+    calculate_trait_graph_symmetry_ratios
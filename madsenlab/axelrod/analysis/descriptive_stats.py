@@ -15,28 +15,26 @@ import math as m
 import pprint as pp
 
 def get_culture_count_map(pop):
+    # populations with interned cultures keep the count of each culture in their culture table
+    culture_table = getattr(pop, 'culture_table', None)
+    if culture_table is not None:
+        return culture_table.get_culture_count_map()
+
     counts = defaultdict(int)
-    graph = pop.agentgraph
-    for nodename in graph.nodes():
-        traits = graph.node[nodename]['traits']
-        culture = pop.get_traits_packed(traits)
+    for nodename in range(0, pop.num_agents):
+        culture = pop.get_agent_culture(nodename)
         counts[culture] += 1
     return counts
 
 def get_culture_counts_dbformat(pop):
     """
     Takes an instance of a "population" and counts the distinct trait lists (i.e., cultures in the
-    Axelrod model sense) in the population.  Cultures are represented by packing the feature/trait list
-    into an integer which serves as an identifier for a unique combination of features and traits.
+    Axelrod model sense) in the population.  Cultures are represented by a fingerprint of the feature/trait
+    list, a 64-bit integer which serves as an identifier for a unique combination of features and traits.
 
     The return value is a dict of culture id, count.
     """
-    counts = defaultdict(int)
-    graph = pop.agentgraph
-    for nodename in graph.nodes():
-        traits = graph.node[nodename]['traits']
-        culture = pop.get_traits_packed(traits)
-        counts[culture] += 1
+    counts = get_culture_count_map(pop)
 
     # transform into the list of dicts that's more convenient to stuff into mongodb
     stored_counts = []
@@ -53,8 +51,8 @@ def get_num_traits_per_individual_stats(pop):
 
     """
     sizes = []
-    for nodename in pop.agentgraph.nodes():
-        sizes.append(len(pop.agentgraph.node[nodename]['traits']))
+    for agent_traits in pop.agent_traits:
+        sizes.append(len(agent_traits))
     mean = np.mean(np.asarray(sizes))
     sd = m.sqrt(np.var(np.asarray(sizes)))
     return (mean, sd)
@@ -109,7 +107,7 @@ class PopulationTraitFrequencyAnalyzer(object):
 
     def __init__(self, model):
         self.model = model
-        self.total_traits = model.agentgraph.number_of_nodes()
+        self.total_traits = model.num_agents
 
     def get_trait_frequencies(self):
         return self.freq
@@ -131,10 +129,9 @@ class PopulationTraitFrequencyAnalyzer(object):
         self.freq = None
         trait_counts = defaultdict(int)
 
-        total = self.model.agentgraph.number_of_nodes()
+        total = self.model.num_agents
 
-        for agent_id in self.model.agentgraph.nodes():
-            agent_traits = self.model.agentgraph.node[agent_id]['traits']
+        for agent_traits in self.model.agent_traits:
             for trait in agent_traits:
                 trait_counts[trait] += 1
 
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Population statistics kept current as the rules change agent traits, instead of rescanning the population
+at every sample.
+
+"""
+
+import logging as log
+from collections import defaultdict
+import math as m
+from descriptive_stats import diversity_shannon_entropy
+
+
+class IncrementalPopulationStatistics(object):
+    """
+    Observer for populations with set-valued traits (the extensible and tree-structured models), which keeps
+    trait counts, the trait spectrum, culture counts and the mean and standard deviation of the number of traits
+    per individual up to date as the rules add, remove and replace traits.
+
+    Constructing the observer scans the population once and registers it with the population, which then
+    passes on the trait_added(), trait_removed() and trait_replaced() notifications that the rules send.
+    Trait counts, the spectrum and the trait-count moments are updated in O(1) per notification.  The observer
+    turns on the population's culture fingerprint tracking, and culture counts are only updated for agents which
+    have changed since the last snapshot, so taking a snapshot costs O(agents changed + distinct cultures +
+    distinct traits) rather than several full passes over the population.
+
+    The get_* methods return the same values as get_culture_count_map(), get_culture_counts_dbformat(),
+    get_num_traits_per_individual_stats() and PopulationTraitFrequencyAnalyzer.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.model.track_fingerprints()
+        self.rebuild()
+        self.model.add_observer(self)
+
+    def rebuild(self):
+        """
+        Recomputes all of the statistics with a full scan of the population.
+        """
+        self.num_agents = self.model.num_agents
+        self.trait_counts = defaultdict(int)
+        self.spectrum_counts = defaultdict(int)
+        self.culture_counts = defaultdict(int)
+        self.agent_culture = dict()
+        self.agent_sizes = dict()
+        self.size_sum = 0
+        self.size_sum_squares = 0
+        self.dirty_agents = set()
+
+        for agent_id in range(0, self.num_agents):
+            agent_traits = self.model.agent_traits[agent_id]
+            for trait in agent_traits:
+                self.trait_counts[trait] += 1
+            size = len(agent_traits)
+            self.agent_sizes[agent_id] = size
+            self.size_sum += size
+            self.size_sum_squares += size * size
+            culture = self.model.get_agent_culture(agent_id)
+            self.agent_culture[agent_id] = culture
+            self.culture_counts[culture] += 1
+
+        for trait, count in self.trait_counts.items():
+            self.spectrum_counts[count] += 1
+
+    ### notifications
+
+    def trait_added(self, agent_id, trait):
+        count = self.trait_counts[trait]
+        self._move_spectrum(count, count + 1)
+        self.trait_counts[trait] = count + 1
+        self._change_size(agent_id, 1)
+        self.dirty_agents.add(agent_id)
+
+    def trait_removed(self, agent_id, trait):
+        count = self.trait_counts[trait]
+        self._move_spectrum(count, count - 1)
+        if count == 1:
+            del self.trait_counts[trait]
+        else:
+            self.trait_counts[trait] = count - 1
+        self._change_size(agent_id, -1)
+        self.dirty_agents.add(agent_id)
+
+    def trait_replaced(self, agent_id, old_trait, new_trait):
+        self.trait_removed(agent_id, old_trait)
+        self.trait_added(agent_id, new_trait)
+
+    def _move_spectrum(self, old_count, new_count):
+        if old_count > 0:
+            self.spectrum_counts[old_count] -= 1
+            if self.spectrum_counts[old_count] == 0:
+                del self.spectrum_counts[old_count]
+        if new_count > 0:
+            self.spectrum_counts[new_count] += 1
+
+    def _change_size(self, agent_id, delta):
+        size = self.agent_sizes[agent_id]
+        new_size = size + delta
+        self.agent_sizes[agent_id] = new_size
+        self.size_sum += delta
+        self.size_sum_squares += (new_size * new_size) - (size * size)
+
+    def _update_cultures(self):
+        for agent_id in self.dirty_agents:
+            old_culture = self.agent_culture[agent_id]
+            new_culture = self.model.get_agent_culture(agent_id)
+            if new_culture == old_culture:
+                continue
+            self.culture_counts[old_culture] -= 1
+            if self.culture_counts[old_culture] == 0:
+                del self.culture_counts[old_culture]
+            self.culture_counts[new_culture] += 1
+            self.agent_culture[agent_id] = new_culture
+        self.dirty_agents.clear()
+
+    ### snapshot methods
+
+    def get_culture_count_map(self):
+        self._update_cultures()
+        return dict(self.culture_counts)
+
+    def get_culture_counts_dbformat(self):
+        self._update_cultures()
+        stored_counts = []
+        for key,val in self.culture_counts.items():
+            stored_counts.append(dict(cultureid=str(key),count=val))
+        return stored_counts
+
+    def get_num_traits_per_individual_stats(self):
+        mean = float(self.size_sum) / float(self.num_agents)
+        variance = (float(self.size_sum_squares) / float(self.num_agents)) - (mean * mean)
+        sd = m.sqrt(max(variance, 0.0))
+        return (mean, sd)
+
+    def get_trait_frequencies(self):
+        total = float(self.num_agents)
+        return {k : float(v)/total for k,v in self.trait_counts.items()}
+
+    def get_trait_richness(self):
+        return len(self.trait_counts)
+
+    def get_trait_evenness_entropy(self):
+        return diversity_shannon_entropy(self.get_trait_frequencies().values())
+
+    def get_trait_spectrum(self):
+        spectra = []
+        for popcount, numtraits in self.spectrum_counts.items():
+            spectra.append(dict(popcount=popcount,numtraits=numtraits))
+        return spectra
@@ -77,6 +77,33 @@ def ratio_order_automorphism_to_symmetric_group(groupsize, order):
     return beta
 
 
+def calculate_trait_graph_symmetry_ratios(orbit_multiplicities, groupsize, num_trees, forest_order, large_forest):
+    """
+    Calculates the derived symmetry statistics for a single culture's trait graph, from its orbit
+    multiplicities and automorphism group size:  the number of vertices (order), the ratio of the group
+    size to the corolla of the same order (msg_beta), the fraction of vertices in nontrivial orbits
+    (msg_lambda), and the log ratio of the group size to that of the balanced forest (mem_beta).
+
+    forest_order is the automorphism group size of a single balanced tree, or its logarithm if
+    large_forest is True.
+    """
+    order = int(np.sum(np.asarray(orbit_multiplicities)))
+
+    beta_g = ratio_order_automorphism_to_symmetric_group(groupsize, order)
+    if large_forest == False:
+        beta_f = ratio_log_order_automorphism_to_order_balanced_forest(groupsize, forest_order, num_trees, order)
+    else:
+        beta_f = ratio_log_order_automorphism_to_order_balanced_forest_large_forest(groupsize, forest_order, num_trees, order)
+
+    # calculate the fraction of vertices that belong to nontrivial orbits
+    nontrivial_mult = [ mult for mult in orbit_multiplicities if mult > 1 ]
+    lambda_g = 0.0
+    if order > 0:
+        lambda_g = float(len(nontrivial_mult)) / float(order)
+
+    return dict(order=order, msg_beta=float(beta_g), msg_lambda=lambda_g, mem_beta=float(beta_f))
+
+
 def num_nodes_balanced_tree(r,h):
     """
     Returns the number of nodes in a balanced tree, with branching factor R and height H.
@@ -9,8 +9,19 @@ Description here
 """
 import overlap as o
 import logging as log
+import itertools
 import numpy as np
 
+# the per-edge calculations below work through the edges in chunks, sized so that each working array holds
+# about this many values whatever the size of the population or of the trait universe
+CHUNK_VALUES = 2 ** 20
+
+# constants of the word-level (SWAR) popcount
+_M1 = np.uint64(0x5555555555555555)
+_M2 = np.uint64(0x3333333333333333)
+_M4 = np.uint64(0x0f0f0f0f0f0f0f0f)
+_H01 = np.uint64(0x0101010101010101)
+
 def klemm_normalized_L_axelrod(pop,simconfig):
     """
     The normalized Lyapunov potential defined in Klemm et al. 2003, Physica A (327) 1-5.  Implements
@@ -19,8 +30,6 @@ def klemm_normalized_L_axelrod(pop,simconfig):
     Ranges between [0,1], with 0 possible only for the completely homogeneous configurations.
     Variable names differ from the rest of the codebase, but are designed to be identical to the Klemm notation.
     """
-    # following is shorthand for the NetworkX graph
-    g = pop.agentgraph
     N = simconfig.popsize
     z = pop.get_coordination_number()
     F = simconfig.num_features
@@ -30,11 +39,17 @@ def klemm_normalized_L_axelrod(pop,simconfig):
     norm_constant = 2.0 / (z * N * F)
     sums = 0
 
-    for (a,b) in g.edges_iter():
-        (a_id, a_traits) = pop.get_agent_by_id(a)
-        (b_id, b_traits) = pop.get_agent_by_id(b)
-        overlap = o.calc_overlap_axelrod(a_traits, b_traits)
-        sums += (F - overlap)
+    edges = get_edge_index_arrays(pop)
+    traits = get_fixed_trait_matrix(pop)
+    if traits is not None:
+        overlaps = calc_edge_overlaps_axelrod(traits, edges[0], edges[1])
+        sums = float(np.sum(F - overlaps))
+    else:
+        for (a,b) in pop.edges.tolist():
+            (a_id, a_traits) = pop.get_agent_by_id(a)
+            (b_id, b_traits) = pop.get_agent_by_id(b)
+            overlap = o.calc_overlap_axelrod(a_traits, b_traits)
+            sums += (F - overlap)
 
     result = norm_constant * sums
     #log.debug("Klemm normalized L: %s  norm constant: %s sum: %s", result, norm_constant, sums )
@@ -53,26 +68,177 @@ def klemm_normalized_L_extensible(pop, simconfig):
     Basic idea is the same as the core axelrod model, except num_features is the max number of traits in the
     population
     """
-    g = pop.agentgraph
     N = simconfig.popsize
     z = pop.get_coordination_number()
 
-    sizes = []
-    for nodename in g.nodes():
-        sizes.append(len(g.node[nodename]['traits']))
-    F = np.amax(np.asarray(sizes))
-
-
+    edges = get_edge_index_arrays(pop)
+    sizes = get_trait_set_sizes(pop)
+    F = np.amax(sizes)
 
     norm_constant = 2.0 / (z * N * F)
-    sums = 0
-
-    for (a,b) in g.edges_iter():
-        (a_id, a_traits) = pop.get_agent_by_id(a)
-        (b_id, b_traits) = pop.get_agent_by_id(b)
-        overlap = o.calc_overlap_extensible(a_traits, b_traits)
-        sums += (F - overlap)
+    overlaps = calc_edge_overlaps_extensible(pop, edges[0], edges[1], sizes)
+    sums = int((len(overlaps) * F) - np.sum(overlaps))
 
     result = norm_constant * sums
     #log.debug("Klemm normalized L: %s  norm constant: %s sum: %s", result, norm_constant, sums )
-    return result
\ No newline at end of file
+    return result
+
+
+
+#################################################
+# edge-list versions of the overlap calculations
+
+def get_edge_index_arrays(pop):
+    """
+    Returns the endpoints of every edge in the population graph as a pair of integer arrays (a, b), so that
+    per-edge quantities can be computed for all edges at once.  These are the columns of the population's
+    edge table.
+    """
+    return (pop.edges[:,0], pop.edges[:,1])
+
+
+def get_fixed_trait_matrix(pop):
+    """
+    Returns an (N, F) matrix of agent traits for a fixed-trait population, either the population's own trait
+    matrix or one packed from the trait lists, or None if the traits cannot be arranged as a matrix.
+    """
+    traits = getattr(pop, 'traits', None)
+    if isinstance(traits, np.ndarray):
+        return traits
+
+    matrix = np.asarray(pop.agent_traits)
+    if matrix.ndim != 2:
+        return None
+    return matrix
+
+
+def calc_edge_overlaps_axelrod(traits, a, b):
+    """
+    Given an (N, F) trait matrix and the endpoints of a set of edges, returns the number of features on
+    which the two agents of each edge have the same trait.
+    """
+    return np.sum(traits[a] == traits[b], axis=1)
+
+
+def get_trait_set_sizes(pop):
+    """
+    Returns the number of traits of each agent of a population with set-valued traits, as an integer array.
+    """
+    return np.fromiter((len(agent_traits) for agent_traits in pop.agent_traits), dtype=np.int_,
+                       count=pop.num_agents)
+
+
+def calc_edge_overlaps_extensible(pop, a, b, sizes=None):
+    """
+    Given a population with set-valued traits and the endpoints of a set of edges, returns the size of the
+    intersection of the trait sets of the two agents of each edge, computed for all edges at once.  The
+    bitset matrix of a bitset population is used if its rows are no wider, in words, than the largest trait
+    set, since its cost grows with the trait universe; otherwise the trait sets themselves are packed into
+    arrays.  sizes is the result of get_trait_set_sizes(), if already known.
+    """
+    if sizes is None:
+        sizes = get_trait_set_sizes(pop)
+    trait_bits = getattr(pop, 'trait_bits', None)
+    if trait_bits is not None and trait_bits.shape[1] <= max(np.amax(sizes), 1):
+        return calc_edge_overlaps_bitset(trait_bits, a, b)
+    return calc_edge_overlaps_sets(pop.agent_traits, sizes, a, b)
+
+
+def calc_edge_overlaps_sets(agent_traits, sizes, a, b):
+    """
+    Given the trait sets of a population (integer traits), their sizes, and the endpoints of a set of edges,
+    returns the size of the intersection of the trait sets of the two agents of each edge.
+
+    The traits are packed once into a sorted array of (agent, trait) keys.  For each edge, the traits of the
+    endpoint with fewer traits are then looked up among the keys of the other endpoint by binary search, a
+    chunk of edges at a time.
+    """
+    num_edges = len(a)
+    overlaps = np.zeros(num_edges, dtype=np.int_)
+    total = int(np.sum(sizes))
+    if num_edges == 0 or total == 0:
+        return overlaps
+
+    offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=offsets[1:])
+    values = np.fromiter(itertools.chain.from_iterable(agent_traits), dtype=np.int64, count=total)
+    universe = int(values.max()) + 1
+    keys = np.repeat(np.arange(len(sizes), dtype=np.int64), sizes) * universe + values
+    keys.sort()
+
+    swap = sizes[a] > sizes[b]
+    small = np.where(swap, b, a)
+    large = np.where(swap, a, b)
+    chunk = max(1, CHUNK_VALUES // max(int(np.amax(sizes)), 1))
+    for start in range(0, num_edges, chunk):
+        stop = min(start + chunk, num_edges)
+        small_sizes = sizes[small[start:stop]]
+        edge = np.repeat(np.arange(stop - start), small_sizes)
+        first = np.cumsum(small_sizes) - small_sizes
+        positions = offsets[small[start:stop]][edge] + np.arange(len(edge)) - first[edge]
+        queries = large[start:stop][edge] * universe + values[positions]
+        found = keys[np.minimum(np.searchsorted(keys, queries), len(keys) - 1)] == queries
+        overlaps[start:stop] = np.bincount(edge, weights=found, minlength=stop - start).astype(np.int_)
+    return overlaps
+
+
+def _popcount_words(words, scratch):
+    """
+    Replaces each uint64 word of an array with the number of its set bits, in place, with the SWAR popcount
+    (bits summed in pairs, nibbles and bytes, then the bytes summed by a multiplication).  scratch is an
+    array of the same shape, so that no temporary arrays are allocated.
+    """
+    np.right_shift(words, np.uint64(1), out=scratch)
+    np.bitwise_and(scratch, _M1, out=scratch)
+    np.subtract(words, scratch, out=words)
+    np.right_shift(words, np.uint64(2), out=scratch)
+    np.bitwise_and(scratch, _M2, out=scratch)
+    np.bitwise_and(words, _M2, out=words)
+    np.add(words, scratch, out=words)
+    np.right_shift(words, np.uint64(4), out=scratch)
+    np.add(words, scratch, out=words)
+    np.bitwise_and(words, _M4, out=words)
+    np.multiply(words, _H01, out=words)
+    np.right_shift(words, np.uint64(56), out=words)
+
+
+def popcount_rows(words):
+    """
+    Returns the number of set bits in each row of a 2-D array of uint64 bitset words, a chunk of rows at a time.
+    """
+    (num_rows, num_words) = words.shape
+    counts = np.zeros(num_rows, dtype=np.int_)
+    chunk = max(1, CHUNK_VALUES // max(num_words, 1))
+    buf = np.empty((min(chunk, num_rows), num_words), dtype=np.uint64)
+    scratch = np.empty_like(buf)
+    for start in range(0, num_rows, chunk):
+        stop = min(start + chunk, num_rows)
+        rows = buf[0:stop - start]
+        rows[:] = words[start:stop]
+        _popcount_words(rows, scratch[0:stop - start])
+        counts[start:stop] = rows.sum(axis=1)
+    return counts
+
+
+def calc_edge_overlaps_bitset(trait_bits, a, b):
+    """
+    Given an (N, words) bitset trait matrix and the endpoints of a set of edges, returns the size of the
+    intersection of the trait sets of the two agents of each edge.  The edges are processed a chunk at a
+    time, in two working arrays of fixed size.
+    """
+    num_edges = len(a)
+    num_words = trait_bits.shape[1]
+    overlaps = np.zeros(num_edges, dtype=np.int_)
+    chunk = max(1, CHUNK_VALUES // max(num_words, 1))
+    buf = np.empty((min(chunk, num_edges), num_words), dtype=np.uint64)
+    scratch = np.empty_like(buf)
+    for start in range(0, num_edges, chunk):
+        stop = min(start + chunk, num_edges)
+        rows = buf[0:stop - start]
+        other = scratch[0:stop - start]
+        np.take(trait_bits, a[start:stop], axis=0, out=rows)
+        np.take(trait_bits, b[start:stop], axis=0, out=other)
+        np.bitwise_and(rows, other, out=rows)
+        _popcount_words(rows, other)
+        overlaps[start:stop] = rows.sum(axis=1)
+    return overlaps
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Single-pass sampling of the statistics recorded for the extensible and tree-structured models.
+
+"""
+
+import logging as log
+from collections import defaultdict
+import math as m
+import numpy as np
+import order_parameters as op
+
+
+class PopulationSnapshot(object):
+    """
+    The statistics of a population with set-valued traits at one point in time, as produced by
+    take_population_snapshot() and consumed by the storage layer.  Attributes are:
+
+    culture_count_map:  dict of culture ID to the number of agents with that culture
+    culture_counts_dbformat:  the same counts as a list of dicts with keys cultureid and count
+    traitset_map:  dict of culture ID to the trait set of the first agent found with that culture
+    trait_frequencies:  dict of trait to the fraction of agents which possess it
+    trait_spectrum:  list of dicts with keys popcount and numtraits
+    trait_richness:  number of traits possessed by at least one agent
+    mean_traits, sd_traits:  mean and standard deviation of the number of traits per agent
+    klemm:  Klemm's normalized Lyapunov potential, as in klemm_normalized_L_extensible()
+    """
+
+    def __init__(self):
+        self.culture_count_map = None
+        self.culture_counts_dbformat = None
+        self.traitset_map = None
+        self.trait_frequencies = None
+        self.trait_spectrum = None
+        self.trait_richness = None
+        self.mean_traits = None
+        self.sd_traits = None
+        self.klemm = None
+
+    def get_num_cultures(self):
+        return len(self.culture_count_map)
+
+
+def take_population_snapshot(pop, simconfig, incremental=None):
+    """
+    Builds a PopulationSnapshot in a single traversal of the population, computing each agent's culture ID
+    once.  The traversal accumulates culture counts, the representative trait set of each culture, trait
+    counts, and the moments of the number of traits per agent.  The trait overlaps of the Klemm potential are
+    computed for all edges at once (see calc_edge_overlaps_extensible()).
+
+    If an IncrementalPopulationStatistics observer is given, the counts and moments are taken from it, and
+    the traversal uses its culture ID's instead of hashing any trait sets.
+    """
+    N = simconfig.popsize
+    z = pop.get_coordination_number()
+    num_agents = pop.num_agents
+
+    if incremental is not None:
+        incremental._update_cultures()
+        agent_culture = incremental.agent_culture
+
+    culture_counts = defaultdict(int)
+    traitset_map = dict()
+    trait_counts = defaultdict(int)
+    size_sum = 0
+    size_sum_squares = 0
+
+    for agent_id in range(0, num_agents):
+        agent_traits = pop.agent_traits[agent_id]
+
+        if incremental is not None:
+            culture = agent_culture[agent_id]
+        else:
+            culture = pop.get_agent_culture(agent_id)
+            culture_counts[culture] += 1
+            for trait in agent_traits:
+                trait_counts[trait] += 1
+            size = len(agent_traits)
+            size_sum += size
+            size_sum_squares += size * size
+
+        if culture not in traitset_map:
+            traitset_map[culture] = agent_traits
+
+    snapshot = PopulationSnapshot()
+    snapshot.traitset_map = traitset_map
+
+    if incremental is not None:
+        snapshot.culture_count_map = incremental.get_culture_count_map()
+        snapshot.trait_frequencies = incremental.get_trait_frequencies()
+        snapshot.trait_richness = incremental.get_trait_richness()
+        snapshot.trait_spectrum = incremental.get_trait_spectrum()
+        (snapshot.mean_traits, snapshot.sd_traits) = incremental.get_num_traits_per_individual_stats()
+    else:
+        snapshot.culture_count_map = dict(culture_counts)
+        snapshot.trait_frequencies = {k : float(v)/float(num_agents) for k,v in trait_counts.items()}
+        snapshot.trait_richness = len(trait_counts)
+        spectrum_count = defaultdict(int)
+        for trait, count in trait_counts.items():
+            spectrum_count[count] += 1
+        snapshot.trait_spectrum = [dict(popcount=popcount,numtraits=numtraits) for popcount, numtraits in spectrum_count.items()]
+        mean = float(size_sum) / float(num_agents)
+        snapshot.mean_traits = mean
+        snapshot.sd_traits = m.sqrt(max((float(size_sum_squares) / float(num_agents)) - (mean * mean), 0.0))
+
+    snapshot.culture_counts_dbformat = [dict(cultureid=str(key),count=val) for key,val in snapshot.culture_count_map.items()]
+
+    sizes = op.get_trait_set_sizes(pop)
+    edges = op.get_edge_index_arrays(pop)
+    num_edges = len(edges[0])
+    overlap_sum = int(np.sum(op.calc_edge_overlaps_extensible(pop, edges[0], edges[1], sizes)))
+
+    F = int(np.amax(sizes))
+    norm_constant = 2.0 / (z * N * F)
+    snapshot.klemm = norm_constant * ((num_edges * F) - overlap_sum)
+    return snapshot
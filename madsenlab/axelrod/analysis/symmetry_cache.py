@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Memoization of symmetry statistics for trait forests, keyed on the canonical form of the forest.
+
+"""
+
+import logging as log
+import hashlib
+import json
+import sqlite3
+from collections import OrderedDict
+from tree_automorphisms import get_forest_canonical_form
+
+
+def get_forest_canonical_key(graph):
+    """
+    Returns a fixed-length key (the SHA-1 digest of the canonical form) shared by all forests isomorphic
+    to graph, or None if the graph is not a forest.
+    """
+    canonical = get_forest_canonical_form(graph)
+    if canonical is None:
+        return None
+    return hashlib.sha1(canonical).hexdigest()
+
+
+class SymmetryStatisticsCache(object):
+    """
+    LRU cache of statistics which depend only upon the shape of a trait forest (orbit structure, group size,
+    radii, degrees), so that isomorphic forests -- across cultures, samples and replicates -- are analyzed once.
+
+    Keys are strings, usually from get_forest_canonical_key().  Values are dicts which must be serializable as
+    JSON, and are shared between callers, so they should be copied rather than modified.
+
+    If a path is given, entries are also written to a SQLite database at that path and looked up there when
+    they are not in memory.  Several processes can share one database file, but each process needs to
+    construct its own cache, since SQLite connections cannot be carried across a fork.
+    """
+
+    def __init__(self, maxsize=10000, path=None):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.db = None
+        if path is not None:
+            self.db = sqlite3.connect(path, timeout=60)
+            self.db.execute("CREATE TABLE IF NOT EXISTS symmetry_stats (shape TEXT PRIMARY KEY, stats TEXT)")
+            self.db.commit()
+
+    def get(self, key):
+        """
+        Returns the statistics stored for key, or None if there are none.
+        """
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.entries[key] = entry
+            self.hits += 1
+            return entry
+
+        if self.db is not None:
+            row = self.db.execute("SELECT stats FROM symmetry_stats WHERE shape = ?", (key,)).fetchone()
+            if row is not None:
+                entry = json.loads(row[0])
+                self._remember(key, entry)
+                self.hits += 1
+                return entry
+
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self._remember(key, value)
+        if self.db is not None:
+            self.db.execute("INSERT OR IGNORE INTO symmetry_stats (shape, stats) VALUES (?, ?)",
+                            (key, json.dumps(value)))
+            self.db.commit()
+
+    def _remember(self, key, value):
+        self.entries[key] = value
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
@@ -11,6 +11,7 @@ import logging as log
 import subprocess
 import math_functions as m
 import re
+from tree_automorphisms import calculate_forest_symmetries
 
 
 
@@ -18,12 +19,22 @@ import re
 class BalancedTreeAutomorphismStatistics(object):
     """
     Calculates statistics relating to the symmetries of a graph, by determination
-    of the graph's automorphism group and orbit structure.  This class relies
-    upon Brendan McKay and Adolfo Piperno's nauty and Traces package.
+    of the graph's automorphism group and orbit structure.
+
+    The backend argument selects how the automorphism group is found:
+
+    "forest" (the default):  trait graphs are forests, so the group order and orbits
+    are calculated in-process by calculate_forest_symmetries().  Graphs which are not
+    forests are passed to nauty.
+
+    "nauty":  uses Brendan McKay and Adolfo Piperno's nauty and Traces package.
 
     http://pallini.di.uniroma1.it/index.html
 
-    This class requires that the "dreadnaut" executable from nauty/Traces be
+    "crosscheck":  calculates the results both ways, logs an error if they disagree,
+    and returns the in-process results.
+
+    The nauty and crosscheck backends require that the "dreadnaut" executable from nauty/Traces be
     available somewhere on the execution search path for the simulation process.  This
     code does not install nauty itself.
 
@@ -51,7 +62,12 @@ class BalancedTreeAutomorphismStatistics(object):
     # possesses, and identify them regardless of shape (perhaps with a graph attribute in networkx).
 
 
-    def __init__(self, simconfig):
+    BACKENDS = ['forest', 'nauty', 'crosscheck']
+
+    def __init__(self, simconfig, backend='forest'):
+        if backend not in self.BACKENDS:
+            raise ValueError("Unknown automorphism backend: %s" % backend)
+        self.backend = backend
         self.simconfig = simconfig
         self.r = int(self.simconfig.branching_factor)
         self.h = int(self.simconfig.depth_factor)
@@ -125,13 +141,18 @@ class BalancedTreeAutomorphismStatistics(object):
         # we reformat the vertex labels
         g = nx.convert_node_labels_to_integers(graph)
 
-        dread_graph = self._get_dreadnaught_for_graph(g)
-        num_vertices = g.number_of_nodes()
-        #log.debug("dread: %s", dread_graph)
-        raw = self._get_raw_nauty_output(dread_graph)
-        #log.debug("raw: %s", raw)
+        results = None
+        if self.backend != 'nauty':
+            results = calculate_forest_symmetries(g)
+            if results is None:
+                log.debug("trait graph is not a forest, calculating symmetries with nauty")
 
-        results = self._parse_nauty_output(raw, g)
+        if results is None:
+            results = self._calculate_nauty_symmetries(g)
+        elif self.backend == 'crosscheck':
+            nauty_results = self._calculate_nauty_symmetries(g)
+            if self._results_agree(results, nauty_results) == False:
+                log.error("in-process symmetries %s disagree with nauty %s", results, nauty_results)
 
         # TODO: Figure out how to handle density and radius for multi-component graphs
         results['remainingdensity'] = float(g.number_of_nodes()) / (float(self.n_per_tree) * float(self.num_trees))
@@ -140,7 +161,29 @@ class BalancedTreeAutomorphismStatistics(object):
         return results
 
 
+    def _calculate_nauty_symmetries(self, g):
+        dread_graph = self._get_dreadnaught_for_graph(g)
+        #log.debug("dread: %s", dread_graph)
+        raw = self._get_raw_nauty_output(dread_graph)
+        #log.debug("raw: %s", raw)
+        return self._parse_nauty_output(raw, g)
+
 
+    def _results_agree(self, results, nauty_results):
+        """
+        Compares in-process and nauty results.  nauty prints the group size with about ten significant
+        digits, so group sizes are compared to a relative tolerance.
+        """
+        if results['orbits'] != nauty_results['orbits']:
+            return False
+        if results['orbitcounts'] != nauty_results['orbitcounts']:
+            return False
+        expected = nauty_results['groupsize']
+        if expected is None:
+            return False
+        if results['groupsize'] == expected:
+            return True
+        return abs(results['groupsize'] - expected) <= 1e-9 * abs(expected)
 
 
 
@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Automorphism group order and orbits of forests, computed in-process by canonical labeling of rooted
+subtrees (Aho, Hopcroft and Ullman's tree isomorphism algorithm), rather than by running nauty.
+
+"""
+
+import logging as log
+import math
+from collections import defaultdict
+
+
+def is_forest(graph):
+    """
+    Returns True if the graph is a simple, acyclic undirected graph.
+    """
+    if graph.is_directed() or graph.is_multigraph():
+        return False
+    num_components = 0
+    seen = set()
+    for v in graph.nodes_iter():
+        if v in seen:
+            continue
+        num_components += 1
+        stack = [v]
+        seen.add(v)
+        while stack:
+            u = stack.pop()
+            for w in graph.neighbors_iter(u):
+                if w not in seen:
+                    seen.add(w)
+                    stack.append(w)
+    return graph.number_of_edges() == graph.number_of_nodes() - num_components
+
+
+def calculate_forest_symmetries(graph):
+    """
+    Calculates the order of the automorphism group of a forest, and the sizes of its vertex orbits.  Returns
+    None if the graph is not a forest.  Otherwise returns a dict with the same keys that nauty's output
+    is parsed into:
+
+    orbits:  number of vertex orbits
+    groupsize:  order of the automorphism group, as a float (inf if it exceeds the range of a float)
+    orbitcounts:  list of orbit sizes, ordered by the smallest vertex in each orbit
+
+    Each component is rooted at its center (or at the midpoint of its central edge), and each vertex
+    is given a canonical label for the rooted subtree below it.  The group order is then the product,
+    over all vertices, of the factorials of the multiplicities of the labels of its children, times the
+    factorials of the multiplicities of isomorphic components (and a factor of 2 for a central edge whose
+    halves are isomorphic).  Two vertices lie in the same orbit exactly when the sequence of labels from
+    the root of their component down to them is the same, so orbits are identified by interning those
+    sequences.  The whole calculation is linear in the size of the forest, apart from sorting the labels
+    of each vertex's children.
+    """
+    if is_forest(graph) == False:
+        return None
+
+    labels = {}
+    orbit_keys = {}
+    vertex_orbit = {}
+    component_classes = defaultdict(int)
+    groupsize = 1
+
+    for component in _connected_components(graph):
+        centers = _get_tree_centers(graph, component)
+
+        if len(centers) == 1:
+            root = centers[0]
+            (order, parent, vertex_label, factor) = _label_rooted_tree(graph, root, None, labels)
+            component_label = _intern(labels, ('center', vertex_label[root]))
+            groupsize *= factor
+            root_orbits = {root: _intern(orbit_keys, ('root', component_label))}
+            orders = [order]
+        else:
+            (c1, c2) = centers
+            (order1, parent1, label1, factor1) = _label_rooted_tree(graph, c1, c2, labels)
+            (order2, parent2, label2, factor2) = _label_rooted_tree(graph, c2, c1, labels)
+            halves = sorted([label1[c1], label2[c2]])
+            component_label = _intern(labels, ('bicenter', halves[0], halves[1]))
+            groupsize *= factor1 * factor2
+            if label1[c1] == label2[c2]:
+                groupsize *= 2
+            root_orbits = {c1: _intern(orbit_keys, ('root', component_label, label1[c1])),
+                           c2: _intern(orbit_keys, ('root', component_label, label2[c2]))}
+            parent = parent1
+            parent.update(parent2)
+            vertex_label = label1
+            vertex_label.update(label2)
+            orders = [order1, order2]
+
+        component_classes[component_label] += 1
+
+        for order in orders:
+            for v in order:
+                if v in root_orbits:
+                    vertex_orbit[v] = root_orbits[v]
+                else:
+                    vertex_orbit[v] = _intern(orbit_keys, (vertex_orbit[parent[v]], vertex_label[v]))
+
+    for count in component_classes.values():
+        groupsize *= math.factorial(count)
+
+    orbit_sizes = defaultdict(int)
+    for v in graph.nodes_iter():
+        orbit_sizes[vertex_orbit[v]] += 1
+
+    orbitcounts = []
+    seen = set()
+    for v in sorted(graph.nodes()):
+        orbit = vertex_orbit[v]
+        if orbit not in seen:
+            seen.add(orbit)
+            orbitcounts.append(orbit_sizes[orbit])
+
+    try:
+        groupsize = float(groupsize)
+    except OverflowError:
+        log.debug("automorphism group order exceeds the range of a float")
+        groupsize = float("inf")
+
+    results = {}
+    results['orbits'] = len(orbitcounts)
+    results['groupsize'] = groupsize
+    results['orbitcounts'] = orbitcounts
+    return results
+
+
+def _intern(table, key):
+    """
+    Returns a small integer uniquely identifying key, assigning the next one if key is new.
+    """
+    val = table.get(key)
+    if val is None:
+        val = len(table)
+        table[key] = val
+    return val
+
+
+def _connected_components(graph):
+    seen = set()
+    for v in graph.nodes_iter():
+        if v in seen:
+            continue
+        component = [v]
+        seen.add(v)
+        i = 0
+        while i < len(component):
+            for w in graph.neighbors_iter(component[i]):
+                if w not in seen:
+                    seen.add(w)
+                    component.append(w)
+            i += 1
+        yield component
+
+
+def _get_tree_centers(graph, component):
+    """
+    Returns the one or two central vertices of a tree, by repeatedly stripping off its leaves.
+    """
+    if len(component) <= 2:
+        return list(component)
+    degree = dict()
+    leaves = []
+    for v in component:
+        degree[v] = graph.degree(v)
+        if degree[v] <= 1:
+            leaves.append(v)
+    remaining = len(component)
+    while remaining > 2:
+        remaining -= len(leaves)
+        new_leaves = []
+        for leaf in leaves:
+            degree[leaf] = 0
+            for w in graph.neighbors_iter(leaf):
+                if degree[w] > 1:
+                    degree[w] -= 1
+                    if degree[w] == 1:
+                        new_leaves.append(w)
+        leaves = new_leaves
+    return leaves
+
+
+def _label_rooted_tree(graph, root, blocked, labels):
+    """
+    Assigns canonical labels to the subtrees of the tree rooted at root, not crossing into the vertex
+    "blocked".  Returns the vertices in breadth-first order, their parents, their labels, and the order
+    of the automorphism group of the rooted tree.
+    """
+    order = [root]
+    parent = {root: None}
+    i = 0
+    while i < len(order):
+        v = order[i]
+        for w in graph.neighbors_iter(v):
+            if w != parent[v] and w != blocked:
+                parent[w] = v
+                order.append(w)
+        i += 1
+
+    child_labels = defaultdict(list)
+    vertex_label = {}
+    factor = 1
+    for v in reversed(order):
+        children = sorted(child_labels[v])
+        vertex_label[v] = _intern(labels, tuple(children))
+        run = 1
+        for j in range(1, len(children)):
+            if children[j] == children[j - 1]:
+                run += 1
+            else:
+                factor *= math.factorial(run)
+                run = 1
+        factor *= math.factorial(run)
+        if parent[v] is not None:
+            child_labels[parent[v]].append(vertex_label[v])
+    return (order, parent, vertex_label, factor)
+
+
+def get_forest_canonical_form(graph):
+    """
+    Returns a string which is identical for two forests exactly when they are isomorphic, or None if the
+    graph is not a forest.  Each component is encoded as nested parentheses from its center, with the
+    encodings of children sorted (AHU encoding); a component with a central edge is encoded as its two
+    halves, sorted, within square brackets.  The component encodings are then sorted and concatenated.
+    """
+    if is_forest(graph) == False:
+        return None
+
+    component_codes = []
+    for component in _connected_components(graph):
+        centers = _get_tree_centers(graph, component)
+        if len(centers) == 1:
+            component_codes.append(_encode_rooted_tree(graph, centers[0], None))
+        else:
+            (c1, c2) = centers
+            halves = sorted([_encode_rooted_tree(graph, c1, c2), _encode_rooted_tree(graph, c2, c1)])
+            component_codes.append('[' + halves[0] + halves[1] + ']')
+    component_codes.sort()
+    return ''.join(component_codes)
+
+
+def _encode_rooted_tree(graph, root, blocked):
+    order = [root]
+    parent = {root: None}
+    i = 0
+    while i < len(order):
+        v = order[i]
+        for w in graph.neighbors_iter(v):
+            if w != parent[v] and w != blocked:
+                parent[w] = v
+                order.append(w)
+        i += 1
+
+    child_codes = defaultdict(list)
+    code = None
+    for v in reversed(order):
+        children = child_codes.pop(v, [])
+        children.sort()
+        code = '(' + ''.join(children) + ')'
+        if parent[v] is not None:
+            child_codes[parent[v]].append(code)
+    return code
@@ -12,8 +12,12 @@ Description here
 import logging as log
 from axelrod_run_original import AxelrodStatsOriginal, store_stats_axelrod_original
 from axelrod_run_extensible import AxelrodStatsExtensible, store_stats_axelrod_extensible
-from axelrod_run_treestructured import AxelrodStatsTreestructured, store_stats_axelrod_treestructured, updateFieldAxelrodStatsTreestructured
+from axelrod_run_treestructured import AxelrodStatsTreestructured, store_stats_axelrod_treestructured, updateFieldAxelrodStatsTreestructured, \
+    store_snapshot_axelrod_treestructured, find_stats_axelrod_treestructured_after, bulk_update_field_axelrod_treestructured
 from simulation_timing import SimulationTiming, store_simulation_timing
+from sweep_failures import SweepFailure, store_sweep_failure
+from sinks import ResultSink, MongoResultSink, SQLiteResultSink, NDJSONResultSink, BufferedResultSink, set_result_sink, get_result_sink, \
+    configure_result_sink, read_result_file, SINK_TYPES
 from dbutils import *
 
 
@@ -33,3 +37,7 @@ experiment_name = "test"
 
 modules = [axelrod_run_original, axelrod_run_extensible, axelrod_run_treestructured]
 
+# Document classes which can be written to a result sink, and read back from result files for merging.
+
+document_classes = [AxelrodStatsOriginal, AxelrodStatsExtensible, AxelrodStatsTreestructured, SimulationTiming, SweepFailure]
+
@@ -16,6 +16,7 @@ import logging as log
 from ming import Session, Field, schema
 from ming.declarative import Document
 from dbutils import generate_collection_id
+from sinks import get_result_sink
 
 
 __author__ = 'mark'
@@ -36,7 +37,7 @@ def _get_collection_id():
 
 def store_stats_axelrod_extensible(popsize,sim_id,maxinit,add_rate,
                                  driftrate,ruleclass,popclass,script,
-                                 num_cultures,convergence_time,counts,klemm,mean_traits,sd_traits):
+                                 num_cultures,convergence_time,counts,klemm,mean_traits,sd_traits,random_seed=None):
     """Stores the parameters and metadata for a simulation run in the database.
 
         Args:
@@ -53,12 +54,14 @@ def store_stats_axelrod_extensible(popsize,sim_id,maxinit,add_rate,
 
             script (str):  Pathname to the simuPOP simulation script used for this simulation run
 
+            random_seed (int):  Seed from which the run's random number streams were derived, if it was seeded
+
         Returns:
 
             Boolean true:  all PyOperators need to return true.
 
     """
-    AxelrodStatsExtensible(dict(
+    get_result_sink().write(AxelrodStatsExtensible, dict(
         population_size=popsize,
         simulation_run_id=sim_id,
         script_filename=script,
@@ -72,8 +75,9 @@ def store_stats_axelrod_extensible(popsize,sim_id,maxinit,add_rate,
         culture_counts = counts,
         klemm_normalized_L = klemm,
         mean_trait_num = mean_traits,
-        sd_trait_num = sd_traits
-    )).m.insert()
+        sd_trait_num = sd_traits,
+        random_seed = random_seed
+    ))
     return True
 
 
@@ -98,5 +102,6 @@ class AxelrodStatsExtensible(Document):
     klemm_normalized_L = Field(float)
     mean_trait_num = Field(float)
     sd_trait_num = Field(float)
+    random_seed = Field(int)
 
 
@@ -16,6 +16,7 @@ import logging as log
 from ming import Session, Field, schema
 from ming.declarative import Document
 from dbutils import generate_collection_id
+from sinks import get_result_sink
 
 
 __author__ = 'mark'
@@ -36,7 +37,7 @@ def _get_collection_id():
 
 def store_stats_axelrod_original(popsize,sim_id,nf,nt,
                                  driftrate,ruleclass,popclass,script,
-                                 num_cultures,convergence_time,counts,klemm):
+                                 num_cultures,convergence_time,counts,klemm,random_seed=None):
     """Stores the parameters and metadata for a simulation run in the database.
 
         Args:
@@ -53,12 +54,14 @@ def store_stats_axelrod_original(popsize,sim_id,nf,nt,
 
             script (str):  Pathname to the simuPOP simulation script used for this simulation run
 
+            random_seed (int):  Seed from which the run's random number streams were derived, if it was seeded
+
         Returns:
 
             Boolean true:  all PyOperators need to return true.
 
     """
-    AxelrodStatsOriginal(dict(
+    get_result_sink().write(AxelrodStatsOriginal, dict(
         population_size=popsize,
         simulation_run_id=sim_id,
         script_filename=script,
@@ -70,8 +73,9 @@ def store_stats_axelrod_original(popsize,sim_id,nf,nt,
         num_culture_regions = num_cultures,
         convergence_time = convergence_time,
         culture_counts = counts,
-        klemm_normalized_L = klemm
-    )).m.insert()
+        klemm_normalized_L = klemm,
+        random_seed = random_seed
+    ))
     return True
 
 
@@ -94,5 +98,6 @@ class AxelrodStatsOriginal(Document):
     culture_counts = Field([dict(cultureid=str,count=int)])
     convergence_time = Field(int)
     klemm_normalized_L = Field(float)
+    random_seed = Field(int)
 
 
@@ -15,7 +15,10 @@
 import logging as log
 from ming import Session, Field, schema
 from ming.declarative import Document
+from pymongo import UpdateOne
+from bson.binary import Binary
 from dbutils import generate_collection_id
+from sinks import get_result_sink
 
 
 __author__ = 'mark'
@@ -40,14 +43,44 @@ def updateFieldAxelrodStatsTreestructured(record_id, field_name, value):
 
 
 
+def find_stats_axelrod_treestructured_after(last_id, fields, batch_size=1000):
+    """
+    Returns a cursor over raw sample documents with ID's greater than last_id (all documents if last_id
+    is None), in ID order, fetching only the given fields.  Iterating in ID order lets a long pass over
+    the collection be resumed from the last ID it completed.
+    """
+    spec = dict()
+    if last_id is not None:
+        spec['_id'] = {'$gt': last_id}
+    collection = AxelrodStatsTreestructured.m.collection
+    return collection.find(spec, projection=fields, batch_size=batch_size).sort('_id', 1)
+
+
+def bulk_update_field_axelrod_treestructured(field_name, updates):
+    """
+    Sets field_name on many sample documents in a single round trip.  updates is a list of
+    (record_id, value) tuples.
+    """
+    if len(updates) == 0:
+        return
+    requests = [UpdateOne({'_id': record_id}, {'$set': {field_name: value}}) for (record_id, value) in updates]
+    AxelrodStatsTreestructured.m.collection.bulk_write(requests, ordered=False)
+
+
 def store_stats_axelrod_treestructured(popsize,sim_id,maxinit,learning_rate,
                                  loss_rate, innov_rate, num_trees, branching, depth,ruleclass,popclass,networkclass,script,
                                  num_cultures,trait_spectrum,convergence_time,sample_time,counts,klemm,mean_traits,sd_traits,graphml_blobs,
-                                 trait_stats,trait_rich,trait_entropy,final,swrewiring):
+                                 trait_stats,trait_rich,trait_entropy,final,swrewiring,trait_bitmaps=None,random_seed=None):
     """Stores the parameters and metadata for a simulation run in the database.
 
+    trait_bitmaps is a list of dicts with keys cultureid and bitmap, the latter the byte string from
+    encode_trait_bitmap(), and is the compact alternative to graphml_blobs for saving trait graphs.
+    random_seed is the seed from which the run's random number streams were derived, if it was seeded.
     """
-    AxelrodStatsTreestructured(dict(
+    if trait_bitmaps is None:
+        trait_bitmaps = []
+    stored_bitmaps = [dict(cultureid=b['cultureid'], bitmap=Binary(b['bitmap'])) for b in trait_bitmaps]
+    get_result_sink().write(AxelrodStatsTreestructured, dict(
         population_size=popsize,
         simulation_run_id=sim_id,
         script_filename=script,
@@ -70,17 +103,55 @@ def store_stats_axelrod_treestructured(popsize,sim_id,maxinit,learning_rate,
         mean_trait_num = mean_traits,
         sd_trait_num = sd_traits,
         culture_graphml_repr = graphml_blobs,
+        culture_trait_bitmaps = stored_bitmaps,
         trait_graph_stats = trait_stats,
         trait_richness = trait_rich,
         trait_evenness_entropy = trait_entropy,
         run_finalized = final,
-        sw_rewiring_prob = swrewiring
+        sw_rewiring_prob = swrewiring,
+        random_seed = random_seed
 
 
-    )).m.insert()
+    ))
     return True
 
 
+def store_snapshot_axelrod_treestructured(simconfig, snapshot, convergence_time, sample_time, graphml_blobs,
+                                          trait_stats, final, trait_bitmaps=None):
+    """Stores a PopulationSnapshot of a tree-structured model, along with the parameters of the simulation run.
+
+    """
+    return store_stats_axelrod_treestructured(simconfig.popsize,
+                                              simconfig.sim_id,
+                                              simconfig.maxtraits,
+                                              simconfig.learning_rate,
+                                              simconfig.loss_rate,
+                                              simconfig.innov_rate,
+                                              simconfig.num_trees,
+                                              simconfig.branching_factor,
+                                              simconfig.depth_factor,
+                                              simconfig.INTERACTION_RULE_CLASS,
+                                              simconfig.POPULATION_STRUCTURE_CLASS,
+                                              simconfig.NETWORK_FACTORY_CLASS,
+                                              simconfig.script,
+                                              snapshot.get_num_cultures(),
+                                              snapshot.trait_spectrum,
+                                              convergence_time,
+                                              sample_time,
+                                              snapshot.culture_counts_dbformat,
+                                              snapshot.klemm,
+                                              snapshot.mean_traits,
+                                              snapshot.sd_traits,
+                                              graphml_blobs,
+                                              trait_stats,
+                                              snapshot.trait_richness,
+                                              None,
+                                              final,
+                                              simconfig.ws_rewiring,
+                                              trait_bitmaps,
+                                              simconfig.random_seed)
+
+
 def columns_to_export_for_analysis():
     cols = [
         "simulation_run_id",
@@ -133,6 +204,7 @@ class AxelrodStatsTreestructured(Document):
     mean_trait_num = Field(float)
     sd_trait_num = Field(float)
     culture_graphml_repr = Field([dict(cultureid=str,content=str)])
+    culture_trait_bitmaps = Field([dict(cultureid=str,bitmap=schema.Binary)])
     trait_graph_stats = Field([dict(cultureid=str,
                                     culture_count=int,
                                     orbit_multiplicities=[int],
@@ -154,6 +226,7 @@ class AxelrodStatsTreestructured(Document):
     trait_richness = Field(float)
     trait_evenness_entropy = Field(float)
     sw_rewiring_prob = Field(float)
+    random_seed = Field(int)
     #trait_freq = Field()
     run_finalized = Field(int)
 
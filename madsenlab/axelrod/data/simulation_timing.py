@@ -16,6 +16,7 @@ import logging as log
 from ming import Session, Field, schema
 from ming.declarative import Document
 from dbutils import generate_collection_id
+from sinks import get_result_sink
 
 
 __author__ = 'mark'
@@ -39,7 +40,7 @@ def store_simulation_timing(sim_id,ruleclass,popclass,script,exp,elapsed,length)
     """Stores the parameters and metadata for a simulation run in the database.
 
     """
-    SimulationTiming(dict(
+    get_result_sink().write(SimulationTiming, dict(
         script_filename = script,
         rule_class = ruleclass,
         pop_class = popclass,
@@ -47,7 +48,7 @@ def store_simulation_timing(sim_id,ruleclass,popclass,script,exp,elapsed,length)
         experiment_name = exp,
         elapsed_time = elapsed,
         run_length = length
-    )).m.insert()
+    ))
     return True
 
 
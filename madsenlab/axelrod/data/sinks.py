@@ -0,0 +1,366 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Result sinks, which receive the documents produced by the store_* functions and write them to MongoDB, or to
+local SQLite or newline-delimited JSON files which can be merged into MongoDB after a sweep.
+
+"""
+
+import logging as log
+import atexit
+import os
+import sqlite3
+import threading
+import time
+import Queue
+from bson import json_util
+from bson.objectid import ObjectId
+from ming import schema
+
+
+SINK_TYPES = ['mongo', 'sqlite', 'ndjson']
+
+_result_sink = None
+
+
+def set_result_sink(sink):
+    """
+    Sets the sink used by all of the store_* functions, closing (and thus flushing) any previous sink.  The
+    sink is also closed when the process exits, so that a partial batch is not lost.
+    """
+    global _result_sink
+    if _result_sink is not None and _result_sink is not sink:
+        _result_sink.close()
+    _result_sink = sink
+    if sink is not None:
+        atexit.register(sink.close)
+
+
+def get_result_sink():
+    """
+    Returns the current result sink, which is an unbatched MongoDB sink unless the simulation has chosen
+    another with set_result_sink() or configure_result_sink().
+    """
+    global _result_sink
+    if _result_sink is None:
+        _result_sink = MongoResultSink()
+    return _result_sink
+
+
+def configure_result_sink(sink_type, path=None, batch_size=100, per_process=False, background=False,
+                          max_pending=1000, flush_interval=30.0):
+    """
+    Constructs and installs a sink from command line arguments.  sink_type is one of SINK_TYPES; the file
+    based sinks require a path.  Worker processes which share a path should pass per_process=True, which gives
+    each worker its own NDJSON file (path.<pid>); SQLite files can be shared, since SQLite locks the file.
+    With background=True, the sink is wrapped in a BufferedResultSink so that writes happen on a separate
+    thread.
+    """
+    if per_process == True and sink_type == 'ndjson' and path is not None:
+        path = "%s.%s" % (path, os.getpid())
+    if sink_type == 'mongo':
+        sink = MongoResultSink(batch_size=batch_size)
+    elif sink_type == 'sqlite':
+        sink = SQLiteResultSink(path, batch_size=batch_size)
+    elif sink_type == 'ndjson':
+        sink = NDJSONResultSink(path, batch_size=batch_size)
+    else:
+        raise ValueError("Unknown result sink type: %s" % sink_type)
+    if background == True:
+        sink = BufferedResultSink(sink, max_pending=max_pending, flush_interval=flush_interval)
+    set_result_sink(sink)
+    return sink
+
+
+def get_document_manager(doc_class):
+    """
+    Returns the Ming class manager of a document class, which holds its schema, fields and collection name.
+    The manager is taken from the class rather than through doc_class.m, since once Ming is configured, every
+    access to doc_class.m ensures the collection's indexes, and thus connects to MongoDB.  The file sinks
+    must work without a database server.
+    """
+    for cls in doc_class.__mro__:
+        descriptor = cls.__dict__.get('m')
+        if descriptor is not None:
+            return descriptor.manager
+    raise ValueError("%s is not a Ming document class" % doc_class.__name__)
+
+
+class ResultSink(object):
+    """
+    Base class for result sinks.  Documents are validated against the schema of their Ming document class
+    when they are written, exactly as they would be when inserted directly, and are then buffered and
+    written in batches of batch_size.  Subclasses implement _write_batch().
+    """
+
+    def __init__(self, batch_size=1):
+        self.batch_size = batch_size
+        self.pending = []
+
+    def write(self, doc_class, document):
+        doc = get_document_manager(doc_class).make(document)
+        self.pending.append((doc_class, doc))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+        return True
+
+    def flush(self):
+        if len(self.pending) == 0:
+            return
+        batches = dict()
+        order = []
+        for (doc_class, doc) in self.pending:
+            if doc_class not in batches:
+                batches[doc_class] = []
+                order.append(doc_class)
+            batches[doc_class].append(doc)
+        self.pending = []
+        for doc_class in order:
+            self._write_batch(doc_class, batches[doc_class])
+
+    def close(self):
+        self.flush()
+
+    def _write_batch(self, doc_class, docs):
+        raise NotImplementedError
+
+
+class MongoResultSink(ResultSink):
+    """
+    Writes documents to the MongoDB collections configured for each document class through Ming.
+    """
+
+    def _write_batch(self, doc_class, docs):
+        doc_class.m.collection.insert_many(docs, ordered=False)
+
+
+def get_document_columns(doc_class):
+    """
+    Returns a list of (field name, SQLite column type, is_nested) for a Ming document class, with _id first.
+    Nested fields (lists and subdocuments) are stored as MongoDB extended JSON.
+    """
+    columns = []
+    for name, field in sorted(get_document_manager(doc_class).field_index.items()):
+        if field.type in (int, long, bool):
+            columns.append((name, 'INTEGER', False))
+        elif field.type == float:
+            columns.append((name, 'REAL', False))
+        elif field.type in (str, unicode) or field.type == schema.ObjectId:
+            columns.append((name, 'TEXT', False))
+        else:
+            columns.append((name, 'TEXT', True))
+    columns.sort(key=lambda c: c[0] != '_id')
+    return columns
+
+
+class SQLiteResultSink(ResultSink):
+    """
+    Writes documents to a SQLite database file, one table per document collection, with one column per
+    document field.
+    """
+
+    def __init__(self, path, batch_size=100):
+        super(SQLiteResultSink, self).__init__(batch_size)
+        if path is None:
+            raise ValueError("SQLite result sink requires a file path")
+        self.path = path
+        self.db = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.tables = dict()
+
+    def _get_table(self, doc_class):
+        name = get_document_manager(doc_class).collection_name
+        if name not in self.tables:
+            columns = get_document_columns(doc_class)
+            coldefs = []
+            for (colname, coltype, nested) in columns:
+                if colname == '_id':
+                    coldefs.append('"_id" TEXT PRIMARY KEY')
+                else:
+                    coldefs.append('"%s" %s' % (colname, coltype))
+            self.db.execute('CREATE TABLE IF NOT EXISTS "%s" (%s)' % (name, ", ".join(coldefs)))
+            self.tables[name] = columns
+        return (name, self.tables[name])
+
+    def _write_batch(self, doc_class, docs):
+        (name, columns) = self._get_table(doc_class)
+        placeholders = ", ".join(['?'] * len(columns))
+        colnames = ", ".join('"%s"' % c[0] for c in columns)
+        rows = []
+        for doc in docs:
+            row = []
+            for (colname, coltype, nested) in columns:
+                val = doc.get(colname)
+                if val is None:
+                    row.append(None)
+                elif nested:
+                    row.append(json_util.dumps(val))
+                elif isinstance(val, ObjectId):
+                    row.append(str(val))
+                else:
+                    row.append(val)
+            rows.append(row)
+        self.db.executemany('INSERT OR REPLACE INTO "%s" (%s) VALUES (%s)' % (name, colnames, placeholders), rows)
+        self.db.commit()
+
+    def close(self):
+        if self.db is not None:
+            self.flush()
+            self.db.close()
+            self.db = None
+
+
+class NDJSONResultSink(ResultSink):
+    """
+    Appends documents to a file as MongoDB extended JSON, one document per line, each line recording the
+    collection the document belongs to.
+    """
+
+    def __init__(self, path, batch_size=100):
+        super(NDJSONResultSink, self).__init__(batch_size)
+        if path is None:
+            raise ValueError("NDJSON result sink requires a file path")
+        self.path = path
+        self.output = open(path, 'a')
+
+    def _write_batch(self, doc_class, docs):
+        name = get_document_manager(doc_class).collection_name
+        for doc in docs:
+            self.output.write(json_util.dumps(dict(collection=name, document=doc)))
+            self.output.write('\n')
+        self.output.flush()
+
+    def close(self):
+        if self.output is not None:
+            self.flush()
+            self.output.close()
+            self.output = None
+
+
+class BufferedResultSink(ResultSink):
+    """
+    Wraps another sink, passing documents to it on a background thread so that the simulation never waits
+    on validation or database I/O.  Documents are handed over through a queue of at most max_pending entries;
+    if the destination falls that far behind, write() blocks until there is room again, which keeps memory
+    bounded.  The wrapped sink still does its own batching, and any partial batch is written once it has been
+    waiting flush_interval seconds.  flush() waits until everything written so far has reached the wrapped
+    sink's destination.  An error on the writer thread is raised again from the next write(), flush() or
+    close() call.
+    """
+
+    _FLUSH = object()
+    _CLOSE = object()
+
+    def __init__(self, sink, max_pending=1000, flush_interval=30.0):
+        super(BufferedResultSink, self).__init__(batch_size=1)
+        self.sink = sink
+        self.flush_interval = flush_interval
+        self.queue = Queue.Queue(maxsize=max_pending)
+        self.error = None
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name="result-writer")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def write(self, doc_class, document):
+        self._check_error()
+        self.queue.put((doc_class, document))
+        return True
+
+    def flush(self):
+        if self.closed == True:
+            return
+        self.queue.put(self._FLUSH)
+        self.queue.join()
+        self._check_error()
+
+    def close(self):
+        if self.closed == True:
+            return
+        self.closed = True
+        self.queue.put(self._CLOSE)
+        self.thread.join()
+        self._check_error()
+
+    def _check_error(self):
+        if self.error is not None:
+            error = self.error
+            self.error = None
+            raise error
+
+    def _run(self):
+        last_flush = time.time()
+        while True:
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+                from_queue = True
+            except Queue.Empty:
+                item = self._FLUSH
+                from_queue = False
+            try:
+                if item is self._CLOSE:
+                    self.sink.close()
+                else:
+                    if item is not self._FLUSH:
+                        self.sink.write(item[0], item[1])
+                    if item is self._FLUSH or time.time() - last_flush >= self.flush_interval:
+                        self.sink.flush()
+                        last_flush = time.time()
+            except Exception as e:
+                log.error("Result writer failed: %s", e)
+                self.error = e
+            finally:
+                if from_queue == True:
+                    self.queue.task_done()
+            if item is self._CLOSE:
+                return
+
+
+def read_result_file(path, doc_classes):
+    """
+    Yields (document class, document) for every document in a file written by SQLiteResultSink or
+    NDJSONResultSink, for merging into another sink.  doc_classes lists the Ming document classes that may
+    appear in the file; documents of any other collection are skipped.
+    """
+    by_name = dict((get_document_manager(doc_class).collection_name, doc_class) for doc_class in doc_classes)
+
+    with open(path, 'rb') as f:
+        is_sqlite = f.read(16) == 'SQLite format 3\x00'
+
+    if is_sqlite == False:
+        with open(path, 'r') as f:
+            for line in f:
+                if line.strip() == '':
+                    continue
+                entry = json_util.loads(line)
+                doc_class = by_name.get(entry['collection'])
+                if doc_class is None:
+                    log.error("Skipping document from unknown collection %s", entry['collection'])
+                    continue
+                yield (doc_class, entry['document'])
+        return
+
+    db = sqlite3.connect(path)
+    tables = [row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+    for table in tables:
+        doc_class = by_name.get(table)
+        if doc_class is None:
+            log.error("Skipping table for unknown collection %s", table)
+            continue
+        nested_columns = set(c[0] for c in get_document_columns(doc_class) if c[2] == True)
+        cursor = db.execute('SELECT * FROM "%s"' % table)
+        colnames = [d[0] for d in cursor.description]
+        for row in cursor:
+            doc = dict()
+            for colname, val in zip(colnames, row):
+                if val is None:
+                    continue
+                if colname == '_id':
+                    val = ObjectId(val)
+                elif colname in nested_columns:
+                    val = json_util.loads(val)
+                doc[colname] = val
+            yield (doc_class, doc)
+    db.close()
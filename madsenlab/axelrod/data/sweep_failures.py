@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+.. module:: sweep_failures
+    :platform: Unix, Windows
+    :synopsis: Data object recording the parameter sweep tasks which failed on every attempt, via the Ming ORM.
+
+.. moduleauthor:: Mark E. Madsen <mark@madsenlab.org>
+
+"""
+
+import logging as log
+from ming import Session, Field, schema
+from ming.declarative import Document
+from dbutils import generate_collection_id
+from sinks import get_result_sink
+
+
+__author__ = 'mark'
+
+def _get_dataobj_id():
+    """
+        Returns the short handle used for this data object in Ming configuration
+    """
+    return 'simulations'
+
+def _get_collection_id():
+    """
+    :return: returns the collection name for this data object
+    """
+    return generate_collection_id("_samples_raw")
+
+
+
+
+def store_sweep_failure(exp, script, params, replicate, attempts, error, trace):
+    """Stores the parameters of a sweep task which failed on every attempt, and its final error.
+
+    """
+    get_result_sink().write(SweepFailure, dict(
+        experiment_name = exp,
+        script_filename = script,
+        parameters = params,
+        replicate = replicate,
+        attempts = attempts,
+        error = error,
+        traceback = trace
+    ))
+    return True
+
+
+class SweepFailure(Document):
+
+    class __mongometa__:
+        session = Session.by_name(_get_dataobj_id())
+        name = 'sweep_failures'
+
+    _id = Field(schema.ObjectId)
+    experiment_name = Field(str)
+    script_filename = Field(str)
+    parameters = Field([float])
+    replicate = Field(int)
+    attempts = Field(int)
+    error = Field(str)
+    traceback = Field(str)
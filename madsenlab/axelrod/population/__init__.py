@@ -9,5 +9,10 @@ Description here
 """
 from lattice_models import SquareLatticeFactory
 from base_population_classes import FixedTraitStructurePopulation, ExtensibleTraitStructurePopulation,\
-    TreeTraitStructurePopulation
-from watts_strogatz_sw import WattsStrogatzSmallWorldFactory
\ No newline at end of file
+    TreeTraitStructurePopulation, FixedTraitArrayPopulation, TreeTraitBitsetPopulation, ExtensibleTraitBitsetPopulation, \
+    TreeTraitIndexedPopulation, ExtensibleTraitIndexedPopulation, TreeTraitInternedPopulation, \
+    ExtensibleTraitInternedPopulation
+from watts_strogatz_sw import WattsStrogatzSmallWorldFactory
+from fingerprints import CultureFingerprintTracker, get_trait_set_fingerprint, get_trait_list_fingerprint
+from culture_table import CultureTable, CultureRecord
+from missing_traits import MissingTraitTracker
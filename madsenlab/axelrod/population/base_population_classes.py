@@ -9,22 +9,36 @@ Description here
 """
 
 import logging as log
+import array
 import networkx as nx
 import madsenlab.axelrod.utils.configuration
 import numpy as np
 import math as m
 import pprint as pp
 import matplotlib.pyplot as plt
-from numpy.random import RandomState
+from madsenlab.axelrod.traits.bitset import num_words_for_traits, set_bitset_words
+from madsenlab.axelrod.traits.indexed import IndexedTraitSet, get_random_trait
+from fingerprints import CultureFingerprintTracker, get_trait_set_fingerprint, get_trait_list_fingerprint
+from culture_table import CultureTable
+from missing_traits import MissingTraitTracker
 
 ###################################################################################
 
 class BaseGraphPopulation(object):
     """
-    Base class for all Axelrod model populations that use a graph (NetworkX) representation to
-    store the relations between agents.  Methods here need to be independent of the trait representation,
-    but can assume that the agents are nodes in a Graph.  Thus, most of the "agent selection" and
-    "neighbor" methods are concentrated here.
+    Base class for all Axelrod model populations that use a graph to store the relations between agents.
+    Methods here need to be independent of the trait representation, but can assume that the agents are
+    nodes in a graph, labeled 0..N-1.  Thus, most of the "agent selection" and "neighbor" methods are
+    concentrated here.
+
+    The NetworkX graph produced by the graph factory is compiled once into an edge table, edges, which holds
+    each undirected edge as a (lower id, higher id) row in sorted order, and into CSR (compressed sparse row)
+    arrays:  the neighbors of agent i are neighbor_indices[neighbor_offsets[i]:neighbor_offsets[i+1]], in
+    ascending order.  Agent traits are kept in the list agent_traits, indexed by agent ID.  Once the population
+    is initialized the factory's graph is released, since its per-node and per-edge dicts dominate the memory
+    of large populations, and agentgraph is rebuilt from the arrays only if something asks for it (e.g.,
+    drawing the network).  Each rebuilt node's 'traits' attribute is the agent's trait set, kept current by
+    store_agent_traits().
     """
 
     def __init__(self,simconfig,graph_factory,trait_factory):
@@ -33,16 +47,75 @@ class BaseGraphPopulation(object):
         self.innovations = 0
         self.losses = 0
         self.time_step_last_interaction = 0
-        self.prng = RandomState()  # allow the library to choose a seed via OS specific mechanism
+        self.prng = simconfig.get_random_stream('population')
         self.graph_factory = graph_factory
         self.trait_factory = trait_factory
+        self.observers = []
+        self.fingerprint_tracker = None
+
+        # initialize the graph structure via the factory object, and compile it into arrays
+        graph = self.graph_factory.get_graph()
+        self.num_agents = graph.number_of_nodes()
+        self.positions = [graph.node[nodename].get('pos') for nodename in range(0, self.num_agents)]
+        self.set_edges(graph.edges())
+        self.agent_traits = [None] * self.num_agents
+        # the trait factory initializes the population on the factory's graph, which is kept until then
+        self._agentgraph = graph
+
+    @property
+    def agentgraph(self):
+        """
+        NetworkX graph of the population, rebuilt from the edge table if it has been released.
+        """
+        if self._agentgraph is None:
+            graph = nx.Graph()
+            for agent_id in range(0, self.num_agents):
+                graph.add_node(agent_id, traits=self.agent_traits[agent_id])
+                if self.positions[agent_id] is not None:
+                    graph.node[agent_id]['pos'] = self.positions[agent_id]
+            graph.add_edges_from(self.edges.tolist())
+            self._agentgraph = graph
+        return self._agentgraph
+
+    def release_agentgraph(self):
+        self._agentgraph = None
+
+    def set_edges(self, edges):
+        """
+        Replaces the relations between agents with the given edges, and recompiles the edge table and neighbor
+        arrays from them.
+        """
+        self.edges = compile_edge_table(edges)
+        self.num_edges = len(self.edges)
+        (self.neighbor_offsets, self.neighbor_indices) = compile_csr_adjacency(self.num_agents, self.edges)
+        self.degrees = np.diff(self.neighbor_offsets)
+        # indexing NumPy arrays one element at a time is several times slower than indexing an array.array, so
+        # neighbor selection at each step uses copies of the neighbor arrays
+        self._neighbor_offsets = array.array('l', self.neighbor_offsets.tolist())
+        self._neighbor_indices = array.array('l', self.neighbor_indices.tolist())
+        self._agentgraph = None
+
+    def store_agent_traits(self, agent_id, agent_traits):
+        """
+        Stores the trait set (or list) which represents an agent's traits, keeping the node of the agent graph
+        current if the graph has been built.
+        """
+        self.agent_traits[agent_id] = agent_traits
+        if self._agentgraph is not None:
+            self._agentgraph.node[agent_id]['traits'] = agent_traits
 
-        # initialize the graph structure via the factory object
-        self.agentgraph = self.graph_factory.get_graph()
-
+    def collect_agent_traits(self):
+        """
+        Takes the agent traits which the trait factory has stored on the nodes of the agent graph, and releases
+        the graph.
+        """
+        graph = self.agentgraph
+        for agent_id in range(0, self.num_agents):
+            self.agent_traits[agent_id] = graph.node[agent_id]['traits']
+        self.release_agentgraph()
 
     def get_agent_by_id(self, agent_id):
-        return (agent_id, self.agentgraph.node[agent_id]['traits'])
+        return (agent_id, self.agent_traits[agent_id])
 
     def get_random_agent(self):
         """
@@ -51,7 +124,7 @@ class BaseGraphPopulation(object):
 
         To modify the traits, change one or more elements in the array, and then call set_agent_traits(agent_id, new_list)
         """
-        rand_agent_id = self.prng.randint(0, self.simconfig.popsize)
+        rand_agent_id = self.prng.randint(0, self.num_agents)
         return self.get_agent_by_id(rand_agent_id)
 
     def get_random_neighbor_for_agent(self, agent_id):
@@ -59,13 +132,13 @@ class BaseGraphPopulation(object):
         Returns a random agent chosen from among the neighbors of agent_id.  The format is the same as
         get_random_agent -- a two element tuple with the neighbor's ID and their trait list.
         """
-        neighbor_list = self.agentgraph.neighbors(agent_id)
-        num_neighbors = len(neighbor_list)
-        rand_neighbor_id = neighbor_list[self.prng.randint(0,num_neighbors)]
+        start = self._neighbor_offsets[agent_id]
+        num_neighbors = self._neighbor_offsets[agent_id + 1] - start
+        rand_neighbor_id = self._neighbor_indices[start + self.prng.randint(0, num_neighbors)]
         return self.get_agent_by_id(rand_neighbor_id)
 
     def get_all_neighbors_for_agent(self, agent_id):
-        return self.agentgraph.neighbors(agent_id)
+        return self._neighbor_indices[self._neighbor_offsets[agent_id]:self._neighbor_offsets[agent_id + 1]].tolist()
 
 
     def get_coordination_number(self):
@@ -95,6 +168,88 @@ class BaseGraphPopulation(object):
 
     def initialize_population(self):
         self.trait_factory.initialize_population(self.agentgraph)
+        self.collect_agent_traits()
+
+    def add_observer(self, observer):
+        """
+        Registers an object which is notified of changes to agent trait sets, through its trait_added(agent_id, trait),
+        trait_removed(agent_id, trait) and trait_replaced(agent_id, old_trait, new_trait) methods.  Rules
+        call the notify_* methods below after each change they make.
+        """
+        self.observers.append(observer)
+
+    def track_fingerprints(self):
+        """
+        Starts keeping each agent's culture fingerprint current as the rules change its traits, so that
+        get_agent_culture() is a lookup.  Only for the set-valued models, whose rules notify every change.
+        """
+        if self.fingerprint_tracker is None:
+            self.fingerprint_tracker = CultureFingerprintTracker(self)
+            self.add_observer(self.fingerprint_tracker)
+        return self.fingerprint_tracker
+
+    def get_agent_culture(self, agent_id):
+        """
+        Returns the culture ID of an agent, which is get_traits_packed() of its traits.
+        """
+        if self.fingerprint_tracker is not None:
+            return self.fingerprint_tracker[agent_id]
+        return self.get_traits_packed(self.agent_traits[agent_id])
+
+    def add_agent_trait(self, agent_id, trait):
+        """
+        Adds a trait to an agent's trait set and notifies the observers.  Returns the agent's trait set, which
+        populations that do not modify trait sets in place (see TreeTraitInternedPopulation) replace.
+        """
+        agent_traits = self.agent_traits[agent_id]
+        agent_traits.add(trait)
+        self.set_agent_traits(agent_id, agent_traits)
+        self.notify_trait_added(agent_id, trait)
+        return agent_traits
+
+    def remove_agent_trait(self, agent_id, trait):
+        agent_traits = self.agent_traits[agent_id]
+        agent_traits.remove(trait)
+        self.set_agent_traits(agent_id, agent_traits)
+        self.notify_trait_removed(agent_id, trait)
+        return agent_traits
+
+    def replace_agent_trait(self, agent_id, old_trait, new_trait):
+        agent_traits = self.agent_traits[agent_id]
+        agent_traits.remove(old_trait)
+        agent_traits.add(new_trait)
+        self.set_agent_traits(agent_id, agent_traits)
+        self.notify_trait_replaced(agent_id, old_trait, new_trait)
+        return agent_traits
+
+    def get_random_agent_trait(self, agent_id):
+        """
+        Returns a uniformly random trait of an agent with at least one trait, as get_random_trait() draws it
+        from the agent's trait set.
+        """
+        return get_random_trait(self.agent_traits[agent_id])
+
+    def rebuild_agent_traits(self):
+        """
+        Rebuilds the agents' trait sets so that their iteration order depends only on their traits.  The order
+        in which a built-in set iterates depends on its history, and so do the traits random.sample() draws from
+        it, and from the sets computed from it.  Checkpoints rebuild the sets of the running simulation when
+        they are saved, and the restored sets when they are loaded, so a resumed run draws the same traits as
+        the run it continues.  Populations whose traits are not sets have nothing to rebuild.
+        """
+        pass
+
+    def notify_trait_added(self, agent_id, trait):
+        for observer in self.observers:
+            observer.trait_added(agent_id, trait)
+
+    def notify_trait_removed(self, agent_id, trait):
+        for observer in self.observers:
+            observer.trait_removed(agent_id, trait)
+
+    def notify_trait_replaced(self, agent_id, old_trait, new_trait):
+        for observer in self.observers:
+            observer.trait_replaced(agent_id, old_trait, new_trait)
 
     ### Abstract methods - derived classes need to override
     def draw_network_colored_by_culture(self):
@@ -116,13 +271,37 @@ class TreeTraitStructurePopulation(BaseGraphPopulation):
     """
     def __init__(self, simconfig,graph_factory,trait_factory):
         super(TreeTraitStructurePopulation, self).__init__(simconfig,graph_factory,trait_factory)
+        self.missing_trait_tracker = None
 
     def set_agent_traits(self, agent_id, trait_set):
-        self.agentgraph.node[agent_id]['traits'] = trait_set
+        self.store_agent_traits(agent_id, trait_set)
+
+    def track_missing_traits(self):
+        """
+        Starts counting each agent's traits by block of the trait universe, so that the traits an agent lacks
+        are ranked without sorting its trait set.  See MissingTraitTracker.
+        """
+        if self.missing_trait_tracker is None:
+            self.missing_trait_tracker = MissingTraitTracker(self, self.trait_universe.graph.number_of_nodes())
+            self.add_observer(self.missing_trait_tracker)
+        return self.missing_trait_tracker
+
+    def get_random_trait_not_in_agent(self, agent_id):
+        """
+        Returns a uniformly random trait which the agent does not possess, as the trait universe's
+        get_random_trait_not_in_set() draws it.  When the agent holds so much of the universe that the draw
+        falls back to ranking the traits it lacks, the ranking is done by a MissingTraitTracker, which is
+        started the first time it is needed.
+        """
+        return self.trait_universe.get_random_trait_not_in_set(
+            self.agent_traits[agent_id],
+            lambda rank: self.track_missing_traits().get_missing_trait_by_rank(agent_id, rank))
 
     def get_traits_packed(self,agent_traits):
-        hashable_set = frozenset(agent_traits)
-        return hash(hashable_set)
+        return get_trait_set_fingerprint(agent_traits)
+
+    def rebuild_agent_traits(self):
+        rebuild_trait_sets(self)
 
     def draw_network_colored_by_culture(self):
         nodes, traits = zip(*nx.get_node_attributes(self.agentgraph, 'traits').items())
@@ -141,19 +320,162 @@ class TreeTraitStructurePopulation(BaseGraphPopulation):
         """
         self.trait_universe = self.trait_factory.initialize_traits()
         self.trait_factory.initialize_population(self.agentgraph)
+        self.collect_agent_traits()
 
 
     def __repr__(self):
         rep = 'TreeTraitStructurePopulation: ['
-        for nodename in self.agentgraph.nodes():
+        for nodename in range(0, self.num_agents):
             rep += "node %s: " % nodename
-            rep += pp.pformat(self.agentgraph.node[nodename]['traits'])
+            rep += pp.pformat(self.agent_traits[nodename])
             rep += ",\n"
         rep += ' ]'
         return rep
 
 
 
+###################################################################################
+
+class TreeTraitBitsetPopulation(TreeTraitStructurePopulation):
+    """
+    Version of TreeTraitStructurePopulation which also keeps every agent's traits as a bitset over the trait
+    universe, in one row of a shared (N, words) uint64 matrix, trait_bits.  The agents' traits are still
+    ordinary sets, which the rules use as before, so the matrix costs a word update per trait change; in
+    return the analysis code computes overlaps for all edges at once from the matrix, instead of visiting
+    every agent's set.  Rules change traits through add_agent_trait(), remove_agent_trait() and
+    replace_agent_trait(), which keep the matrix current.
+    """
+    def __init__(self, simconfig,graph_factory,trait_factory):
+        super(TreeTraitBitsetPopulation, self).__init__(simconfig,graph_factory,trait_factory)
+        self.trait_bits = None
+
+    def initialize_population(self):
+        super(TreeTraitBitsetPopulation, self).initialize_population()
+        num_traits = self.trait_universe.graph.number_of_nodes()
+        self.trait_bits = pack_bitset_traits(self, num_traits)
+
+    def set_agent_traits(self, agent_id, trait_set):
+        set_bitset_traits(self, agent_id, trait_set)
+
+    def add_agent_trait(self, agent_id, trait):
+        agent_traits = super(TreeTraitBitsetPopulation, self).add_agent_trait(agent_id, trait)
+        set_trait_bit(self.trait_bits, agent_id, trait)
+        return agent_traits
+
+    def remove_agent_trait(self, agent_id, trait):
+        agent_traits = super(TreeTraitBitsetPopulation, self).remove_agent_trait(agent_id, trait)
+        clear_trait_bit(self.trait_bits, agent_id, trait)
+        return agent_traits
+
+    def replace_agent_trait(self, agent_id, old_trait, new_trait):
+        agent_traits = super(TreeTraitBitsetPopulation, self).replace_agent_trait(agent_id, old_trait, new_trait)
+        clear_trait_bit(self.trait_bits, agent_id, old_trait)
+        set_trait_bit(self.trait_bits, agent_id, new_trait)
+        return agent_traits
+
+    def __repr__(self):
+        rep = 'TreeTraitBitsetPopulation: ['
+        for nodename in range(0, self.num_agents):
+            rep += "node %s: " % nodename
+            rep += pp.pformat(self.agent_traits[nodename])
+            rep += ",\n"
+        rep += ' ]'
+        return rep
+
+
+
+###################################################################################
+
+class TreeTraitIndexedPopulation(TreeTraitStructurePopulation):
+    """
+    Version of TreeTraitStructurePopulation which also keeps each agent's traits in an IndexedTraitSet, in
+    trait_index, so that get_random_agent_trait() draws a random trait of an agent by position, in constant
+    time, where drawing from a set takes time linear in its size.  The agents' traits are still ordinary
+    sets, which the rules compare and combine in C as before; the index is only used for the draws, and is
+    kept current by add_agent_trait(), remove_agent_trait() and replace_agent_trait().  Unlike the bitset
+    populations, the index grows with the agents' traits rather than the universe.
+    """
+    def __init__(self, simconfig,graph_factory,trait_factory):
+        super(TreeTraitIndexedPopulation, self).__init__(simconfig,graph_factory,trait_factory)
+        self.trait_index = [None] * self.num_agents
+
+    def initialize_population(self):
+        super(TreeTraitIndexedPopulation, self).initialize_population()
+        index_traits(self)
+
+    def set_agent_traits(self, agent_id, trait_set):
+        set_indexed_traits(self, agent_id, trait_set)
+
+    def add_agent_trait(self, agent_id, trait):
+        agent_traits = super(TreeTraitIndexedPopulation, self).add_agent_trait(agent_id, trait)
+        self.trait_index[agent_id].add(trait)
+        return agent_traits
+
+    def remove_agent_trait(self, agent_id, trait):
+        agent_traits = super(TreeTraitIndexedPopulation, self).remove_agent_trait(agent_id, trait)
+        self.trait_index[agent_id].discard(trait)
+        return agent_traits
+
+    def replace_agent_trait(self, agent_id, old_trait, new_trait):
+        agent_traits = super(TreeTraitIndexedPopulation, self).replace_agent_trait(agent_id, old_trait, new_trait)
+        self.trait_index[agent_id].discard(old_trait)
+        self.trait_index[agent_id].add(new_trait)
+        return agent_traits
+
+    def get_random_agent_trait(self, agent_id):
+        return get_random_trait(self.trait_index[agent_id])
+
+
+
+###################################################################################
+
+class TreeTraitInternedPopulation(TreeTraitStructurePopulation):
+    """
+    Version of TreeTraitStructurePopulation whose agents share interned, immutable trait sets through a
+    CultureTable:  each node's 'traits' attribute is the frozenset of its culture's record, shared with every
+    other agent of the same culture.  Rules change traits through add_agent_trait(), remove_agent_trait() and
+    replace_agent_trait(), which move the agent to the record for its new traits.  The number of agents of each
+    culture is kept by the table, so culture counts are read from it rather than counted.
+    """
+    def __init__(self, simconfig,graph_factory,trait_factory):
+        super(TreeTraitInternedPopulation, self).__init__(simconfig,graph_factory,trait_factory)
+        self.culture_table = CultureTable()
+
+    def initialize_population(self):
+        super(TreeTraitInternedPopulation, self).initialize_population()
+        intern_traits(self, self.culture_table)
+
+    def set_agent_traits(self, agent_id, trait_set):
+        set_interned_traits(self, self.culture_table, agent_id, trait_set)
+
+    def add_agent_trait(self, agent_id, trait):
+        record = move_interned_agent(self, agent_id, self.culture_table.add_agent_trait(agent_id, trait))
+        self.notify_trait_added(agent_id, trait)
+        return record.traits
+
+    def remove_agent_trait(self, agent_id, trait):
+        record = move_interned_agent(self, agent_id, self.culture_table.remove_agent_trait(agent_id, trait))
+        self.notify_trait_removed(agent_id, trait)
+        return record.traits
+
+    def replace_agent_trait(self, agent_id, old_trait, new_trait):
+        record = move_interned_agent(self, agent_id,
+                                     self.culture_table.replace_agent_trait(agent_id, old_trait, new_trait))
+        self.notify_trait_replaced(agent_id, old_trait, new_trait)
+        return record.traits
+
+    def rebuild_agent_traits(self):
+        rebuild_interned_traits(self, self.culture_table)
+
+    def track_fingerprints(self):
+        # the culture table already keeps each agent's fingerprint
+        return self.culture_table
+
+    def get_agent_culture(self, agent_id):
+        return self.culture_table[agent_id]
+
+
+
 ###################################################################################
 
 class ExtensibleTraitStructurePopulation(BaseGraphPopulation):
@@ -164,11 +486,13 @@ class ExtensibleTraitStructurePopulation(BaseGraphPopulation):
         super(ExtensibleTraitStructurePopulation, self).__init__(simconfig,graph_factory, trait_factory)
 
     def set_agent_traits(self, agent_id, trait_set):
-        self.agentgraph.node[agent_id]['traits'] = trait_set
+        self.store_agent_traits(agent_id, trait_set)
 
     def get_traits_packed(self,agent_traits):
-        hashable_set = frozenset(agent_traits)
-        return hash(hashable_set)
+        return get_trait_set_fingerprint(agent_traits)
+
+    def rebuild_agent_traits(self):
+        rebuild_trait_sets(self)
 
     def draw_network_colored_by_culture(self):
         nodes, traits = zip(*nx.get_node_attributes(self.agentgraph, 'traits').items())
@@ -179,6 +503,129 @@ class ExtensibleTraitStructurePopulation(BaseGraphPopulation):
 
 
 
+###################################################################################
+
+class ExtensibleTraitBitsetPopulation(ExtensibleTraitStructurePopulation):
+    """
+    Version of ExtensibleTraitStructurePopulation which also keeps each agent's traits as a bitset over the
+    trait values 0..max_trait_value in a shared (N, words) uint64 matrix.  See TreeTraitBitsetPopulation.
+    """
+    def __init__(self, simconfig,graph_factory,trait_factory):
+        super(ExtensibleTraitBitsetPopulation, self).__init__(simconfig,graph_factory, trait_factory)
+        self.trait_bits = None
+
+    def initialize_population(self):
+        super(ExtensibleTraitBitsetPopulation, self).initialize_population()
+        num_traits = self.simconfig.max_trait_value + 1
+        self.trait_bits = pack_bitset_traits(self, num_traits)
+
+    def set_agent_traits(self, agent_id, trait_set):
+        set_bitset_traits(self, agent_id, trait_set)
+
+    def add_agent_trait(self, agent_id, trait):
+        agent_traits = super(ExtensibleTraitBitsetPopulation, self).add_agent_trait(agent_id, trait)
+        set_trait_bit(self.trait_bits, agent_id, trait)
+        return agent_traits
+
+    def remove_agent_trait(self, agent_id, trait):
+        agent_traits = super(ExtensibleTraitBitsetPopulation, self).remove_agent_trait(agent_id, trait)
+        clear_trait_bit(self.trait_bits, agent_id, trait)
+        return agent_traits
+
+    def replace_agent_trait(self, agent_id, old_trait, new_trait):
+        agent_traits = super(ExtensibleTraitBitsetPopulation, self).replace_agent_trait(agent_id, old_trait,
+                                                                                         new_trait)
+        clear_trait_bit(self.trait_bits, agent_id, old_trait)
+        set_trait_bit(self.trait_bits, agent_id, new_trait)
+        return agent_traits
+
+
+
+###################################################################################
+
+class ExtensibleTraitIndexedPopulation(ExtensibleTraitStructurePopulation):
+    """
+    Version of ExtensibleTraitStructurePopulation which also keeps each agent's traits in an IndexedTraitSet,
+    for constant time draws of an agent's traits.  See TreeTraitIndexedPopulation.
+    """
+    def __init__(self, simconfig,graph_factory,trait_factory):
+        super(ExtensibleTraitIndexedPopulation, self).__init__(simconfig,graph_factory, trait_factory)
+        self.trait_index = [None] * self.num_agents
+
+    def initialize_population(self):
+        super(ExtensibleTraitIndexedPopulation, self).initialize_population()
+        index_traits(self)
+
+    def set_agent_traits(self, agent_id, trait_set):
+        set_indexed_traits(self, agent_id, trait_set)
+
+    def add_agent_trait(self, agent_id, trait):
+        agent_traits = super(ExtensibleTraitIndexedPopulation, self).add_agent_trait(agent_id, trait)
+        self.trait_index[agent_id].add(trait)
+        return agent_traits
+
+    def remove_agent_trait(self, agent_id, trait):
+        agent_traits = super(ExtensibleTraitIndexedPopulation, self).remove_agent_trait(agent_id, trait)
+        self.trait_index[agent_id].discard(trait)
+        return agent_traits
+
+    def replace_agent_trait(self, agent_id, old_trait, new_trait):
+        agent_traits = super(ExtensibleTraitIndexedPopulation, self).replace_agent_trait(agent_id, old_trait,
+                                                                                          new_trait)
+        self.trait_index[agent_id].discard(old_trait)
+        self.trait_index[agent_id].add(new_trait)
+        return agent_traits
+
+    def get_random_agent_trait(self, agent_id):
+        return get_random_trait(self.trait_index[agent_id])
+
+
+
+###################################################################################
+
+class ExtensibleTraitInternedPopulation(ExtensibleTraitStructurePopulation):
+    """
+    Version of ExtensibleTraitStructurePopulation whose agents share interned trait sets through a CultureTable.
+    See TreeTraitInternedPopulation.
+    """
+    def __init__(self, simconfig,graph_factory,trait_factory):
+        super(ExtensibleTraitInternedPopulation, self).__init__(simconfig,graph_factory, trait_factory)
+        self.culture_table = CultureTable()
+
+    def initialize_population(self):
+        super(ExtensibleTraitInternedPopulation, self).initialize_population()
+        intern_traits(self, self.culture_table)
+
+    def set_agent_traits(self, agent_id, trait_set):
+        set_interned_traits(self, self.culture_table, agent_id, trait_set)
+
+    def add_agent_trait(self, agent_id, trait):
+        record = move_interned_agent(self, agent_id, self.culture_table.add_agent_trait(agent_id, trait))
+        self.notify_trait_added(agent_id, trait)
+        return record.traits
+
+    def remove_agent_trait(self, agent_id, trait):
+        record = move_interned_agent(self, agent_id, self.culture_table.remove_agent_trait(agent_id, trait))
+        self.notify_trait_removed(agent_id, trait)
+        return record.traits
+
+    def replace_agent_trait(self, agent_id, old_trait, new_trait):
+        record = move_interned_agent(self, agent_id,
+                                     self.culture_table.replace_agent_trait(agent_id, old_trait, new_trait))
+        self.notify_trait_replaced(agent_id, old_trait, new_trait)
+        return record.traits
+
+    def rebuild_agent_traits(self):
+        rebuild_interned_traits(self, self.culture_table)
+
+    def track_fingerprints(self):
+        return self.culture_table
+
+    def get_agent_culture(self, agent_id):
+        return self.culture_table[agent_id]
+
+
+
 ###################################################################################
 
 class FixedTraitStructurePopulation(BaseGraphPopulation):
@@ -207,7 +654,7 @@ class FixedTraitStructurePopulation(BaseGraphPopulation):
         plt.show()
 
     def get_traits_packed(self,agent_traits):
-        return ''.join(str(i) for i in agent_traits)
+        return get_trait_list_fingerprint(agent_traits)
 
 
     def set_agent_traits(self, agent_id, trait_list):
@@ -215,14 +662,181 @@ class FixedTraitStructurePopulation(BaseGraphPopulation):
         Stores a modified version of the trait list for an agent.
         """
         #old_traits = self.model.node[agent_id]['traits']
-        self.agentgraph.node[agent_id]['traits'] = trait_list
+        self.store_agent_traits(agent_id, trait_list)
         #new_traits = self.model.node[agent_id]['traits']
         #log.debug("setting agent %s: target traits: %s  old: %s new: %s", agent_id, trait_list, old_traits, new_traits)
 
 
 
+###################################################################################
+
+class FixedTraitArrayPopulation(FixedTraitStructurePopulation):
+    """
+    Array-backed version of FixedTraitStructurePopulation.  All agent traits are stored in a single
+    contiguous (N, F) integer matrix, alongside the CSR neighbor arrays which every population compiles
+    (see BaseGraphPopulation).
 
+    Each agent's entry in agent_traits (and its node's 'traits' attribute, if the agent graph is built) is
+    a view onto the agent's row of the trait matrix, so both representations always agree.  AxelrodRule and
+    AxelrodDriftRule detect this class and step through index arithmetic on the arrays directly.
+    """
 
+    def __init__(self, simconfig, graph_factory, trait_factory):
+        super(FixedTraitArrayPopulation, self).__init__(simconfig, graph_factory, trait_factory)
+        self.traits = None
 
+    def initialize_population(self):
+        """
+        Lets the trait factory initialize the population as usual, and then packs the resulting trait
+        arrays into the trait matrix, replacing each agent's trait array with a view of its row.
+        """
+        super(FixedTraitArrayPopulation, self).initialize_population()
+        nf = self.simconfig.num_features
+        self.traits = np.empty((self.num_agents, nf), dtype=np.int_)
+        for agent_id in range(0, self.num_agents):
+            self.traits[agent_id] = self.agent_traits[agent_id]
+            self.store_agent_traits(agent_id, self.traits[agent_id])
 
+    def get_agent_by_id(self, agent_id):
+        return (agent_id, self.traits[agent_id])
 
+    def get_random_neighbor_for_agent(self, agent_id):
+        start = self.neighbor_offsets[agent_id]
+        num_neighbors = self.neighbor_offsets[agent_id + 1] - start
+        rand_neighbor_id = self.neighbor_indices[start + self.prng.randint(0, num_neighbors)]
+        return (rand_neighbor_id, self.traits[rand_neighbor_id])
+
+    def get_all_neighbors_for_agent(self, agent_id):
+        return self.neighbor_indices[self.neighbor_offsets[agent_id]:self.neighbor_offsets[agent_id + 1]]
+
+    def set_agent_traits(self, agent_id, trait_list):
+        """
+        Copies the trait list into the agent's row of the trait matrix.  Since rows handed out by
+        get_agent_by_id() are views, in-place modification followed by this call is a no-op copy.
+        """
+        self.traits[agent_id] = trait_list
+
+
+###################################################################################
+
+def compile_edge_table(edges):
+    """
+    Returns an (E, 2) integer array of the distinct undirected edges in a sequence of (a, b) pairs, each as
+    (lower id, higher id), in sorted order, so that the table does not depend on the order in which a graph
+    happens to list its edges.
+    """
+    table = np.asarray(edges, dtype=np.int_).reshape(-1, 2)
+    table = np.sort(table, axis=1)
+    if len(table) == 0:
+        return table
+    table = table[np.lexsort((table[:,1], table[:,0]))]
+    distinct = np.ones(len(table), dtype=bool)
+    distinct[1:] = np.any(table[1:] != table[:-1], axis=1)
+    return table[distinct]
+
+
+def compile_csr_adjacency(num_agents, edges):
+    """
+    Compiles an edge table for agents labeled 0..N-1 into a pair of CSR arrays (offsets, indices).
+    Neighbors of agent i occupy indices[offsets[i]:offsets[i+1]], in ascending order.
+    """
+    agents = np.concatenate((edges[:,0], edges[:,1]))
+    neighbors = np.concatenate((edges[:,1], edges[:,0]))
+    order = np.lexsort((neighbors, agents))
+    offsets = np.zeros(num_agents + 1, dtype=np.int_)
+    offsets[1:] = np.cumsum(np.bincount(agents, minlength=num_agents))
+    return (offsets, neighbors[order].astype(np.int_))
+
+
+def pack_bitset_traits(population, num_traits):
+    """
+    Packs the trait sets of a population into a (N, words) uint64 bitset matrix over traits 0..num_traits-1.
+    Returns the matrix.
+    """
+    n = population.num_agents
+    trait_bits = np.zeros((n, num_words_for_traits(num_traits)), dtype=np.uint64)
+    for agent_id in range(0, n):
+        set_bitset_words(trait_bits[agent_id], population.agent_traits[agent_id])
+    return trait_bits
+
+
+def set_bitset_traits(population, agent_id, trait_set):
+    """
+    Stores a trait set for an agent, and copies it into the agent's row of the bitset matrix.  The mutation
+    methods of the bitset populations change the agents' sets in place and update the matrix themselves, in
+    which case there is nothing to copy.
+    """
+    if trait_set is not population.agent_traits[agent_id]:
+        if not isinstance(trait_set, set):
+            trait_set = set(trait_set)
+        set_bitset_words(population.trait_bits[agent_id], trait_set)
+    population.store_agent_traits(agent_id, trait_set)
+
+
+def set_trait_bit(trait_bits, agent_id, trait):
+    trait_bits[agent_id, trait >> 6] |= np.uint64(1 << (trait & 63))
+
+
+def clear_trait_bit(trait_bits, agent_id, trait):
+    trait_bits[agent_id, trait >> 6] &= np.uint64(((1 << 64) - 1) ^ (1 << (trait & 63)))
+
+
+def rebuild_trait_sets(population):
+    """
+    Replaces each agent's trait set with a set built from its traits in sorted order.
+    """
+    for agent_id in range(0, population.num_agents):
+        population.set_agent_traits(agent_id, set(sorted(population.agent_traits[agent_id])))
+
+
+def rebuild_interned_traits(population, culture_table):
+    """
+    Rebuilds the interned trait sets of a culture table, and points each agent at its record's new traits.
+    """
+    culture_table.rebuild()
+    for agent_id in range(0, population.num_agents):
+        move_interned_agent(population, agent_id, culture_table.get_agent_record(agent_id))
+
+
+def index_traits(population):
+    """
+    Builds the IndexedTraitSet of each agent's traits, in the order in which its trait set iterates.
+    """
+    for agent_id in range(0, population.num_agents):
+        population.trait_index[agent_id] = IndexedTraitSet(population.agent_traits[agent_id])
+
+
+def set_indexed_traits(population, agent_id, trait_set):
+    """
+    Stores a trait set for an agent and rebuilds the agent's index from it.  The mutation methods of the
+    indexed populations change the agents' sets in place and update the index themselves, in which case
+    there is nothing to rebuild.
+    """
+    if trait_set is not population.agent_traits[agent_id]:
+        if not isinstance(trait_set, set):
+            trait_set = set(trait_set)
+        population.trait_index[agent_id] = IndexedTraitSet(trait_set)
+    population.store_agent_traits(agent_id, trait_set)
+
+
+def intern_traits(population, culture_table):
+    """
+    Replaces the trait set of each agent in a population with the interned trait set of its culture.
+    """
+    for agent_id in range(0, population.num_agents):
+        set_interned_traits(population, culture_table, agent_id, population.agent_traits[agent_id])
+
+
+def set_interned_traits(population, culture_table, agent_id, trait_set):
+    """
+    Stores a trait set for an agent by moving the agent to the culture with those traits.
+    """
+    move_interned_agent(population, agent_id, culture_table.set_agent_traits(agent_id, trait_set))
+
+
+def move_interned_agent(population, agent_id, record):
+    """
+    Points an agent's traits at the traits of the culture record the agent has moved to.
+    """
+    population.store_agent_traits(agent_id, record.traits)
+    return record
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Table of interned cultures, shared copy-on-write by the agents which hold them.
+
+"""
+
+from fingerprints import get_trait_key, get_trait_set_fingerprint
+
+
+class CultureRecord(object):
+    """
+    One distinct culture:  an immutable set of traits, its fingerprint, and the number of agents holding it.
+    """
+    __slots__ = ('traits', 'fingerprint', 'count')
+
+    def __init__(self, traits, fingerprint):
+        self.traits = traits
+        self.fingerprint = fingerprint
+        self.count = 0
+
+    def __repr__(self):
+        return 'CultureRecord(%r, count=%s)' % (sorted(self.traits), self.count)
+
+
+class CultureTable(object):
+    """
+    Interns the trait sets of a population with set-valued traits, so that every agent with the same traits
+    points at one shared CultureRecord, whose traits are a frozenset.  Changing an agent's traits never
+    modifies a record:  the agent is moved to the record for its new traits (created if no agent holds them
+    yet), and a record is dropped when its last agent leaves it.  Memory for the traits of a population is
+    thus proportional to the number of cultures rather than agents, and the number of agents with each
+    culture is kept in the records' reference counts rather than counted.
+
+    Fingerprints of new records are derived in O(1) from the record the agent moves from.
+    """
+
+    def __init__(self):
+        self.records = dict()
+        self.agent_records = dict()
+
+    def _get_record(self, traits, fingerprint=None):
+        record = self.records.get(traits)
+        if record is None:
+            if fingerprint is None:
+                fingerprint = get_trait_set_fingerprint(traits)
+            record = CultureRecord(traits, fingerprint)
+            self.records[traits] = record
+        return record
+
+    def _move_agent(self, agent_id, record):
+        old_record = self.agent_records.get(agent_id)
+        if old_record is record:
+            return record
+        record.count += 1
+        self.agent_records[agent_id] = record
+        if old_record is not None:
+            old_record.count -= 1
+            if old_record.count == 0:
+                del self.records[old_record.traits]
+        return record
+
+    def set_agent_traits(self, agent_id, trait_set):
+        """
+        Moves an agent to the culture with the traits in trait_set, which can be any set of traits.
+        Returns the agent's new record.
+        """
+        return self._move_agent(agent_id, self._get_record(frozenset(trait_set)))
+
+    def add_agent_trait(self, agent_id, trait):
+        record = self.agent_records[agent_id]
+        if trait in record.traits:
+            return record
+        return self._move_agent(agent_id, self._get_record(record.traits.union((trait,)),
+                                                            record.fingerprint ^ get_trait_key(trait)))
+
+    def remove_agent_trait(self, agent_id, trait):
+        record = self.agent_records[agent_id]
+        if trait not in record.traits:
+            return record
+        return self._move_agent(agent_id, self._get_record(record.traits.difference((trait,)),
+                                                            record.fingerprint ^ get_trait_key(trait)))
+
+    def replace_agent_trait(self, agent_id, old_trait, new_trait):
+        record = self.agent_records[agent_id]
+        traits = record.traits.difference((old_trait,)).union((new_trait,))
+        if old_trait not in record.traits or new_trait in record.traits:
+            return self._move_agent(agent_id, self._get_record(traits))
+        return self._move_agent(agent_id, self._get_record(traits, record.fingerprint ^ get_trait_key(old_trait) ^
+                                                                    get_trait_key(new_trait)))
+
+    def rebuild(self):
+        """
+        Replaces the traits of every record with a frozenset built from the traits in sorted order.  See
+        BaseGraphPopulation.rebuild_agent_traits().
+        """
+        records = dict()
+        for record in self.records.itervalues():
+            record.traits = frozenset(sorted(record.traits))
+            records[record.traits] = record
+        self.records = records
+
+    def get_agent_record(self, agent_id):
+        return self.agent_records[agent_id]
+
+    def get_culture_count_map(self):
+        """
+        Returns a dict of culture fingerprint and the number of agents holding the culture.
+        """
+        return dict((record.fingerprint, record.count) for record in self.records.itervalues())
+
+    def get_traitset_map(self):
+        """
+        Returns a dict of culture fingerprint and the culture's traits.
+        """
+        return dict((record.fingerprint, record.traits) for record in self.records.itervalues())
+
+    def __getitem__(self, agent_id):
+        return self.agent_records[agent_id].fingerprint
+
+    def __len__(self):
+        return len(self.records)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Zobrist-style culture fingerprints:  64-bit culture ID's which are the XOR of a fixed key for each trait an agent
+holds, and which can therefore be updated in O(1) as single traits are added or removed.
+
+"""
+
+
+_MASK_64 = (1 << 64) - 1
+
+# keys are a fixed function of the trait, so fingerprints are the same in every process and every run
+_trait_keys = dict()
+_feature_trait_keys = dict()
+
+
+def _mix64(value):
+    """
+    The SplitMix64 finalizer, which maps distinct integers to well-mixed, effectively random 64-bit keys.
+    """
+    z = (value + 0x9E3779B97F4A7C15) & _MASK_64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK_64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK_64
+    return z ^ (z >> 31)
+
+
+def get_trait_key(trait):
+    key = _trait_keys.get(trait)
+    if key is None:
+        key = _mix64(int(trait))
+        _trait_keys[trait] = key
+    return key
+
+
+def get_feature_trait_key(feature, trait):
+    key = _feature_trait_keys.get((feature, trait))
+    if key is None:
+        key = _mix64(((feature + 1) << 32) ^ int(trait))
+        _feature_trait_keys[(feature, trait)] = key
+    return key
+
+
+def get_trait_set_fingerprint(agent_traits):
+    """
+    Returns the fingerprint of a set of traits, for the extensible and tree-structured models.
+    """
+    fingerprint = 0
+    for trait in agent_traits:
+        fingerprint ^= get_trait_key(trait)
+    return fingerprint
+
+
+def get_trait_list_fingerprint(agent_traits):
+    """
+    Returns the fingerprint of a list of F traits, one per feature, for the original Axelrod model.
+    """
+    fingerprint = 0
+    for feature in range(0, len(agent_traits)):
+        fingerprint ^= get_feature_trait_key(feature, int(agent_traits[feature]))
+    return fingerprint
+
+
+class CultureFingerprintTracker(object):
+    """
+    Observer which keeps the fingerprint of every agent in a population with set-valued traits up to date,
+    from the trait_added(), trait_removed() and trait_replaced() notifications that the rules send, so that
+    an agent's culture ID is looked up rather than recomputed from its traits.  Register it through
+    BaseGraphPopulation.track_fingerprints(), after any change to the population which is not notified
+    (initialization, or restoring a checkpoint).
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.rebuild()
+
+    def rebuild(self):
+        self.fingerprints = dict()
+        for agent_id in range(0, self.model.num_agents):
+            self.fingerprints[agent_id] = get_trait_set_fingerprint(self.model.agent_traits[agent_id])
+
+    def trait_added(self, agent_id, trait):
+        self.fingerprints[agent_id] ^= get_trait_key(trait)
+
+    def trait_removed(self, agent_id, trait):
+        self.fingerprints[agent_id] ^= get_trait_key(trait)
+
+    def trait_replaced(self, agent_id, old_trait, new_trait):
+        self.fingerprints[agent_id] ^= get_trait_key(old_trait) ^ get_trait_key(new_trait)
+
+    def __getitem__(self, agent_id):
+        return self.fingerprints[agent_id]
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Ranks the traits an agent lacks, among a universe of traits 0..num_traits-1, without sorting the agent's traits.
+
+"""
+
+import array
+import numpy as np
+
+
+class MissingTraitTracker(object):
+    """
+    Observer which counts each agent's traits in consecutive blocks of the trait universe, kept current from
+    the trait_added(), trait_removed() and trait_replaced() notifications that the rules send.  The rank'th
+    missing trait of an agent is found by a cumulative sum over the agent's block counts, to find the block
+    which holds it, and a scan of that block's traits.  Blocks are about sqrt(num_traits) traits wide, so a
+    lookup takes O(sqrt(num_traits)) time however many traits the agent holds, and the counts take
+    O(num_agents * sqrt(num_traits)) memory.  Each agent's counts are an array.array, which is cheaper to
+    update one count at a time than a row of an ndarray.  Register it through
+    TreeTraitStructurePopulation.track_missing_traits().
+    """
+
+    def __init__(self, model, num_traits):
+        self.model = model
+        self.num_traits = num_traits
+        self.block_bits = (max(num_traits - 1, 1).bit_length() + 1) // 2
+        self.num_blocks = ((max(num_traits, 1) - 1) >> self.block_bits) + 1
+        self.block_sizes = np.empty(self.num_blocks, dtype=np.int64)
+        self.block_sizes.fill(1 << self.block_bits)
+        self.block_sizes[-1] = num_traits - ((self.num_blocks - 1) << self.block_bits)
+        self.rebuild()
+
+    def rebuild(self):
+        self.counts = []
+        for agent_id in range(0, self.model.num_agents):
+            blocks = np.fromiter(self.model.agent_traits[agent_id], dtype=np.int64) >> self.block_bits
+            counts = np.bincount(blocks, minlength=self.num_blocks).astype(np.int32)
+            self.counts.append(array.array('i', counts.tostring()))
+
+    def trait_added(self, agent_id, trait):
+        self.counts[agent_id][trait >> self.block_bits] += 1
+
+    def trait_removed(self, agent_id, trait):
+        self.counts[agent_id][trait >> self.block_bits] -= 1
+
+    def trait_replaced(self, agent_id, old_trait, new_trait):
+        counts = self.counts[agent_id]
+        counts[old_trait >> self.block_bits] -= 1
+        counts[new_trait >> self.block_bits] += 1
+
+    def get_missing_trait_by_rank(self, agent_id, rank):
+        """
+        Returns the rank'th smallest (from 0) trait which the agent does not have, as
+        traits.treestructured.get_missing_trait_by_rank() does.  The rank must be less than the number of
+        traits the agent lacks.
+        """
+        missing = np.cumsum(self.block_sizes - np.frombuffer(self.counts[agent_id], dtype=np.int32))
+        block = int(np.searchsorted(missing, rank, side='right'))
+        if block > 0:
+            rank -= int(missing[block - 1])
+        agent_traits = self.model.agent_traits[agent_id]
+        trait = block << self.block_bits
+        while True:
+            if trait not in agent_traits:
+                if rank == 0:
+                    return trait
+                rank -= 1
+            trait += 1
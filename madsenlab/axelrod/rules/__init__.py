@@ -9,4 +9,5 @@ Description here
 """
 from axelrod_rule import AxelrodRule, AxelrodDriftRule
 from extensible_axelrod_rule import ExtensibleAxelrodRule
-from mult_tree_semantic_rule import MultipleTreePrerequisitesLearningCopyingRule
\ No newline at end of file
+from mult_tree_semantic_rule import MultipleTreePrerequisitesLearningCopyingRule
+from rejection_free import RejectionFreeScheduler
@@ -18,21 +18,34 @@ This rule implements the original Axelrod model on a lattice, given descriptions
 import logging as log
 import madsenlab.axelrod.population as pop
 import math as m
+import numpy as np
 import numpy.random as npr
 import scipy.spatial.distance as ssd
 import madsenlab.axelrod.analysis as analysis
+from link_cache import ActiveLinkCacheRule
 
 
-class AxelrodRule(object):
+class AxelrodRule(ActiveLinkCacheRule):
     """
     Implements the original Axelrod model, taking an instance of a lattice model at construction.
     Returns control to the caller after each step(), so that other code can run to determine completion,
-    take samples, etc.
+    take samples, etc.  Alternatively, run() performs a block of consecutive steps at once.
+
+    The set of active links is kept up to date as agents change, so that get_fraction_links_active() is O(1).
+    """
+
+    batch_size = 65536
+    """
+    Maximum number of steps whose random variates are drawn as a single block by run().
     """
 
+    drift = False
+
     def __init__(self, model):
         self.model = model
         self.sc = self.model.simconfig
+        self.array_backed = isinstance(self.model, pop.FixedTraitArrayPopulation)
+        self.initialize()
 
     def step(self, timestep):
         """
@@ -53,119 +66,206 @@ class AxelrodRule(object):
         agent adopts one of the neighbor's traits for which they are dissimilar.
 
         """
+        if self.array_backed:
+            self._step_array(timestep)
+            return
+
         (agent_id, agent_traits) = self.model.get_random_agent()
         (neighbor_id, neighbor_traits) = self.model.get_random_neighbor_for_agent(agent_id)
+        self.interact(agent_id, neighbor_id, timestep)
 
-        prob = analysis.calc_probability_interaction_axelrod(agent_traits, neighbor_traits)
+    def interact(self, agent_id, neighbor_id, timestep):
+        """
+        Performs the interaction trial between a focal agent and one of its neighbors, as described in
+        step(), and returns True if the focal agent adopted a trait from the neighbor.
+        """
+        (agent_id, agent_traits) = self.model.get_agent_by_id(agent_id)
+        (neighbor_id, neighbor_traits) = self.model.get_agent_by_id(neighbor_id)
 
+        prob = self.calc_directed_interaction_probability(agent_traits, neighbor_traits)
         if prob == 0.0:
-            return
-        elif prob == 1.0:
-            return
-        else:
-            draw = npr.random()
-            if draw < prob:
-                differing_features = analysis.get_different_feature_positions_axelrod(agent_traits, neighbor_traits)
-                old_agent_traits = list(agent_traits)
-                if len(differing_features) == 1:
-                    random_feature = differing_features[0]
-                else:
-                    rand_feature_num = npr.randint(0, len(differing_features))
-                    random_feature = differing_features[rand_feature_num]
-                neighbor_trait = neighbor_traits[random_feature]
-                agent_traits[random_feature] = neighbor_trait
-                #log.debug("agent %s: old: %s  neighbor: %s  post: %s differing: %s feature: %s val: %s ", agent_id, old_agent_traits, neighbor_traits, agent_traits,differing_features, random_feature, neighbor_trait )
-                self.model.set_agent_traits(agent_id, agent_traits)
-
-                # track the interaction and time
-                self.model.update_interactions(timestep)
-            else:
-                # no interaction given the random draw and probability, so just return
-                #log.debug("no interaction")
-                return
-
-
-    def get_fraction_links_active(self):
-        """
-        Calculate the fraction of links whose probability of interaction is not 1.0 or 0.0.
-        """
-        active_links = 0
-        for (a,b) in self.model.model.edges_iter():
-            (a_id, a_traits) = self.model.get_agent_by_id(a)
-            (b_id, b_traits) = self.model.get_agent_by_id(b)
-            prob = analysis.calc_probability_interaction_axelrod(a_traits, b_traits)
-            if prob > 0.0 and prob < 1.0:
-                #log.debug("active link (%s %s) prob: %s  a_trait: %s  b_trait: %s", a_id, b_id, prob, a_traits, b_traits)
-                active_links += 1
-        num_links_total = self.model.model.number_of_edges()
-        #log.debug("active links: %s total links: %s", active_links, num_links_total)
-        fraction_active = float(active_links) / num_links_total
-        return fraction_active
+            return False
 
+        draw = npr.random()
+        if draw < prob:
+            self.transmit(agent_id, neighbor_id, timestep)
+            return True
+        else:
+            # no interaction given the random draw and probability
+            #log.debug("no interaction")
+            return False
 
-class AxelrodDriftRule(AxelrodRule):
-    """
-    Subclass of AxelrodRule, we want to keep everything since it's now well tested, and
-    simply add another aspect to the step() method.
-    """
+    def transmit(self, agent_id, neighbor_id, timestep):
+        """
+        Unconditionally performs an interaction between two agents which differ in at least one feature: the
+        focal agent adopts the neighbor's trait for a random feature on which they differ.
+        """
+        (agent_id, agent_traits) = self.model.get_agent_by_id(agent_id)
+        (neighbor_id, neighbor_traits) = self.model.get_agent_by_id(neighbor_id)
 
-    def __init__(self,model):
-        self.model = model
-        self.sc = self.model.simconfig
+        differing_features = analysis.get_different_feature_positions_axelrod(agent_traits, neighbor_traits)
+        if len(differing_features) == 1:
+            random_feature = differing_features[0]
+        else:
+            rand_feature_num = npr.randint(0, len(differing_features))
+            random_feature = differing_features[rand_feature_num]
+        neighbor_trait = neighbor_traits[random_feature]
+        agent_traits[random_feature] = neighbor_trait
+        #log.debug("agent %s: neighbor: %s  post: %s differing: %s feature: %s val: %s ", agent_id, neighbor_traits, agent_traits,differing_features, random_feature, neighbor_trait )
+        self.model.set_agent_traits(agent_id, agent_traits)
 
+        # track the interaction and time, and update the link cache
+        self.model.update_interactions(timestep)
+        self.update_link_cache_for_agent(agent_id, agent_traits)
 
 
-    def step(self, timestep):
+    def _step_array(self, timestep):
         """
-        Implements a single time step in the Axelrod model, selecting a focal agent at
-        random, and then one of the focal agent's neighbors (this rule knows nothing about
-        how "neighbors" are represented, so the rule itself is fully generic to many
-        population structures, including those with long-distance connections.
+        Identical dynamics to step(), for a FixedTraitArrayPopulation.  Agents and neighbors are
+        chosen by index arithmetic on the CSR neighbor arrays, and traits are compared and copied
+        directly within the population's trait matrix.
+        """
+        self._interact_array(timestep)
 
-        The two agents interact based upon their cultural similarity. This is handled as follows:
+    def _interact_array(self, timestep):
+        """
+        Performs the selection and interaction part of a step on the trait matrix, and returns
+        the index of the focal agent if its traits changed, or None otherwise.  Every variate is
+        drawn from the population's generator, scaled from random_sample() as run() scales them,
+        which costs less per call than randint().
+        """
+        model = self.model
+        traits = model.traits
+        prng = model.prng
+
+        agent_id = int(prng.random_sample() * model.num_agents)
+        neighbor_id = model.neighbor_indices[model.neighbor_offsets[agent_id] +
+                                             int(prng.random_sample() * model.degrees[agent_id])]
+
+        agent_traits = traits[agent_id]
+        neighbor_traits = traits[neighbor_id]
+        differing_features = (agent_traits != neighbor_traits).nonzero()[0]
+        num_differing = len(differing_features)
+        num_features = len(agent_traits)
+
+        # probability 1.0 (identical) or 0.0 (nothing in common)
+        if num_differing == 0 or num_differing == num_features:
+            return None
+
+        prob = 1.0 - (float(num_differing) / float(num_features))
+        if prng.random_sample() < prob:
+            random_feature = differing_features[int(prng.random_sample() * num_differing)]
+            agent_traits[random_feature] = neighbor_traits[random_feature]
+            model.update_interactions(timestep)
+            self.update_link_cache_for_agent(agent_id, agent_traits)
+            return agent_id
+        return None
+
+
+    def run(self, timestep, num_steps):
+        """
+        Performs num_steps consecutive steps, the first of which is at time timestep, and returns the
+        time of the last step performed.  This is equivalent to calling step() for each tick.
+
+        Batching only speeds up a FixedTraitArrayPopulation:  the agent indices, neighbor offsets, and
+        uniform variates for up to batch_size steps are drawn as NumPy arrays in one call each, and then
+        consumed sequentially, which removes the per-step random number generator overhead.  The dynamics
+        are statistically identical to the single-step path, although not the same sequence of draws.  For
+        any other population, run() is only a loop which calls step() once per tick, and is no faster.
+        """
+        if not self.array_backed:
+            for t in xrange(timestep, timestep + num_steps):
+                self.step(t)
+            return timestep + num_steps - 1
+
+        remaining = num_steps
+        while remaining > 0:
+            block = min(remaining, self.batch_size)
+            self._run_block_array(timestep, block)
+            timestep += block
+            remaining -= block
+        return timestep - 1
+
+    def _run_block_array(self, timestep, block):
+        model = self.model
+        traits = model.traits
+        num_features = traits.shape[1]
+        prng = model.prng
+
+        agents = prng.randint(0, model.num_agents, size=block)
+        offset_draws = (prng.random_sample(block) * model.degrees[agents]).astype(np.int_)
+        neighbors = model.neighbor_indices[model.neighbor_offsets[agents] + offset_draws]
+        interaction_draws = prng.random_sample(block).tolist()
+        feature_draws = prng.random_sample(block).tolist()
+        if self.drift:
+            drift_rate = model.simconfig.drift_rate
+            num_traits = model.simconfig.num_traits
+            drift_draws = prng.random_sample(block).tolist()
+            drift_features = prng.randint(0, num_features, size=block).tolist()
+            drift_values = prng.randint(0, num_traits, size=block).tolist()
+
+        agents = agents.tolist()
+        neighbors = neighbors.tolist()
+
+        for i in xrange(block):
+            agent_traits = traits[agents[i]]
+            neighbor_traits = traits[neighbors[i]]
+            differing_features = (agent_traits != neighbor_traits).nonzero()[0]
+            num_differing = len(differing_features)
+
+            if num_differing == 0 or num_differing == num_features:
+                continue
+            prob = 1.0 - (float(num_differing) / float(num_features))
+            if interaction_draws[i] >= prob:
+                continue
+
+            random_feature = differing_features[int(feature_draws[i] * num_differing)]
+            agent_traits[random_feature] = neighbor_traits[random_feature]
+            model.update_interactions(timestep + i)
+
+            if self.drift and drift_draws[i] < drift_rate:
+                agent_traits[drift_features[i]] = drift_values[i]
+
+            self.update_link_cache_for_agent(agents[i], agent_traits)
+
+
+    def calc_link_probability(self, a_traits, b_traits):
+        if self.array_backed:
+            return 1.0 - (float(np.count_nonzero(a_traits != b_traits)) / float(len(a_traits)))
+        return analysis.calc_probability_interaction_axelrod(a_traits, b_traits)
+
+    def calc_directed_interaction_probability(self, agent_traits, neighbor_traits):
+        """
+        Agents which are identical do not change when they interact, so the effective probability is zero
+        unless the agents share some, but not all, of their traits.
+        """
+        prob = self.calc_link_probability(agent_traits, neighbor_traits)
+        if prob == 1.0:
+            return 0.0
+        return prob
 
-        1.  When two agents have all traits in common, technically they would interact with probability
-        one, but no traits would change.  For speed, this is short-circuited.
 
-        2.  When two agents have no traits in common, the probability of interaction is zero.  Here we
-        simply move on, and don't make a random trial because there's no point.
+class AxelrodDriftRule(AxelrodRule):
+    """
+    Subclass of AxelrodRule, we want to keep everything since it's now well tested, and
+    simply add a drift trial after each successful interaction.
+    """
 
-        3.  Otherwise, with probability equal to similarity (or, usually, 1 - dissimilarity), the focal
-        agent adopts one of the neighbor's traits for which they are dissimilar.
+    drift = True
 
-        4.  With probability R, perturb a random feature to a random trait value to simulate drift.
-        """
+    def __init__(self,model):
+        super(AxelrodDriftRule, self).__init__(model)
 
-        (agent_id, agent_traits) = self.model.get_random_agent()
-        (neighbor_id, neighbor_traits) = self.model.get_random_neighbor_for_agent(agent_id)
 
-        prob = analysis.calc_probability_interaction_axelrod(agent_traits, neighbor_traits)
 
-        if prob == 0.0:
-            return
-        elif prob == 1.0:
-            return
-        else:
-            draw = npr.random()
-            if draw < prob:
-                differing_features = analysis.get_different_feature_positions_axelrod(agent_traits, neighbor_traits)
-                old_agent_traits = list(agent_traits)
-                if len(differing_features) == 1:
-                    random_feature = differing_features[0]
-                else:
-                    rand_feature_num = npr.randint(0, len(differing_features))
-                    random_feature = differing_features[rand_feature_num]
-                neighbor_trait = neighbor_traits[random_feature]
-                agent_traits[random_feature] = neighbor_trait
-                #log.debug("agent %s: old: %s  neighbor: %s  post: %s differing: %s feature: %s val: %s ", agent_id, old_agent_traits, neighbor_traits, agent_traits,differing_features, random_feature, neighbor_trait )
-                self.model.set_agent_traits(agent_id, agent_traits)
-
-                # track the interaction and time
-                self.model.update_interactions(timestep)
-            else:
-                # no interaction given the random draw and probability, so just return
-                #log.debug("no interaction")
-                return
+    def transmit(self, agent_id, neighbor_id, timestep):
+        """
+        Performs an interaction exactly as AxelrodRule.transmit(), and then, with probability R, perturbs
+        a random feature of the focal agent to a random trait value to simulate drift.  As in the original
+        model, the drift trial only follows a successful interaction, so step() and interact() are inherited.
+        """
+        super(AxelrodDriftRule, self).transmit(agent_id, neighbor_id, timestep)
+        (agent_id, agent_traits) = self.model.get_agent_by_id(agent_id)
 
         # now do the independent drift step
         draw2 = npr.random()
@@ -176,7 +276,21 @@ class AxelrodDriftRule(AxelrodRule):
             agent_traits[rand_feature_num] = rand_trait_val
             log.debug("drift event: old: %s  new: %s", old_agent_traits, agent_traits)
             self.model.set_agent_traits(agent_id, agent_traits)
+            self.update_link_cache_for_agent(agent_id, agent_traits)
 
+    def _step_array(self, timestep):
+        """
+        Identical dynamics to step(), for a FixedTraitArrayPopulation.  As in step(), the drift
+        trial only follows a successful interaction.
+        """
+        agent_id = self._interact_array(timestep)
+        if agent_id is None:
+            return
 
-
-
+        prng = self.model.prng
+        if prng.random_sample() < self.model.simconfig.drift_rate:
+            agent_traits = self.model.traits[agent_id]
+            rand_feature_num = int(prng.random_sample() * len(agent_traits))
+            agent_traits[rand_feature_num] = int(prng.random_sample() * self.model.simconfig.num_traits)
+            log.debug("drift event: agent %s  new: %s", agent_id, agent_traits)
+            self.update_link_cache_for_agent(agent_id, agent_traits)
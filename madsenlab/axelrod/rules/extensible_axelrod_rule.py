@@ -19,12 +19,13 @@ import logging as log
 import madsenlab.axelrod.population as pop
 import math as m
 import numpy.random as npr
-import random
+import madsenlab.axelrod.traits as traits
 import scipy.spatial.distance as ssd
 import madsenlab.axelrod.analysis as analysis
+from link_cache import ActiveLinkCacheRule
 
 
-class ExtensibleAxelrodRule(object):
+class ExtensibleAxelrodRule(ActiveLinkCacheRule):
     """
     Implements the original Axelrod model, taking an instance of a lattice model at construction.
     Returns control to the caller after each step(), so that other code can run to determine completion,
@@ -34,6 +35,7 @@ class ExtensibleAxelrodRule(object):
     def __init__(self, model):
         self.model = model
         self.sc = self.model.simconfig
+        self.initialize()
 
     def step(self, timestep):
         """
@@ -59,65 +61,71 @@ class ExtensibleAxelrodRule(object):
         otherwise, the focal agent replaces a random trait in its existing set by the neighbor's trait.
 
         """
-        add_rate = self.sc.add_rate
-
         (agent_id, agent_traits) = self.model.get_random_agent()
         (neighbor_id, neighbor_traits) = self.model.get_random_neighbor_for_agent(agent_id)
+        self.interact(agent_id, neighbor_id, timestep)
 
+    def interact(self, agent_id, neighbor_id, timestep):
+        """
+        Performs the interaction trial between a focal agent and one of its neighbors, as described in
+        step(), and returns True if the focal agent adopted a trait from the neighbor.
+        """
+        (agent_id, agent_traits) = self.model.get_agent_by_id(agent_id)
+        (neighbor_id, neighbor_traits) = self.model.get_agent_by_id(neighbor_id)
 
+        prob = self.calc_directed_interaction_probability(agent_traits, neighbor_traits)
+        if prob == 0.0:
+            return False
 
-        if agent_traits == neighbor_traits:
-            return
-        elif agent_traits.isdisjoint(neighbor_traits):
-            return
-        elif neighbor_traits.issubset(agent_traits):
-            return
+        draw = npr.random()
+        if draw < prob:
+            self.transmit(agent_id, neighbor_id, timestep)
+            return True
         else:
-            prob = analysis.calc_probability_interaction_extensible(agent_traits, neighbor_traits)
-            draw = npr.random()
-            if draw < prob:
-                neighbor_diff_traits = analysis.get_traits_differing_from_focal_extensible(agent_traits, neighbor_traits)
-                #log.debug("neighbor_diff_traits: %s", neighbor_diff_traits)
-                neighbor_random_diff_trait = random.sample(neighbor_diff_traits, 1)
-                add_draw = npr.random()
-                if add_draw < add_rate:
-                    # we add the neighbor's trait, without replacing an existing trait
-                    agent_traits.add(neighbor_random_diff_trait[0])
-                    #log.debug("adding trait w/o replacement: %s", neighbor_random_diff_trait[0])
-                    self.model.set_agent_traits(agent_id, agent_traits)
-                else:
-                    # we replace an existing trait with the neighbor's trait
-                    focal_trait_to_replace = random.sample(agent_traits, 1)
-                    #log.debug("replacing trait %s with %s", focal_trait_to_replace[0], neighbor_random_diff_trait[0])
-                    agent_traits.remove(focal_trait_to_replace[0])
-                    agent_traits.add(neighbor_random_diff_trait[0])
-                    self.model.set_agent_traits(agent_id, agent_traits)
-
-                # track the interaction and time
-                self.model.update_interactions(timestep)
-            else:
-                # no interaction given the random draw and probability, so just return
-                #log.debug("no interaction")
-                return
-
-
-    def get_fraction_links_active(self):
+            # no interaction given the random draw and probability
+            #log.debug("no interaction")
+            return False
+
+    def transmit(self, agent_id, neighbor_id, timestep):
         """
-        Calculate the fraction of links whose probability of interaction is neither 1.0 nor 0.0
+        Unconditionally performs an interaction in which the focal agent adopts one of the neighbor's traits
+        that it does not already have, either adding it or replacing a random existing trait.
         """
-        active_links = 0
-        for (a,b) in self.model.model.edges_iter():
-            (a_id, a_traits) = self.model.get_agent_by_id(a)
-            (b_id, b_traits) = self.model.get_agent_by_id(b)
-            prob = analysis.calc_probability_interaction_extensible(a_traits, b_traits)
-            if prob > 0.0 and prob < 1.0:
-                #log.debug("active link (%s %s) prob: %s  a_trait: %s  b_trait: %s", a_id, b_id, prob, a_traits, b_traits)
-                active_links += 1
-        num_links_total = self.model.model.number_of_edges()
-        #log.debug("active links: %s total links: %s", active_links, num_links_total)
-        fraction_active = float(active_links) / num_links_total
-        return fraction_active
+        add_rate = self.sc.add_rate
+        (agent_id, agent_traits) = self.model.get_agent_by_id(agent_id)
+        (neighbor_id, neighbor_traits) = self.model.get_agent_by_id(neighbor_id)
+
+        neighbor_diff_traits = analysis.get_traits_differing_from_focal_extensible(agent_traits, neighbor_traits)
+        #log.debug("neighbor_diff_traits: %s", neighbor_diff_traits)
+        neighbor_random_diff_trait = traits.get_random_trait(neighbor_diff_traits)
+        add_draw = npr.random()
+        if add_draw < add_rate:
+            # we add the neighbor's trait, without replacing an existing trait
+            #log.debug("adding trait w/o replacement: %s", neighbor_random_diff_trait)
+            agent_traits = self.model.add_agent_trait(agent_id, neighbor_random_diff_trait)
+        else:
+            # we replace an existing trait with the neighbor's trait
+            focal_trait_to_replace = self.model.get_random_agent_trait(agent_id)
+            #log.debug("replacing trait %s with %s", focal_trait_to_replace, neighbor_random_diff_trait)
+            agent_traits = self.model.replace_agent_trait(agent_id, focal_trait_to_replace, neighbor_random_diff_trait)
 
+        # track the interaction and time, and update the link cache
+        self.model.update_interactions(timestep)
+        self.update_link_cache_for_agent(agent_id, agent_traits)
 
 
+    def calc_link_probability(self, a_traits, b_traits):
+        return analysis.calc_probability_interaction_extensible(a_traits, b_traits)
 
+    def calc_directed_interaction_probability(self, agent_traits, neighbor_traits):
+        """
+        Zero in the cases which step() short-circuits (identical sets, disjoint sets, or nothing new for the
+        focal agent to adopt), otherwise the overlap probability used in step().
+        """
+        if agent_traits == neighbor_traits:
+            return 0.0
+        elif agent_traits.isdisjoint(neighbor_traits):
+            return 0.0
+        elif neighbor_traits.issubset(agent_traits):
+            return 0.0
+        return analysis.calc_probability_interaction_extensible(agent_traits, neighbor_traits)
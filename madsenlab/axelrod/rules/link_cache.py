@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Active link cache shared by the interaction rules.
+
+"""
+
+import logging as log
+from madsenlab.axelrod.utils.indexed_set import IndexedSet
+
+
+class ActiveLinkCacheRule(object):
+    """
+    Base class for interaction rules which keep an index of the "active" links in the population -- those
+    whose probability of interaction is neither 0.0 nor 1.0.  The cache is built with a full edge iteration
+    at initialization, and subclasses keep it up to date by calling update_link_cache_for_agent() whenever
+    an agent's traits change, which is O(degree).  Convergence checking through get_fraction_links_active()
+    is then O(1) instead of a full iteration over the edges of the population graph.
+
+    Subclasses supply the interaction probability for their trait representation by overriding
+    calc_link_probability().
+
+    The active link set is an IndexedSet, so a uniformly random active link can be drawn in O(1).  When
+    enable_link_weights() has been called (e.g., by RejectionFreeScheduler), the cache additionally keeps,
+    for every active link, the probability that a single step selects the link in either direction and
+    results in an interaction, along with the running total of those weights.  Subclasses supply the
+    directed probability by overriding calc_directed_interaction_probability().
+    """
+
+    def initialize(self):
+        """
+        Given an initialized population model, this method initializes the link cache used to speed
+        up iterations of the model by not running a full edge iteration.  We do a full iteration
+        at initialization, and then keep the active link set up to date in step() instead.
+        """
+        self.active_link_set = IndexedSet()
+        self.num_links = self.model.num_edges
+        self.link_weights = None
+        self.total_link_weight = 0.0
+        self.full_update_link_cache()
+
+    def calc_link_probability(self, a_traits, b_traits):
+        raise NotImplementedError
+
+    def calc_directed_interaction_probability(self, agent_traits, neighbor_traits):
+        """
+        Returns the probability that a step which selects agent_traits as the focal agent and neighbor_traits
+        as its neighbor results in an interaction, taking into account the cases which step() short-circuits.
+        """
+        raise NotImplementedError
+
+    def enable_link_weights(self):
+        """
+        Starts tracking the interaction weight of each active link, and rebuilds the cache to populate them.
+        """
+        num_agents = self.model.num_agents
+        self.selection_prob = dict()
+        for agent_id in range(0, num_agents):
+            self.selection_prob[agent_id] = 1.0 / (num_agents * int(self.model.degrees[agent_id]))
+        self.max_selection_prob = max(self.selection_prob.values())
+        self.link_weights = dict()
+        self.full_update_link_cache()
+
+    def full_update_link_cache(self):
+        self.active_link_set.clear()
+        if self.link_weights is not None:
+            self.link_weights.clear()
+            self.total_link_weight = 0.0
+        for (a,b) in self.model.edges.tolist():
+            (a_id, a_traits) = self.model.get_agent_by_id(a)
+            (b_id, b_traits) = self.model.get_agent_by_id(b)
+            prob = self.calc_link_probability(a_traits, b_traits)
+            if prob > 0.0 and prob < 1.0:
+                #log.debug("active link (%s %s) prob: %s  a_trait: %s  b_trait: %s", a_id, b_id, prob, a_traits, b_traits)
+                self.add_pair_to_cache(a_id, b_id)
+                if self.link_weights is not None:
+                    self._set_link_weight(a_id, a_traits, b_id, b_traits)
+
+        #log.debug("active link cache: %s", pp.pformat(self.active_link_set))
+
+    def update_link_cache_for_agent(self, agent_id, agent_traits):
+        """
+        When we perform an action to an agent randomly (e.g., loss or mutation), we need to check ALL of the
+        agent's links to neighbors and update the link cache accordingly.
+        """
+        #log.debug("updating link cache for agent: %s after innovation or loss event", agent_id)
+        neighbors = self.model.get_all_neighbors_for_agent(agent_id)
+        for neighbor in neighbors:
+            (neighbor_id, neighbor_traits) = self.model.get_agent_by_id(neighbor)
+            prob = self.calc_link_probability(agent_traits, neighbor_traits)
+            if prob == 0.0 or prob == 1.0:
+                #log.debug("removing (%s,%s) from active link cache", agent_id, neighbor_id)
+                self.remove_pair_from_cache(agent_id,neighbor_id)
+            else:
+                self.add_pair_to_cache(agent_id, neighbor_id)
+                if self.link_weights is not None:
+                    self._set_link_weight(agent_id, agent_traits, neighbor_id, neighbor_traits)
+
+    def remove_pair_from_cache(self, a_id, b_id):
+        """
+        necessary because we don't know which order the tuple entries will occur in -- e.g., (1,2) or (2,1)
+        """
+        if a_id < b_id:
+            pair = (a_id, b_id)
+        else:
+            pair = (b_id, a_id)
+        self.active_link_set.discard(pair)
+        if self.link_weights is not None and pair in self.link_weights:
+            self.total_link_weight -= sum(self.link_weights.pop(pair))
+            if len(self.active_link_set) == 0:
+                self.total_link_weight = 0.0
+
+    def add_pair_to_cache(self, a_id, b_id):
+        if a_id < b_id:
+            pair = (a_id, b_id)
+        else:
+            pair = (b_id, a_id)
+
+        self.active_link_set.add(pair)
+
+    def _set_link_weight(self, a_id, a_traits, b_id, b_traits):
+        """
+        Stores the weights of an active link, keyed like the active link set, as a tuple of the probabilities
+        that a single step selects (lower id, higher id) or (higher id, lower id) as (focal, neighbor) and
+        results in an interaction.
+        """
+        w_ab = self.selection_prob[a_id] * self.calc_directed_interaction_probability(a_traits, b_traits)
+        w_ba = self.selection_prob[b_id] * self.calc_directed_interaction_probability(b_traits, a_traits)
+        if a_id < b_id:
+            pair = (a_id, b_id)
+            weights = (w_ab, w_ba)
+        else:
+            pair = (b_id, a_id)
+            weights = (w_ba, w_ab)
+        old_weights = self.link_weights.get(pair)
+        if old_weights is not None:
+            self.total_link_weight -= sum(old_weights)
+        self.link_weights[pair] = weights
+        self.total_link_weight += sum(weights)
+
+    def get_fraction_links_active(self):
+        """
+        Calculate the fraction of links whose probability of interaction is neither 1.0 nor 0.0
+        """
+        active_links = len(self.active_link_set)
+        #log.debug("active links: %s total links: %s", active_links, self.num_links)
+        fraction_active = float(active_links) / float(self.num_links)
+        return fraction_active
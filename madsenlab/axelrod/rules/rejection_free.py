@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Rejection-free ("n-fold way") scheduling of the interaction rules, for the long near-frozen phase of a
+simulation where almost every step selects a pair of agents which cannot interact.
+
+"""
+
+import logging as log
+
+
+class RejectionFreeScheduler(object):
+    """
+    Wraps an interaction rule which keeps an active link cache (see ActiveLinkCacheRule), and advances the
+    model directly from one effective event to the next, instead of one rejected step at a time.
+
+    With link weights enabled, the rule knows the probability P that a single step of the original rule
+    produces an interaction, summed over the active links.  Together with the loss and innovation rates
+    (for rules which have them), this gives the probability q that a step does anything at all.  The number
+    of steps until the next effective step is geometric with parameter q, so we draw it directly, and then
+    choose which events happen in that step conditional on at least one of them happening.  The interacting
+    pair is chosen in proportion to its weight, by picking a uniformly random active link and accepting it
+    with probability proportional to its weight, and the rule's transmit() is then called for that pair.
+
+    The resulting trajectory is statistically identical to calling rule.step() once per tick.
+    """
+
+    def __init__(self, rule):
+        self.rule = rule
+        self.model = rule.model
+        self.prng = self.model.prng
+        self.rule.enable_link_weights()
+
+        # rules with random loss and innovation events outside of interactions expose them separately
+        if hasattr(rule, 'lose_trait'):
+            self.loss_rate = rule.sc.loss_rate
+            self.innov_rate = rule.sc.innov_rate
+        else:
+            self.loss_rate = 0.0
+            self.innov_rate = 0.0
+
+    def get_interaction_probability(self):
+        """
+        Returns the probability that a single step of the wrapped rule results in an interaction.
+        """
+        if len(self.rule.active_link_set) == 0:
+            return 0.0
+        # the running total can drift slightly from the exact sum through floating point error
+        return min(max(self.rule.total_link_weight, 0.0), 1.0)
+
+    def get_event_probability(self):
+        """
+        Returns the probability that a single step of the wrapped rule changes anything.
+        """
+        interaction_prob = self.get_interaction_probability()
+        return 1.0 - (1.0 - interaction_prob) * (1.0 - self.loss_rate) * (1.0 - self.innov_rate)
+
+    def step(self, timestep, limit=None):
+        """
+        Performs the next effective step at or after timestep, and returns the time at which it occurred.
+
+        If limit is given and no event occurs by time limit, nothing is changed and limit is returned, so that
+        callers can stop at sampling boundaries; since the waiting time is memoryless, resuming from limit + 1
+        gives the same dynamics.  If no event is possible at all (the model is frozen), returns None.
+        """
+        interaction_prob = self.get_interaction_probability()
+        event_prob = self.get_event_probability()
+        if event_prob <= 0.0:
+            return None
+
+        event_time = timestep + self.prng.geometric(event_prob) - 1
+        if limit is not None and event_time > limit:
+            return limit
+
+        # choose which events happen in this step, given that at least one of them does
+        (interaction, loss, innovation) = self._choose_events([interaction_prob, self.loss_rate, self.innov_rate])
+
+        if interaction:
+            (agent_id, neighbor_id) = self._choose_interacting_pair()
+            self.rule.transmit(agent_id, neighbor_id, event_time)
+
+        if loss:
+            if self.rule.lose_trait(event_time) == False:
+                return event_time
+
+        if innovation:
+            self.rule.innovate(event_time)
+
+        return event_time
+
+    def _choose_events(self, probs):
+        """
+        Given independent event probabilities, draws which events occur, conditional on at least one occurring.
+        """
+        occurred = []
+        any_occurred = False
+        for i in range(0, len(probs)):
+            p = probs[i]
+            if any_occurred:
+                occurred.append(self.prng.random_sample() < p)
+                continue
+            # probability that at least one of the remaining events occurs
+            none_remaining = 1.0
+            for q in probs[i:]:
+                none_remaining *= (1.0 - q)
+            at_least_one = 1.0 - none_remaining
+            happens = self.prng.random_sample() * at_least_one < p
+            occurred.append(happens)
+            any_occurred = happens
+        return occurred
+
+    def _choose_interacting_pair(self):
+        """
+        Chooses a directed (focal, neighbor) pair in proportion to its probability of interaction.
+        """
+        rule = self.rule
+        bound = 2.0 * rule.max_selection_prob
+        while True:
+            pair = rule.active_link_set.random_element(self.prng)
+            (w_ab, w_ba) = rule.link_weights[pair]
+            draw = self.prng.random_sample() * bound
+            if draw < w_ab:
+                return pair
+            elif draw < w_ab + w_ba:
+                return (pair[1], pair[0])
@@ -10,4 +10,7 @@ Description here
 
 from unstructured import ExtensibleTraitFactory, AxelrodTraitFactory
 from treestructured import BalancedTreeStructuredTraitFactory, TreeStructuredTraitSet, \
-    MultipleTreeStructuredTraitSet, MultipleBalancedTreeStructuredTraitFactory
\ No newline at end of file
+    MultipleTreeStructuredTraitSet, MultipleBalancedTreeStructuredTraitFactory
+from bitset import BitsetTraitSet, encode_trait_bitmap, decode_trait_bitmap
+from compact import CompactTraitForest, get_balanced_forest_universe
+from indexed import IndexedTraitSet, get_random_trait
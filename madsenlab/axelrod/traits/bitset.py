@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Fixed-width bitset representation of trait sets, for models whose trait universe has a known, bounded size.
+
+"""
+
+import collections
+import numpy as np
+
+WORD_BITS = 64
+
+_WORD_MASK = (1 << WORD_BITS) - 1
+
+
+def num_words_for_traits(num_traits):
+    """
+    Returns the number of 64-bit words needed to hold a bitset over traits 0..num_traits-1.
+    """
+    return (num_traits + WORD_BITS - 1) // WORD_BITS
+
+
+def popcount(words):
+    """
+    Returns the number of set bits in an array of uint64 words.  Each nonzero word is counted as a Python
+    integer, so no temporary arrays are built.
+    """
+    return sum(bin(word).count('1') for word in words.tolist() if word)
+
+
+def iter_set_bits(words):
+    """
+    Yields the positions of the set bits in an array of uint64 words, in ascending order, by stripping the
+    lowest set bit from each nonzero word in turn.
+    """
+    for index, word in enumerate(words.tolist()):
+        base = index << 6
+        while word:
+            low = word & -word
+            yield base + low.bit_length() - 1
+            word ^= low
+
+
+def set_bitset_words(words, traits):
+    """
+    Overwrites an array of uint64 words with the bitset of the given traits.
+    """
+    words[:] = 0
+    idx = np.fromiter(traits, dtype=np.int64)
+    if len(idx) > 0:
+        np.bitwise_or.at(words, idx >> 6, np.left_shift(np.uint64(1), (idx & 63).astype(np.uint64)))
+
+
+class BitsetTraitSet(collections.MutableSet):
+    """
+    A set of non-negative integer traits, stored as a bitset in a 1-D array of uint64 words.  Trait t is
+    bit (t % 64) of word (t // 64).  The word array can be a view onto one row of a (N, words) trait matrix,
+    in which case changes made through the set are made directly in the matrix.  Membership tests read a
+    single word, and the size and iteration work on the words as Python integers.
+
+    The class behaves like the built-in set for everything the rules and analysis code do with trait sets:
+    comparisons, subset and disjointness tests, and union, intersection, and differences.  When both operands
+    are bitsets of the same width these are computed with word-wise operations and a popcount, and the
+    results are new bitsets with their own storage.  Mixed operations with ordinary sets fall back to
+    element-wise processing and return ordinary sets.
+    """
+
+    def __init__(self, words):
+        self.words = words
+
+    @classmethod
+    def empty(cls, num_words):
+        return cls(np.zeros(num_words, dtype=np.uint64))
+
+    @classmethod
+    def _from_iterable(cls, iterable):
+        # used by the MutableSet mixin methods for mixed operations
+        return set(iterable)
+
+    def _same_width(self, other):
+        return isinstance(other, BitsetTraitSet) and len(other.words) == len(self.words)
+
+    def __contains__(self, trait):
+        try:
+            if trait < 0:
+                # a negative index would count back from the last word
+                return False
+            word = self.words[trait >> 6]
+        except (TypeError, IndexError):
+            return False
+        return (int(word) >> (trait & 63)) & 1 == 1
+
+    def __iter__(self):
+        return iter_set_bits(self.words)
+
+    def __len__(self):
+        return popcount(self.words)
+
+    def add(self, trait):
+        self.words[trait >> 6] |= np.uint64(1 << (trait & 63))
+
+    def discard(self, trait):
+        if trait in self:
+            self.words[trait >> 6] &= np.uint64(_WORD_MASK ^ (1 << (trait & 63)))
+
+    def clear(self):
+        self.words[:] = 0
+
+    def update(self, *others):
+        for other in others:
+            if self._same_width(other):
+                self.words |= other.words
+            else:
+                for trait in other:
+                    self.add(trait)
+
+    def copy(self):
+        return BitsetTraitSet(self.words.copy())
+
+    def isdisjoint(self, other):
+        if self._same_width(other):
+            return not np.any(self.words & other.words)
+        return super(BitsetTraitSet, self).isdisjoint(other)
+
+    def issubset(self, other):
+        if self._same_width(other):
+            return not np.any(self.words & ~other.words)
+        if not isinstance(other, collections.Set):
+            other = set(other)
+        return all(trait in other for trait in self)
+
+    def issuperset(self, other):
+        if self._same_width(other):
+            return other.issubset(self)
+        return all(trait in self for trait in other)
+
+    def __le__(self, other):
+        if self._same_width(other):
+            return self.issubset(other)
+        return super(BitsetTraitSet, self).__le__(other)
+
+    def __ge__(self, other):
+        if self._same_width(other):
+            return self.issuperset(other)
+        return super(BitsetTraitSet, self).__ge__(other)
+
+    def __eq__(self, other):
+        if self._same_width(other):
+            return np.array_equal(self.words, other.words)
+        return super(BitsetTraitSet, self).__eq__(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def union(self, *others):
+        result = self.copy()
+        if all(self._same_width(other) for other in others):
+            result.update(*others)
+            return result
+        return set(self).union(*others)
+
+    def intersection(self, other):
+        if self._same_width(other):
+            return BitsetTraitSet(self.words & other.words)
+        return set(self).intersection(other)
+
+    def difference(self, other):
+        if self._same_width(other):
+            return BitsetTraitSet(self.words & ~other.words)
+        return set(self).difference(other)
+
+    def symmetric_difference(self, other):
+        if self._same_width(other):
+            return BitsetTraitSet(self.words ^ other.words)
+        return set(self).symmetric_difference(other)
+
+    def __or__(self, other):
+        return self.union(other)
+
+    def __and__(self, other):
+        return self.intersection(other)
+
+    def __sub__(self, other):
+        return self.difference(other)
+
+    def __xor__(self, other):
+        return self.symmetric_difference(other)
+
+    def get_packed(self):
+        """
+        Returns the raw bytes of the bitset, which identify the trait set exactly.
+        """
+        return self.words.tostring()
+
+    def __repr__(self):
+        return 'BitsetTraitSet(%r)' % list(self)
+
+
+def encode_trait_bitmap(traits, num_traits):
+    """
+    Returns a compact byte string holding the traits as a bitmap over the universe 0..num_traits-1, in the
+    same layout as BitsetTraitSet (little-endian 64-bit words, trait t in bit t % 64 of word t // 64).
+    """
+    num_words = num_words_for_traits(num_traits)
+    if isinstance(traits, BitsetTraitSet) and len(traits.words) == num_words:
+        words = traits.words
+    else:
+        words = np.zeros(num_words, dtype=np.uint64)
+        set_bitset_words(words, traits)
+    return words.astype('<u8').tostring()
+
+
+def decode_trait_bitmap(bitmap):
+    """
+    Returns the sorted list of traits in a bitmap produced by encode_trait_bitmap().
+    """
+    return list(iter_set_bits(np.fromstring(bitmap, dtype='<u8')))
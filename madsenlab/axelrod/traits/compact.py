@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Compact stored representation of a culture's trait graph, as a bitmap over the static forest of balanced trait
+trees, with conversion to NetworkX graphs and GraphML only on demand.
+
+"""
+
+import logging as log
+import networkx as nx
+import madsenlab.axelrod.utils as utils
+from bitset import decode_trait_bitmap
+
+
+# the trait forests are static for a given set of parameters, so each is built once per process
+_universe_cache = dict()
+
+
+def get_balanced_forest_universe(branching_factor, depth_factor, num_trees):
+    """
+    Returns the forest of balanced trait trees used by MultipleBalancedTreeStructuredTraitFactory for these
+    parameters, with the same trait numbering.
+    """
+    key = (int(branching_factor), int(depth_factor), int(num_trees))
+    if key not in _universe_cache:
+        (trees, roots) = utils.generate_forest_balanced_trees(key[0], key[1], key[2])
+        _universe_cache[key] = trees
+    return _universe_cache[key]
+
+
+class CompactTraitForest(object):
+    """
+    A culture's trait set, stored as the bitmap from encode_trait_bitmap() along with the parameters of the
+    balanced trait forest it is drawn from.  The trait list, the induced subgraph of the forest, and its
+    GraphML are only computed when asked for.
+    """
+
+    def __init__(self, bitmap, branching_factor, depth_factor, num_trees):
+        self.bitmap = bitmap
+        self.branching_factor = branching_factor
+        self.depth_factor = depth_factor
+        self.num_trees = num_trees
+        self._traits = None
+
+    @classmethod
+    def from_record(cls, record, entry):
+        """
+        Constructs the trait forest for one entry of the culture_trait_bitmaps field of a stored sample.
+        """
+        return cls(str(entry['bitmap']), record['branching_factor'], record['depth_factor'], record['num_trait_trees'])
+
+    def get_traits(self):
+        if self._traits is None:
+            self._traits = decode_trait_bitmap(self.bitmap)
+        return self._traits
+
+    def get_graph(self):
+        universe = get_balanced_forest_universe(self.branching_factor, self.depth_factor, self.num_trees)
+        return universe.subgraph(self.get_traits())
+
+    def get_graphml(self):
+        linefeed = chr(10)
+        return linefeed.join(nx.generate_graphml(self.get_graph()))
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Trait sets from which a uniformly random trait can be drawn in constant time.
+
+"""
+
+import collections
+import itertools
+import random
+from madsenlab.axelrod.utils.indexed_set import IndexedSet
+
+
+class IndexedTraitSet(IndexedSet):
+    """
+    A set of traits which also keeps its traits in a dense list (see IndexedSet), so that the rules can draw a
+    random trait by indexing, where random.sample() on a built-in set copies the whole set into a sequence
+    for every draw.  Traits are added, removed, and tested for membership in O(1).
+
+    The class behaves like the built-in set for everything the rules and analysis code do with trait sets.
+    Comparisons are done by the dict of positions' key view, in C.  Union, intersection, and differences
+    return new IndexedTraitSets, so that traits can be drawn from them in the same way, whose traits are in
+    the order of the operands' dense lists.  Random draws therefore depend only on the order in which traits
+    were added and removed, and not on the layout of any hash table, so a run restored from a checkpoint
+    (which saves each set in order) draws the same traits as the run it continues.
+    """
+
+    @classmethod
+    def _from_iterable(cls, iterable):
+        # used by the MutableSet mixin methods, and for the results of set algebra
+        result = cls()
+        elements = list(iterable)
+        result._elements = elements
+        result._positions = dict(zip(elements, xrange(len(elements))))
+        return result
+
+    def __getitem__(self, index):
+        return self._elements[index]
+
+    def _keys(self):
+        return self._positions.viewkeys()
+
+    def update(self, *others):
+        for other in others:
+            for trait in other:
+                self.add(trait)
+
+    def copy(self):
+        return self._from_iterable(self._elements)
+
+    def isdisjoint(self, other):
+        other = _as_set(other)
+        if len(other) < len(self._elements):
+            return not any(trait in self._positions for trait in other)
+        return not any(trait in other for trait in self._elements)
+
+    def issubset(self, other):
+        return self._keys() <= _as_set(other)
+
+    def issuperset(self, other):
+        return self._keys() >= _as_set(other)
+
+    def __le__(self, other):
+        return self.issubset(other)
+
+    def __ge__(self, other):
+        return self.issuperset(other)
+
+    def __lt__(self, other):
+        return self._keys() < _as_set(other)
+
+    def __gt__(self, other):
+        return self._keys() > _as_set(other)
+
+    def __eq__(self, other):
+        if not isinstance(other, collections.Set):
+            return NotImplemented
+        return self._keys() == _as_set(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def union(self, *others):
+        result = self.copy()
+        result.update(*others)
+        return result
+
+    def intersection(self, other):
+        other = _as_set(other)
+        return self._from_iterable([trait for trait in self._elements if trait in other])
+
+    def difference(self, other):
+        other = _as_set(other)
+        return self._from_iterable([trait for trait in self._elements if trait not in other])
+
+    def symmetric_difference(self, other):
+        other_set = _as_set(other)
+        result = self._from_iterable([trait for trait in self._elements if trait not in other_set])
+        result.update(trait for trait in other if trait not in self._positions)
+        return result
+
+    def __or__(self, other):
+        return self.union(other)
+
+    def __and__(self, other):
+        return self.intersection(other)
+
+    def __sub__(self, other):
+        return self.difference(other)
+
+    def __xor__(self, other):
+        return self.symmetric_difference(other)
+
+    __ror__ = __or__
+    __rand__ = __and__
+    __rxor__ = __xor__
+
+    def __rsub__(self, other):
+        return self._from_iterable([trait for trait in other if trait not in self._positions])
+
+    def __repr__(self):
+        return 'IndexedTraitSet(%r)' % self._elements
+
+
+def _as_set(traits):
+    if isinstance(traits, IndexedSet):
+        return traits._positions.viewkeys()
+    if isinstance(traits, (set, frozenset)):
+        return traits
+    return set(traits)
+
+
+def get_random_trait(traits):
+    """
+    Returns a uniformly random trait from a non-empty trait set, drawing on the random module as the rules do.
+    IndexedTraitSets are indexed directly.  Other sets are iterated up to the chosen position, which unlike
+    random.sample() does not copy the set, but still takes time linear in its size.  The trait drawn depends
+    on the iteration order of the set; see BaseGraphPopulation.rebuild_agent_traits().
+    """
+    index = int(random.random() * len(traits))
+    if isinstance(traits, IndexedTraitSet):
+        return traits[index]
+    return next(itertools.islice(traits, index, None))
@@ -9,7 +9,6 @@ Description here
 """
 
 import networkx as nx
-from numpy.random import RandomState
 import numpy as np
 import matplotlib.pyplot as plt
 import madsenlab.axelrod.utils as utils
@@ -17,24 +16,77 @@ import madsenlab.axelrod.analysis as stats
 import logging as log
 import pprint as pp
 import random
+from bitset import encode_trait_bitmap
+
+# number of traits drawn from the universe, and rejected because the agent already has them, before
+# get_random_trait_not_in_set() chooses directly among the traits the agent lacks
+MAX_INNOVATION_REJECTIONS = 8
+
+
+def get_missing_trait_by_rank(agent_traits, rank):
+    """
+    Returns the rank'th smallest (from 0) non-negative integer trait which is not in agent_traits.  Each trait
+    the agent has, at or below the candidate, pushes the candidate up by one.
+    """
+    rand_trait = rank
+    for trait in sorted(agent_traits):
+        if trait > rand_trait:
+            break
+        rand_trait += 1
+    return rand_trait
+
 
 ##########################################################################
 class TreeStructuredTraitSet(object):
+    """
+    The trait trees are static once they are constructed, so at construction we compile them into arrays
+    giving the parent (-1 for a root), depth, and root of each trait.  Prerequisite lookups are then O(depth)
+    walks up the parent array, instead of a search of the trait graph.
+    """
 
     def __init__(self, graph, prng):
         self.graph = graph
         self.prng = prng
+        self._compile_ancestor_tables([0])
 
 
-    def get_parents_for_node(self, node_id):
+    def _compile_ancestor_tables(self, roots):
         """
-        Given a node in a tree, return a list of its parents (but not the node itself).
+        Fills the parent, depth, and root arrays by a breadth-first traversal from each root, which works
+        for trees of any shape.  Traits must be labeled with consecutive integers starting at 0.
+        """
+        num_traits = self.graph.number_of_nodes()
+        self.parent_array = np.empty(num_traits, dtype=np.int_)
+        self.depth_array = np.empty(num_traits, dtype=np.int_)
+        self.root_array = np.empty(num_traits, dtype=np.int_)
+        for root in roots:
+            self.parent_array[root] = -1
+            self.depth_array[root] = 0
+            self.root_array[root] = root
+            for (parent, child) in nx.bfs_edges(self.graph, root):
+                self.parent_array[child] = parent
+                self.depth_array[child] = self.depth_array[parent] + 1
+                self.root_array[child] = root
+        self._set_parent_list()
+
+
+    def _set_parent_list(self):
+        # walking a list of python ints is considerably faster than indexing into a numpy array
+        self._parents = self.parent_array.tolist()
+
 
-        Relies on the fact that all_simple_paths should return only a single path in a tree
+    def get_parents_for_node(self, node_id):
+        """
+        Given a node in a tree, return a list of its parents (but not the node itself), starting
+        with the root.
         """
-        generator = nx.all_simple_paths(self.graph, source=0, target=node_id)
-        path = generator.next()  # only one tree should come back
-        path.pop() # remove last element, which is the target node_id
+        parents = self._parents
+        path = []
+        parent = parents[node_id]
+        while parent >= 0:
+            path.append(parent)
+            parent = parents[parent]
+        path.reverse()
         return path
 
     def get_deepest_missing_prereq_for_trait(self, trait, agent_traits):
@@ -44,13 +96,14 @@ class TreeStructuredTraitSet(object):
         possess*.  This should be called after _has_prereq_for_trait_ has returned False,
         otherwise it is not guaranteed to return a defined trait value.
         """
-        prereqs = self.get_parents_for_node(trait)
-        # first element is the relevant root, so we have to work from the tail up
-        prereqs.reverse()
-        for t in prereqs:
-            #log.debug("testing prereq: %s from %s", t, prereqs)
+        # walk from the trait's parent up toward the root
+        parents = self._parents
+        t = parents[trait]
+        while t >= 0:
+            #log.debug("testing prereq: %s for %s", t, trait)
             if t not in agent_traits:
                 return t
+            t = parents[t]
 
         # this should not happen if called after has_prereq_for_trait(t) == False
         return None
@@ -62,10 +115,12 @@ class TreeStructuredTraitSet(object):
         if the agent possesses traits along the tree path between the focal trait and
         the root of a trait tree.
         """
-        prereqs = self.get_parents_for_node(trait)
-        for t in prereqs:
+        parents = self._parents
+        t = parents[trait]
+        while t >= 0:
             if t not in agent_traits:
                 return False
+            t = parents[t]
 
         # otherwise, agent has prereqs
         return True
@@ -96,19 +151,34 @@ class TreeStructuredTraitSet(object):
         return draw
 
 
-    def get_random_trait_not_in_set(self, agent_traits):
+    def get_random_trait_not_in_set(self, agent_traits, missing_trait_by_rank=None):
         """
-        In the case where an agent already has all of the traits, the "not in agent" set will be
-        null, and the random.sample call will throw an exception.  Since it doesn't hurt to
-        duplicate a trait the agent already has (it's a set, not a list), we just return a random
-        trait here to keep things moving.
+        Returns a uniformly random trait which the agent does not possess.  Traits are drawn from the whole
+        universe, and redrawn if the agent already has them, which rarely takes more than a draw or two unless
+        the agent holds most of the universe.  After MAX_INNOVATION_REJECTIONS draws, the trait is instead
+        chosen by its rank among the traits the agent lacks, through missing_trait_by_rank(rank) if it is given
+        (see TreeTraitStructurePopulation.get_random_trait_not_in_agent()), and otherwise through
+        get_missing_trait_by_rank(), which sorts the agent's trait set.
+
+        In the case where an agent already has all of the traits, there is nothing to choose from.
+        Since it doesn't hurt to duplicate a trait the agent already has (it's a set, not a list),
+        we just return a random trait here to keep things moving.
         """
-        full_trait_set = set(self.graph.nodes())
-        not_in_agent = full_trait_set.difference(agent_traits)
-        if len(not_in_agent) == 0:
-            rand_trait = random.sample(full_trait_set, 1)[0]
+        num_traits = self.graph.number_of_nodes()
+        num_missing = num_traits - len(agent_traits)
+        if num_missing <= 0:
+            return int(random.random() * num_traits)
+
+        for i in range(0, MAX_INNOVATION_REJECTIONS):
+            rand_trait = int(random.random() * num_traits)
+            if rand_trait not in agent_traits:
+                return rand_trait
+
+        rank = int(random.random() * num_missing)
+        if missing_trait_by_rank is not None:
+            rand_trait = missing_trait_by_rank(rank)
         else:
-            rand_trait = random.sample(not_in_agent, 1)[0]
+            rand_trait = get_missing_trait_by_rank(agent_traits, rank)
         #log.debug("random trait not in agent: %s", rand_trait)
         return rand_trait
 
@@ -129,29 +199,58 @@ class MultipleTreeStructuredTraitSet(TreeStructuredTraitSet):
         self.branching = simconfig.branching_factor
         self.depth = simconfig.depth_factor
 
-
-    def _get_root_for_node(self, node):
-        result = 0
-        for root in self.roots:
-            if node < root:
-                break
-            result = root
-        return result
+        if self._is_balanced_forest():
+            self._compile_balanced_ancestor_tables()
+        else:
+            self._compile_ancestor_tables(self.roots)
 
 
-    def get_parents_for_node(self, node_id):
+    def _is_balanced_forest(self):
+        """
+        True if the trait graph is a forest of identical balanced trees, labeled consecutively as
+        generate_forest_balanced_trees() does.
         """
-        Given a node in a tree, return a list of its parents (but not the node itself).
+        r = int(self.branching)
+        h = int(self.depth)
+        if r < 2:
+            return False
+        tree_size = stats.num_nodes_balanced_tree(r, h)
+        if self.graph.number_of_nodes() != tree_size * len(self.roots):
+            return False
+        return list(self.roots) == range(0, tree_size * len(self.roots), tree_size)
 
-        Relies on the fact that all_simple_paths should return only a single path in a tree, but
-        allows for multiple roots (i.e., we may have multiple trees)
+
+    def _compile_balanced_ancestor_tables(self):
         """
-        root_for_node = self._get_root_for_node(node_id)
-        #log.debug("getting paths from %s to %s", root_for_node, node_id)
-        generator = nx.all_simple_paths(self.graph, source=root_for_node, target=node_id)
-        path = generator.next()  # only one tree should come back
-        path.pop() # remove last element, which is the target node_id
-        return path
+        In a balanced tree with branching factor r, NetworkX labels the nodes in breadth-first order, so the
+        parent of the node with local label i > 0 is (i - 1) // r, and each level d occupies a consecutive
+        block of r^d labels.  The tables for a single tree are thus computed arithmetically, and then offset
+        for each tree in the forest.
+        """
+        r = int(self.branching)
+        h = int(self.depth)
+        tree_size = stats.num_nodes_balanced_tree(r, h)
+
+        local = np.arange(tree_size, dtype=np.int_)
+        local_parent = (local - 1) // r
+        local_depth = np.empty(tree_size, dtype=np.int_)
+        begin = 0
+        for d in range(0, h + 1):
+            width = r ** d
+            local_depth[begin:begin + width] = d
+            begin += width
+
+        num_trees = len(self.roots)
+        offsets = np.repeat(np.asarray(self.roots, dtype=np.int_), tree_size)
+        self.parent_array = np.tile(local_parent, num_trees) + offsets
+        self.parent_array[self.roots] = -1
+        self.depth_array = np.tile(local_depth, num_trees)
+        self.root_array = offsets
+        self._set_parent_list()
+
+
+    def _get_root_for_node(self, node):
+        return int(self.root_array[node])
 
 
     def draw_trait_network_for_culture(self, culture, node_list):
@@ -166,6 +265,13 @@ class MultipleTreeStructuredTraitSet(TreeStructuredTraitSet):
         linefeed=chr(10)
         return linefeed.join(nx.generate_graphml(trait_subgraph))
 
+    def get_trait_bitmap_for_culture(self, node_list):
+        """
+        Returns the compact bitmap encoding of a culture's traits over this trait forest, which
+        CompactTraitForest turns back into a graph or GraphML.
+        """
+        return encode_trait_bitmap(node_list, self.graph.number_of_nodes())
+
     def get_trait_graph_components(self, node_list):
         trait_subgraph = self.graph.subgraph(node_list)
         return nx.connected_component_subgraphs(trait_subgraph)
@@ -176,10 +282,10 @@ class MultipleTreeStructuredTraitSet(TreeStructuredTraitSet):
 
     def get_random_trait_path_rootbiased(self):
         # choose a random root
-        root = random.sample(self.roots, 1)[0]
+        root = self.roots[self.prng.randint(0, len(self.roots))]
         #log.debug("root chosen: %s", root)
         # choose how deep we go, limited to max depth of tree, but Poisson biased heavily towards the root
-        depth = np.random.poisson(0.5, 1)[0]
+        depth = self.prng.poisson(0.5)
         if depth > self.depth:
             depth = self.depth
         #log.debug("initializing a trait at depth %s", depth)
@@ -207,7 +313,7 @@ class MultipleTreeStructuredTraitSet(TreeStructuredTraitSet):
             #log.debug("neighbors: %s", pp.pformat(neighbors))
             if prev in neighbors:
                 neighbors.remove(prev)
-            random_node = random.sample(neighbors, 1)[0]
+            random_node = neighbors[self.prng.randint(0, len(neighbors))]
             prev = current
             current = random_node
             d -= 1
@@ -259,7 +365,7 @@ class BalancedTreeStructuredTraitFactory(object):
 
     def __init__(self, simconfig):
         self.simconfig = simconfig
-        self.prng = RandomState()
+        self.prng = simconfig.get_random_stream('traits')
 
     def initialize_traits(self):
         g = nx.balanced_tree(self.simconfig.branching_factor,
@@ -279,7 +385,7 @@ class BalancedTreeStructuredTraitFactory(object):
 class MultipleBalancedTreeStructuredTraitFactory(object):
     def __init__(self, simconfig):
         self.simconfig = simconfig
-        self.prng = RandomState()
+        self.prng = simconfig.get_random_stream('traits')
 
 
 
@@ -9,7 +9,6 @@ Description here
 """
 
 import networkx as nx
-from numpy.random import RandomState
 import logging as log
 
 class ExtensibleTraitFactory(object):
@@ -65,7 +64,7 @@ class AxelrodTraitFactory(object):
 
     def __init__(self, simconfig):
         self.simconfig = simconfig
-        self.prng = RandomState()  # allow the library to choose a seed via OS specific mechanism
+        self.prng = simconfig.get_random_stream('traits')
 
     def initialize_population(self,graph):
         nf = self.simconfig.num_features
@@ -11,6 +11,13 @@ Description here
 from configuration import AxelrodConfiguration, AxelrodExtensibleConfiguration, TreeStructuredConfiguration
 from dynamicloading import load_class
 from convergence import check_liveness
-from sampling import sample_extensible_model, sample_treestructured_model, sample_axelrod_model
-from graphviz import generate_ordered_dot, write_ordered_dot, convert_random_traitgraphs_to_dot, convert_single_traitgraph_to_dot
+from sampling import sample_extensible_model, sample_treestructured_model, sample_axelrod_model, set_symmetry_cache, get_symmetry_cache
+from graphviz import generate_ordered_dot, write_ordered_dot, convert_random_traitgraphs_to_dot, convert_single_traitgraph_to_dot, \
+    get_trait_graphs_for_record
 from graph_constructors import generate_forest_balanced_trees
+from indexed_set import IndexedSet
+from checkpoint import save_checkpoint, load_checkpoint
+from random_streams import derive_seed, mask_seed, get_random_stream
+from sweep import SweepExecutor, SweepTimeout
+from sweep_ledger import SweepLedger, get_parameter_key
+from sweep_queue import SweepQueue, SweepTask, get_worker_id
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Checkpoints of a running simulation, so that a long run which is killed can be resumed from its last
+checkpoint rather than from the beginning.
+
+"""
+
+import logging as log
+import os
+import random
+import tempfile
+import numpy as np
+
+
+CHECKPOINT_VERSION = 1
+
+
+def save_checkpoint(path, model, rule, timestep):
+    """
+    Writes the state of a simulation at time timestep to path, as a NumPy .npz archive:  the agents' traits,
+    the population graph, the parameters of the trait universe, the counters kept by the population, the
+    rule's active link set, and the state of every random number generator the simulation draws from.
+
+    Array backed populations are saved by copying their trait matrices directly; populations with trait sets
+    are flattened into a single array of trait values and an array of offsets, one per agent.  The trait sets
+    of the running simulation are first rebuilt (see BaseGraphPopulation.rebuild_agent_traits()), as are the
+    sets restored by load_checkpoint(), so that both runs continue with the same sets.  The archive is
+    written to a temporary file in the same directory and renamed over path, so a job killed while writing
+    leaves the previous checkpoint intact.
+    """
+    simconfig = model.simconfig
+    arrays = dict()
+
+    arrays['version'] = np.array(CHECKPOINT_VERSION)
+    arrays['timestep'] = np.array(timestep)
+    arrays['sim_id'] = np.array(simconfig.sim_id)
+    if simconfig.random_seed is not None:
+        arrays['random_seed'] = np.array(simconfig.random_seed, dtype=np.int64)
+    arrays['num_agents'] = np.array(model.num_agents)
+
+    # counters kept by BaseGraphPopulation
+    arrays['counters'] = np.array([model.interactions, model.innovations, model.losses,
+                                   model.time_step_last_interaction], dtype=np.int64)
+
+    arrays['edges'] = np.array(model.edges, dtype=np.int64).reshape(-1, 2)
+    model.rebuild_agent_traits()
+    arrays.update(_get_trait_arrays(model))
+
+    trait_universe = getattr(model, 'trait_universe', None)
+    if trait_universe is not None:
+        arrays['trait_universe'] = np.array([simconfig.num_trees, simconfig.branching_factor, simconfig.depth_factor,
+                                             trait_universe.graph.number_of_nodes()], dtype=np.float64)
+
+    arrays['active_links'] = np.array(list(rule.active_link_set), dtype=np.int64).reshape(-1, 2)
+
+    for (name, prng) in _get_random_states(model):
+        (kind, keys, pos, has_gauss, cached_gaussian) = prng.get_state()
+        arrays['prng_%s_keys' % name] = keys
+        arrays['prng_%s_state' % name] = np.array([pos, has_gauss, cached_gaussian], dtype=np.float64)
+
+    (version, internal, gauss_next) = random.getstate()
+    arrays['python_random_state'] = np.array(internal, dtype=np.int64)
+    arrays['python_random_gauss'] = np.array([version, gauss_next is not None, gauss_next or 0.0], dtype=np.float64)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    (fd, tmpname) = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **arrays)
+        os.rename(tmpname, path)
+    except:
+        os.remove(tmpname)
+        raise
+    log.debug("checkpoint of %s at time %s written to %s", simconfig.sim_id, timestep, path)
+
+
+def load_checkpoint(path, model, rule):
+    """
+    Restores a simulation from a checkpoint written by save_checkpoint(), and returns the time step at which
+    the checkpoint was taken.  The model and rule must have been constructed, and the population initialized,
+    with the same configuration as the checkpointed simulation; their state is then overwritten, and the
+    simulation ID and random seed in the configuration are set back to those of the checkpointed run.
+    Observers already registered with the population, such as IncrementalPopulationStatistics and the culture
+    fingerprint tracker, are rebuilt from the restored traits.
+    """
+    saved = np.load(path)
+    if int(saved['version']) != CHECKPOINT_VERSION:
+        raise ValueError("Checkpoint %s has unsupported version %s" % (path, int(saved['version'])))
+
+    simconfig = model.simconfig
+    if int(saved['num_agents']) != model.num_agents:
+        raise ValueError("Checkpoint %s is for a population of %s agents, not %s" %
+                         (path, int(saved['num_agents']), model.num_agents))
+
+    trait_universe = getattr(model, 'trait_universe', None)
+    if trait_universe is not None:
+        expected = [simconfig.num_trees, simconfig.branching_factor, simconfig.depth_factor,
+                    trait_universe.graph.number_of_nodes()]
+        if list(saved['trait_universe']) != [float(v) for v in expected]:
+            raise ValueError("Checkpoint %s was taken with a different trait universe" % path)
+
+    simconfig.sim_id = str(saved['sim_id'])
+    if 'random_seed' in saved.files:
+        simconfig.random_seed = int(saved['random_seed'])
+    (model.interactions, model.innovations, model.losses, model.time_step_last_interaction) = \
+        [int(c) for c in saved['counters']]
+
+    _restore_graph(model, saved['edges'])
+    _restore_traits(model, saved)
+    model.rebuild_agent_traits()
+
+    rule.active_link_set.clear()
+    for (a, b) in saved['active_links'].tolist():
+        rule.active_link_set.add((a, b))
+    rule.num_links = model.num_edges
+    if rule.link_weights is not None:
+        rule.link_weights.clear()
+        rule.total_link_weight = 0.0
+        for (a, b) in rule.active_link_set:
+            rule._set_link_weight(a, model.agent_traits[a], b, model.agent_traits[b])
+
+    for (name, prng) in _get_random_states(model):
+        (pos, has_gauss, cached_gaussian) = saved['prng_%s_state' % name]
+        prng.set_state(('MT19937', saved['prng_%s_keys' % name], int(pos), int(has_gauss), float(cached_gaussian)))
+
+    (version, has_gauss_next, gauss_next) = saved['python_random_gauss']
+    if has_gauss_next == 0:
+        gauss_next = None
+    random.setstate((int(version), tuple(int(v) for v in saved['python_random_state']), gauss_next))
+
+    for observer in model.observers:
+        observer.rebuild()
+
+    timestep = int(saved['timestep'])
+    saved.close()
+    log.info("resumed %s from checkpoint %s at time %s", simconfig.sim_id, path, timestep)
+    return timestep
+
+
+def _get_random_states(model):
+    """
+    Returns (name, RandomState) for each generator the simulation draws from:  the population's, the
+    configuration's, the trait factory's (which the trait universe shares), and NumPy's global generator.
+    """
+    states = [('model', model.prng), ('config', model.simconfig.prng)]
+    trait_prng = getattr(model.trait_factory, 'prng', None)
+    if trait_prng is not None:
+        states.append(('traits', trait_prng))
+    states.append(('numpy', np.random.mtrand._rand))
+    return states
+
+
+def _get_trait_arrays(model):
+    traits = getattr(model, 'traits', None)
+    if isinstance(traits, np.ndarray):
+        return dict(trait_matrix=traits)
+
+    n = model.num_agents
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    values = []
+    is_array = False
+    for agent_id in range(0, n):
+        agent_traits = model.agent_traits[agent_id]
+        is_array = isinstance(agent_traits, np.ndarray)
+        values.extend(agent_traits)
+        offsets[agent_id + 1] = len(values)
+    return dict(trait_offsets=offsets, trait_values=np.array(values, dtype=np.int64),
+                trait_arrays=np.array(is_array))
+
+
+def _restore_traits(model, saved):
+    if 'trait_matrix' in saved.files:
+        model.traits[:] = saved['trait_matrix']
+        return
+
+    offsets = saved['trait_offsets']
+    values = saved['trait_values']
+    is_array = bool(saved['trait_arrays'])
+    for agent_id in range(0, len(offsets) - 1):
+        agent_values = values[offsets[agent_id]:offsets[agent_id + 1]]
+        if is_array:
+            model.set_agent_traits(agent_id, agent_values.copy())
+        else:
+            model.set_agent_traits(agent_id, set(agent_values.tolist()))
+
+
+def _restore_graph(model, edges):
+    """
+    Replaces the edges of the population graph with the saved edges, if they differ (e.g., for a randomly
+    rewired small world graph), which recompiles the population's edge table and neighbor arrays.
+    """
+    saved_edges = set((min(a, b), max(a, b)) for (a, b) in edges.tolist())
+    current_edges = set((a, b) for (a, b) in model.edges.tolist())
+    if saved_edges == current_edges:
+        return
+    model.set_edges(edges)
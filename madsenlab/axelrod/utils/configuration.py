@@ -11,7 +11,10 @@ Description here
 import json
 from operator import itemgetter
 from numpy.random import RandomState
+import numpy as np
+import random
 import sys
+from random_streams import derive_seed, mask_seed, get_seed_words, get_random_stream
 
 ##########################################################################
 
@@ -106,6 +109,7 @@ class BaseConfiguration(object):
         self._periodic = None
         self._script = None
         self._max_time = None
+        self._random_seed = None
 
         # set up a global RNG everything can use
         self._prng = RandomState()
@@ -114,6 +118,39 @@ class BaseConfiguration(object):
     def prng(self):
         return self._prng
 
+    @property
+    def random_seed(self):
+        return self._random_seed
+
+    @random_seed.setter
+    def random_seed(self, seed):
+        # seeds given on the command line can have any size, but are stored with the run's results
+        self._random_seed = None if seed is None else mask_seed(seed)
+
+    def seed_random_streams(self):
+        """
+        Seeds every random number generator used by a simulation run, so that the run can be reproduced from
+        its seed.  If random_seed has not been set, it is derived from sim_id, so each run has its own stream.
+        The configuration's prng, and the generators which the population and trait factories obtain from
+        get_random_stream(), are independent substreams of the seed.  The rules (and NetworkX's random graph
+        generators) draw from NumPy's and Python's global generators, which are seeded from substreams as
+        well; since a process runs one simulation at a time, each parallel worker's run gets its own streams.
+
+        Call this after setting sim_id, and before constructing the factories and population.
+        """
+        if self._random_seed is None:
+            self._random_seed = derive_seed(self._sim_id)
+        self._prng = get_random_stream(self._random_seed, 'config')
+        np.random.seed(get_seed_words(self._random_seed, 'numpy'))
+        random.seed(derive_seed(self._random_seed, 'python'))
+
+    def get_random_stream(self, name):
+        """
+        Returns a RandomState for the substream called name of this run's seed, or an unseeded RandomState
+        if seed_random_streams() has not been called.
+        """
+        return get_random_stream(getattr(self, '_random_seed', None), name)
+
 
     @property
     def script(self):
@@ -304,7 +341,7 @@ class AxelrodConfiguration(BaseConfiguration):
 
 
     # For Latex or Pandoc output, we also filter out any object instance variables, and output only the class-level variables.
-    vars_to_filter = ['config', '_prng', "_popsize", "_num_features", "_num_traits", "_sim_id", "_periodic", "_script", "_drift_rate", "_max_time", "_num_features", "_num_traits"]
+    vars_to_filter = ['config', '_prng', '_random_seed', "_popsize", "_num_features", "_num_traits", "_sim_id", "_periodic", "_script", "_drift_rate", "_max_time", "_num_features", "_num_traits"]
     """
     List of variables which are never (or at least currently) pretty-printed into summary tables using the latex or markdown/pandoc methods
 
@@ -383,7 +420,7 @@ class AxelrodExtensibleConfiguration(BaseConfiguration):
     Traits can be any token from 0 to this value.
     """
     # For Latex or Pandoc output, we also filter out any object instance variables, and output only the class-level variables.
-    vars_to_filter = ['config', '_prng', "_popsize", "_num_features", "_num_traits", "_sim_id", "_periodic", "_script", "_drift_rate"]
+    vars_to_filter = ['config', '_prng', '_random_seed', "_popsize", "_num_features", "_num_traits", "_sim_id", "_periodic", "_script", "_drift_rate"]
     """
     List of variables which are never (or at least currently) pretty-printed into summary tables using the latex or markdown/pandoc methods
 
@@ -496,7 +533,7 @@ class TreeStructuredConfiguration(BaseConfiguration):
 
 
     # For Latex or Pandoc output, we also filter out any object instance variables, and output only the class-level variables.
-    vars_to_filter = ['config', '_prng', "_popsize", "_num_features", "_num_traits", "_sim_id", "_periodic", "_script", "_drift_rate", "_maxtraits",
+    vars_to_filter = ['config', '_prng', '_random_seed', "_popsize", "_num_features", "_num_traits", "_sim_id", "_periodic", "_script", "_drift_rate", "_maxtraits",
                       "_learning_rate", "_num_trees", "_branching_factor", "_depth_factor", "_loss_rate", "_innov_rate", "_max_time", "_wsrewiring",
                       "_save_graphs", "INTERACTION_RULE_CLASS", "POPULATION_STRUCTURE_CLASS", "NETWORK_FACTORY_CLASS", "TRAIT_FACTORY_CLASS"]
 
@@ -43,13 +43,7 @@ def convert_traitgraph_to_dot(record_id, rec_num, format_string, directory):
     log.debug("converting traitgraphs from %s to dot", record_id)
 
     for result in res:
-        graph_list = result['culture_graphml_repr']
-        graphs = []
-        #log.debug("num graphs in graphml list: %s", len(graph_list))
-        for g in graph_list:
-            g_c = g['content']
-            graph = nx.parse_graphml(g_c)
-            graphs.append(graph)
+        graphs = get_trait_graphs_for_record(result)
 
         for i in range(0, len(graphs)):
             #log.debug("writing file for graph: %s", i)
@@ -71,6 +65,33 @@ def convert_traitgraph_to_dot(record_id, rec_num, format_string, directory):
 
 
 
+def get_trait_graphs_for_record(record):
+    """
+    Returns the saved trait graphs of a sample as NetworkX graphs, from the compact trait bitmaps if the
+    sample has them, or by parsing the GraphML saved by older versions of the simulations.
+    """
+    # imported here because the traits package itself imports utils
+    from madsenlab.axelrod.traits.compact import CompactTraitForest
+
+    graphs = []
+    bitmap_list = record.get('culture_trait_bitmaps')
+    if bitmap_list:
+        for entry in bitmap_list:
+            graphs.append(CompactTraitForest.from_record(record, entry).get_graph())
+        return graphs
+
+    graph_list = record.get('culture_graphml_repr') or []
+    #log.debug("num graphs in graphml list: %s", len(graph_list))
+    for g in graph_list:
+        g_c = g['content']
+        graph = nx.parse_graphml(g_c)
+        graphs.append(graph)
+    return graphs
+
+
+
+
+
 def convert_random_traitgraphs_to_dot(ssize, directory, finalize=True):
     id_list = []
     query = dict()
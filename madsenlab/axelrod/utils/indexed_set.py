@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Description here
+
+"""
+
+import collections
+
+
+class IndexedSet(collections.MutableSet):
+    """
+    A set which also keeps its elements in a dense list, so that a uniformly random element can be
+    chosen in O(1) time without copying the set into a sequence (as random.sample() does).  Removal
+    swaps the last element of the list into the vacated position, so add, remove, and membership tests
+    all remain O(1).
+
+    Set algebra and comparisons with ordinary sets are provided by the MutableSet mixin methods.
+    """
+
+    def __init__(self, iterable=()):
+        self._elements = []
+        self._positions = {}
+        for element in iterable:
+            self.add(element)
+
+    def __contains__(self, element):
+        return element in self._positions
+
+    def __iter__(self):
+        return iter(self._elements)
+
+    def __len__(self):
+        return len(self._elements)
+
+    def add(self, element):
+        if element not in self._positions:
+            self._positions[element] = len(self._elements)
+            self._elements.append(element)
+
+    def discard(self, element):
+        position = self._positions.pop(element, None)
+        if position is None:
+            return
+        last = self._elements.pop()
+        if position < len(self._elements):
+            self._elements[position] = last
+            self._positions[last] = position
+
+    def clear(self):
+        self._elements = []
+        self._positions = {}
+
+    def random_element(self, prng):
+        """
+        Returns a uniformly random element, using the supplied numpy RandomState.  The set must not be empty.
+        """
+        return self._elements[prng.randint(0, len(self._elements))]
+
+    def __repr__(self):
+        return 'IndexedSet(%r)' % self._elements
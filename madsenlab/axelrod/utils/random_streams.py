@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Seeds for reproducible simulation runs, and independent random number streams derived from them.
+
+"""
+
+import hashlib
+import numpy as np
+from numpy.random import RandomState
+
+
+MAX_SEED = 2 ** 63 - 1
+
+
+def mask_seed(seed):
+    """
+    Returns the given integer seed reduced to its low 63 bits, so that any seed fits in a MongoDB (or SQLite)
+    integer field.  Seeds in [0, 2^63) are unchanged.
+    """
+    return int(seed) & MAX_SEED
+
+
+def derive_seed(*parts):
+    """
+    Returns a seed in [0, 2^63) determined by the given values (e.g., a simulation ID, or a base seed together
+    with a parameter combination and replicate number), which fits in a MongoDB integer field.
+    """
+    digest = hashlib.sha1(":".join(str(p) for p in parts)).hexdigest()
+    return mask_seed(int(digest[0:16], 16))
+
+
+def get_seed_words(seed, name):
+    """
+    Returns the key, as an array of 32-bit words, for the substream called name of the stream given by seed.
+    Substreams are keyed through SHA-1, so the substreams of one seed, and the streams of different seeds,
+    are independent for all practical purposes.
+    """
+    digest = hashlib.sha1("%s:%s" % (seed, name)).digest()
+    return np.frombuffer(digest, dtype=np.uint32).copy()
+
+
+def get_random_stream(seed, name):
+    """
+    Returns a RandomState for the substream called name of the stream given by seed.  If seed is None, the
+    generator is seeded by the operating system instead, and is not reproducible.
+    """
+    if seed is None:
+        return RandomState()
+    return RandomState(get_seed_words(seed, name))
@@ -29,13 +29,19 @@ def sample_axelrod_model(model,args,simconfig):
                                       len(counts),
                                       model.get_time_last_interaction(),
                                       counts,
-                                      klemm)
+                                      klemm,
+                                      simconfig.random_seed)
     if args.diagram == True:
         model.draw_network_colored_by_culture()
 
 def sample_extensible_model(model, args, simconfig):
-    counts = stats.get_culture_counts_dbformat(model)
-    (mean_traits,sd_traits) = stats.get_num_traits_per_individual_stats(model)
+    incremental = get_incremental_statistics(model)
+    if incremental is not None:
+        counts = incremental.get_culture_counts_dbformat()
+        (mean_traits,sd_traits) = incremental.get_num_traits_per_individual_stats()
+    else:
+        counts = stats.get_culture_counts_dbformat(model)
+        (mean_traits,sd_traits) = stats.get_num_traits_per_individual_stats(model)
     log.debug("culture size - mean: %s sd: %s", mean_traits, sd_traits)
     klemm = stats.klemm_normalized_L_extensible(model, simconfig)
     data.store_stats_axelrod_extensible(simconfig.popsize,
@@ -51,34 +57,26 @@ def sample_extensible_model(model, args, simconfig):
                                       counts,
                                       klemm,
                                       mean_traits,
-                                      sd_traits)
+                                      sd_traits,
+                                      simconfig.random_seed)
     if args.diagram == True:
         model.draw_network_colored_by_culture()
 
 
 def sample_treestructured_model(model, args, simconfig, timestep, finalized):
     log.debug("sampling tree structured model")
-    trait_analyzer = stats.PopulationTraitFrequencyAnalyzer(model)
-    trait_analyzer.calculate_trait_frequencies()
-    trait_spectrum = trait_analyzer.get_trait_spectrum()
-
-    culture_counts_dbformat = stats.get_culture_counts_dbformat(model)
-    culture_count_map = stats.get_culture_count_map(model)
-    (mean_traits,sd_traits) = stats.get_num_traits_per_individual_stats(model)
-    #log.debug("culture size - mean: %s sd: %s", mean_traits, sd_traits)
-    klemm = stats.klemm_normalized_L_extensible(model, simconfig)
+    snapshot = stats.take_population_snapshot(model, simconfig, get_incremental_statistics(model))
 
-    graphml_blobs = []
+    # trait graphs are saved as compact bitmaps over the trait forest; CompactTraitForest rebuilds them on demand
+    trait_bitmaps = []
     trait_tree_stats = []
-    traitset_map = get_traitset_map(model)
-    for culture, traits in traitset_map.items():
-        g = dict(cultureid=str(culture), content=model.trait_universe.get_graphml_for_culture(traits))
+    for culture, traits in snapshot.traitset_map.items():
         if simconfig.save_graphs == True:
-            graphml_blobs.append(g)
-        trait_tree_stats.append( get_tree_symmetries_for_traitset(model, simconfig, culture, traits, culture_count_map))
+            b = dict(cultureid=str(culture), bitmap=model.trait_universe.get_trait_bitmap_for_culture(traits))
+            trait_bitmaps.append(b)
+        trait_tree_stats.append( get_tree_symmetries_for_traitset(model, simconfig, culture, traits, snapshot.culture_count_map))
 
 
-    #log.debug("graphml: %s", pp.pformat(graphml_blobs))
 
     sample_time = timestep
     if finalized == 1:
@@ -88,47 +86,49 @@ def sample_treestructured_model(model, args, simconfig, timestep, finalized):
 
     # Not recording the entropy yet, it doesn't mean anything given the way frequencies work.
 
-    data.store_stats_axelrod_treestructured(simconfig.popsize,
-                                      simconfig.sim_id,
-                                      simconfig.maxtraits,
-                                      simconfig.learning_rate,
-                                      simconfig.loss_rate,
-                                      simconfig.innov_rate,
-                                      simconfig.num_trees,
-                                      simconfig.branching_factor,
-                                      simconfig.depth_factor,
-                                      simconfig.INTERACTION_RULE_CLASS,
-                                      simconfig.POPULATION_STRUCTURE_CLASS,
-                                      simconfig.NETWORK_FACTORY_CLASS,
-                                      simconfig.script,
-                                      len(culture_counts_dbformat),
-                                      trait_spectrum,
-                                      convergence_time,
-                                      sample_time,
-                                      culture_counts_dbformat,
-                                      klemm,
-                                      mean_traits,
-                                      sd_traits,
-                                      graphml_blobs,
-                                      trait_tree_stats,
-                                      trait_analyzer.get_trait_richness(),
-                                      None,
-                                      finalized,
-                                      simconfig.ws_rewiring)
+    data.store_snapshot_axelrod_treestructured(simconfig, snapshot, convergence_time, sample_time,
+                                               [], trait_tree_stats, finalized, trait_bitmaps)
 
     if args.diagram == True and finalized == 1:
-        for culture, traits in traitset_map.items():
+        for culture, traits in snapshot.traitset_map.items():
             model.trait_universe.draw_trait_network_for_culture(culture, traits)
 
 
 
 
 def get_tree_symmetries_for_traitset(model, simconfig, cultureid, traitset, culture_count_map):
+    trait_subgraph = model.trait_universe.get_trait_forest_from_traits(traitset)
+
+    # statistics which depend only upon the shape of the forest are shared by all isomorphic forests
+    cache = get_symmetry_cache()
+    shape_key = stats.get_forest_canonical_key(trait_subgraph)
+    shape = None
+    if shape_key is not None:
+        shape = cache.get(shape_key)
+    if shape is None:
+        shape = get_tree_shape_statistics(model, simconfig, traitset, trait_subgraph)
+        if shape_key is not None:
+            cache.put(shape_key, shape)
+
+    r = dict(shape)
+    r['cultureid'] = str(cultureid)
+    r['culture_count'] = culture_count_map[cultureid]
+    n_per_tree = stats.num_nodes_balanced_tree(int(simconfig.branching_factor), int(simconfig.depth_factor))
+    r['remaining_density'] = float(trait_subgraph.number_of_nodes()) / (float(n_per_tree) * float(simconfig.num_trees))
+    #log.debug("groupstats: %s", r)
+    return r
+
+
+def get_tree_shape_statistics(model, simconfig, traitset, trait_subgraph):
+    """
+    Calculates the symmetry, radius and degree statistics of a trait forest, all of which are invariant
+    under isomorphism of the forest.  The order of the orbit multiplicities follows the vertex order of the
+    forest, so forests found in the cache report them in the order of the first forest with that shape.
+    """
     radii = []
 
     symstats = stats.BalancedTreeAutomorphismStatistics(simconfig)
     subgraph_set = model.trait_universe.get_trait_graph_components(traitset)
-    trait_subgraph = model.trait_universe.get_trait_forest_from_traits(traitset)
     results = symstats.calculate_graph_symmetries(trait_subgraph)
 
     for subgraph in subgraph_set:
@@ -143,34 +143,67 @@ def get_tree_symmetries_for_traitset(model, simconfig, cultureid, traitset, cult
     sd_orbit_mult = np.sqrt(np.var(np.asarray(results['orbitcounts'])))
     max_orbit_mult = np.nanmax(np.asarray(results['orbitcounts']))
 
-    r = dict(cultureid=str(cultureid), culture_count=culture_count_map[cultureid],
-             orbit_multiplicities=results['orbitcounts'],
+    # plain python numbers, so that the statistics can be persisted in the symmetry cache
+    r = dict(orbit_multiplicities=[int(c) for c in results['orbitcounts']],
              orbit_number=results['orbits'],
              autgroupsize=results['groupsize'],
-             remaining_density=results['remainingdensity'],
-             mean_radii=mean_radii,
-             sd_radii=sd_radii,
-             mean_degree=mean_degree,
-             sd_degree=sd_degree,
-             mean_orbit_multiplicity=mean_orbit_mult,
-             sd_orbit_multiplicity=sd_orbit_mult,
-             max_orbit_multiplicity=max_orbit_mult
+             mean_radii=float(mean_radii),
+             sd_radii=float(sd_radii),
+             mean_degree=float(mean_degree),
+             sd_degree=float(sd_degree),
+             mean_orbit_multiplicity=float(mean_orbit_mult),
+             sd_orbit_multiplicity=float(sd_orbit_mult),
+             max_orbit_multiplicity=int(max_orbit_mult)
              )
-    #log.debug("groupstats: %s", r)
     return r
 
 
+_symmetry_cache = None
+
+def set_symmetry_cache(cache):
+    """
+    Replaces the cache of trait forest statistics used when sampling tree-structured models, for example
+    with a SymmetryStatisticsCache backed by a database file shared between processes.
+    """
+    global _symmetry_cache
+    _symmetry_cache = cache
+
+
+def get_symmetry_cache():
+    """
+    Returns the cache of trait forest statistics, creating an in-memory cache on first use.
+    """
+    global _symmetry_cache
+    if _symmetry_cache is None:
+        _symmetry_cache = stats.SymmetryStatisticsCache()
+    return _symmetry_cache
+
+
+def get_incremental_statistics(model):
+    """
+    Returns the IncrementalPopulationStatistics observer registered with a model, or None if the statistics
+    must be calculated by scanning the population.
+    """
+    for observer in model.observers:
+        if isinstance(observer, stats.IncrementalPopulationStatistics):
+            return observer
+    return None
+
+
 def get_traitset_map(pop):
     """
     Utility method which returns a map of culture ID's (hashes) and the trait set
      corresponding to a random individual of that culture (actually, the first one
-     we encounter).
+     we encounter).  Populations with interned cultures return each culture's shared trait set.
     """
+    culture_table = getattr(pop, 'culture_table', None)
+    if culture_table is not None:
+        return culture_table.get_traitset_map()
+
     traitsets = {}
-    graph = pop.agentgraph
-    for nodename in graph.nodes():
-        traits = graph.node[nodename]['traits']
-        culture = pop.get_traits_packed(traits)
+    for nodename in range(0, pop.num_agents):
+        traits = pop.agent_traits[nodename]
+        culture = pop.get_agent_culture(nodename)
         if culture not in traitsets:
             traitsets[culture] = traits
     return traitsets
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Parallel execution of parameter sweeps, shared by the sim-*-parallel.py scripts.
+
+"""
+
+import logging as log
+import itertools
+import math
+import os
+import signal
+import traceback
+import multiprocessing as mp
+import madsenlab.axelrod.data as data
+
+
+class SweepTimeout(Exception):
+    """
+    Raised within a sweep task which has run for longer than the executor's timeout.
+    """
+    pass
+
+
+class SweepExecutor(object):
+    """
+    Runs a task for every replicate of every combination of parameter values in a state space (a list of lists
+    of values, as given to itertools.product), on a pool of worker processes.
+
+    run_task(param_combination, replicate) is called in a worker process for each task, and should raise an
+    exception if the simulation fails.  It, and initializer, must be module level functions so that they can
+    be sent to the workers.  initializer(*initargs) is called once in each worker as it starts, to configure
+    the database, result sink and anything else which is shared by every task the worker runs.
+
+    Tasks are generated lazily and handed to the pool chunksize at a time; workers take the next chunk as
+    soon as they are idle, so long and short runs balance across the workers without any central scheduling.
+    A task which runs longer than timeout seconds is interrupted with SweepTimeout (through SIGALRM, so a
+    task stuck inside a single C call is only interrupted when it returns).  Failed tasks are retried, up to
+    retries more times, after the rest of the sweep has been run.  Tasks which fail on every attempt are
+    recorded in the sweep failures collection through the result sink, and returned by run().  The worker's
+    result sink is flushed after every task, whether it succeeds or fails.
+
+    If a SweepLedger is given, tasks it records as complete are skipped, and each task which succeeds is
+    marked complete in it, along with the value run_task returned (usually the simulation ID), so that a
+    sweep which is interrupted can be run again to complete only the missing tasks.
+    """
+
+    def __init__(self, state_space, replications, run_task, processes=4, timeout=None, retries=1, chunksize=1,
+                 initializer=None, initargs=(), experiment=None, script=None, ledger=None):
+        self.state_space = state_space
+        self.replications = replications
+        self.run_task = run_task
+        self.processes = processes
+        self.timeout = timeout
+        self.retries = retries
+        self.chunksize = chunksize
+        self.initializer = initializer
+        self.initargs = initargs
+        self.experiment = experiment
+        self.script = script
+        self.ledger = ledger
+        self.num_completed = 0
+        self.failures = []
+
+    def get_tasks(self):
+        """
+        Returns an iterator over a (param_combination, replicate) tuple for every task in the sweep, less those
+        the ledger records as complete.
+        """
+        tasks = self._get_all_tasks()
+        if self.ledger is not None:
+            tasks = self.ledger.get_missing(tasks)
+        return tasks
+
+    def _get_all_tasks(self):
+        for param_combination in itertools.product(*self.state_space):
+            for replicate in range(0, self.replications):
+                yield (param_combination, replicate)
+
+    def run(self):
+        """
+        Runs the sweep to completion, and returns a list of dicts describing the tasks which failed on every
+        attempt, with keys parameters, replicate, attempts, error and traceback.
+        """
+        pool = mp.Pool(processes=self.processes, initializer=_initialize_sweep_worker,
+                       initargs=(self.run_task, self.timeout, self.initializer, self.initargs))
+        try:
+            tasks = self.get_tasks()
+            attempt = 1
+            while True:
+                failed = []
+                work = ((param_combination, replicate, attempt) for (param_combination, replicate) in tasks)
+                for (param_combination, replicate, attempt_num, result, error) in pool.imap_unordered(_run_sweep_task, work, self.chunksize):
+                    if error is None:
+                        self.num_completed += 1
+                        if self.ledger is not None:
+                            self.ledger.mark_complete(param_combination, replicate, result)
+                        continue
+                    log.error("sweep task %s replicate %s failed on attempt %s: %s",
+                              param_combination, replicate, attempt_num, error[0])
+                    failed.append((param_combination, replicate, error))
+                if len(failed) == 0 or attempt > self.retries:
+                    break
+                log.info("retrying %s failed tasks", len(failed))
+                tasks = [(param_combination, replicate) for (param_combination, replicate, error) in failed]
+                attempt += 1
+            pool.close()
+        except KeyboardInterrupt:
+            log.info("sweep interrupted by ctrl-c")
+            pool.terminate()
+            raise
+        pool.join()
+
+        for (param_combination, replicate, error) in failed:
+            self._record_failure(param_combination, replicate, attempt, error)
+        data.get_result_sink().flush()
+        log.info("sweep complete: %s tasks completed, %s failed", self.num_completed, len(self.failures))
+        return self.failures
+
+    def _record_failure(self, param_combination, replicate, attempts, error):
+        failure = dict(parameters=list(param_combination), replicate=replicate, attempts=attempts,
+                       error=error[0], traceback=error[1])
+        self.failures.append(failure)
+        data.store_sweep_failure(self.experiment, self.script, [float(p) for p in param_combination], replicate,
+                                 attempts, error[0], error[1])
+
+
+## functions run in the worker processes
+
+_sweep_task = None
+_sweep_timeout = None
+
+
+def _initialize_sweep_worker(run_task, timeout, initializer, initargs):
+    global _sweep_task, _sweep_timeout
+    _sweep_task = run_task
+    _sweep_timeout = timeout
+    # ctrl-c is handled by the parent, which terminates the pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGALRM, _handle_sweep_alarm)
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def _handle_sweep_alarm(signum, frame):
+    raise SweepTimeout("task exceeded its time limit of %s seconds" % _sweep_timeout)
+
+
+def _run_sweep_task(task):
+    """
+    Runs one task, and returns its parameters, replicate and attempt number, the value run_task returned, and
+    None if it succeeded or a tuple of the error message and traceback if it raised an exception or timed out.
+    """
+    (param_combination, replicate, attempt) = task
+    result = None
+    error = None
+    try:
+        if _sweep_timeout is not None:
+            signal.alarm(int(math.ceil(_sweep_timeout)))
+        try:
+            result = _sweep_task(param_combination, replicate)
+        finally:
+            signal.alarm(0)
+    except Exception as e:
+        error = ("%s: %s" % (e.__class__.__name__, e), traceback.format_exc())
+        log.debug("worker %s: %s", os.getpid(), error[1])
+    try:
+        data.get_result_sink().flush()
+    except Exception as e:
+        if error is None:
+            error = ("%s: %s" % (e.__class__.__name__, e), traceback.format_exc())
+    return (param_combination, replicate, attempt, result, error)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Persistent record of the completed runs of a parameter sweep, so that a restarted sweep runs only the missing ones.
+
+"""
+
+import logging as log
+import sqlite3
+import time
+
+
+def get_parameter_key(param_combination):
+    """
+    Returns the string under which a parameter combination is recorded.  Values are compared as floats, to the
+    12 significant digits str() writes, so the combination is the same whether it comes from the configuration
+    file or from command line arguments written by str().
+    """
+    return ",".join("%.12g" % float(p) for p in param_combination)
+
+
+class SweepLedger(object):
+    """
+    SQLite table of the (parameter combination, replicate) pairs of an experiment which have run to completion,
+    with the ID of the simulation run which completed each.  A run should be marked complete only once its
+    final results have been flushed to the result sink, so that a run is never recorded without its results.
+
+    Several processes can share one ledger file, but each must open its own SweepLedger, since SQLite
+    connections cannot be carried across a fork.
+    """
+
+    def __init__(self, path, experiment):
+        self.experiment = experiment
+        self.db = sqlite3.connect(path, timeout=60)
+        self.db.execute("CREATE TABLE IF NOT EXISTS sweep_ledger (experiment TEXT, parameters TEXT, "
+                        "replicate INTEGER, simulation_run_id TEXT, completed REAL, "
+                        "PRIMARY KEY (experiment, parameters, replicate))")
+        self.db.commit()
+
+    def mark_complete(self, param_combination, replicate, sim_id=None):
+        self.db.execute("INSERT OR REPLACE INTO sweep_ledger (experiment, parameters, replicate, simulation_run_id, "
+                        "completed) VALUES (?, ?, ?, ?, ?)",
+                        (self.experiment, get_parameter_key(param_combination), replicate, sim_id, time.time()))
+        self.db.commit()
+
+    def is_complete(self, param_combination, replicate):
+        row = self.db.execute("SELECT 1 FROM sweep_ledger WHERE experiment = ? AND parameters = ? AND replicate = ?",
+                              (self.experiment, get_parameter_key(param_combination), replicate)).fetchone()
+        return row is not None
+
+    def get_completed(self):
+        """
+        Returns the set of (parameter key, replicate) pairs completed, for checking many runs at once.
+        """
+        rows = self.db.execute("SELECT parameters, replicate FROM sweep_ledger WHERE experiment = ?",
+                               (self.experiment,))
+        return set((str(parameters), replicate) for (parameters, replicate) in rows)
+
+    def count_completed(self, param_combination):
+        """
+        Returns the number of replicates of a parameter combination which have completed.
+        """
+        row = self.db.execute("SELECT COUNT(*) FROM sweep_ledger WHERE experiment = ? AND parameters = ?",
+                              (self.experiment, get_parameter_key(param_combination))).fetchone()
+        return row[0]
+
+    def get_missing(self, tasks):
+        """
+        Returns an iterator over the (param_combination, replicate) pairs from tasks which have not completed.
+        The ledger is read before returning, so the iterator can be consumed on another thread (as a
+        multiprocessing Pool does), where the ledger's connection cannot be used.
+        """
+        completed = self.get_completed()
+        log.info("%s runs already completed in the sweep ledger", len(completed))
+        return ((param_combination, replicate) for (param_combination, replicate) in tasks
+                if (get_parameter_key(param_combination), replicate) not in completed)
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    def __len__(self):
+        row = self.db.execute("SELECT COUNT(*) FROM sweep_ledger WHERE experiment = ?", (self.experiment,)).fetchone()
+        return row[0]
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Queue of sweep tasks in a SQLite file, from which workers on any number of hosts claim tasks under expiring leases.
+
+"""
+
+import logging as log
+import json
+import os
+import socket
+import sqlite3
+import time
+from sweep_ledger import get_parameter_key
+
+
+PENDING = 'pending'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+
+
+def get_worker_id():
+    return "%s:%s" % (socket.gethostname(), os.getpid())
+
+
+class SweepQueue(object):
+    """
+    Tasks of a parameter sweep -- one per (parameter combination, replicate), each with the command which runs
+    it -- kept in a SQLite database on a filesystem shared by the hosts running the sweep.  No server is needed:
+    workers claim tasks atomically through SQLite's locking, so however many workers run, on however many hosts,
+    each task is run by one worker at a time, and fast and slow tasks balance themselves across the workers.
+
+    A claimed task is leased to its worker for lease_time seconds, and the worker must renew the lease while
+    the task runs.  If the worker dies, its lease expires and the task is claimed again by another worker.  A
+    task which fails, or whose lease expires, is run again until it has been attempted max_attempts times.
+
+    SQLite's locking depends on the shared filesystem implementing POSIX locks correctly (which NFS does only
+    with its lock daemon running).  Each process must open its own SweepQueue, since SQLite connections cannot
+    be carried across a fork.
+    """
+
+    def __init__(self, path, experiment, lease_time=600, max_attempts=2):
+        self.experiment = experiment
+        self.lease_time = lease_time
+        self.max_attempts = max_attempts
+        # transactions are begun explicitly, so that a claim can lock the database before reading it
+        self.db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.db.execute("CREATE TABLE IF NOT EXISTS sweep_tasks (experiment TEXT, parameters TEXT, "
+                        "replicate INTEGER, param_values TEXT, command TEXT, status TEXT, worker TEXT, "
+                        "lease_expires REAL, attempts INTEGER, simulation_run_id TEXT, error TEXT, "
+                        "PRIMARY KEY (experiment, parameters, replicate))")
+        self.db.execute("CREATE INDEX IF NOT EXISTS sweep_tasks_status ON sweep_tasks (experiment, status)")
+
+    def add_tasks(self, tasks):
+        """
+        Adds (param_combination, replicate, command) tasks to the queue, skipping those already queued, and
+        returns the number added.
+        """
+        added = 0
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            for (param_combination, replicate, command) in tasks:
+                cursor = self.db.execute("INSERT OR IGNORE INTO sweep_tasks (experiment, parameters, replicate, "
+                                         "param_values, command, status, attempts) VALUES (?, ?, ?, ?, ?, ?, 0)",
+                                         (self.experiment, get_parameter_key(param_combination), replicate,
+                                          json.dumps(list(param_combination)), command, PENDING))
+                added += cursor.rowcount
+            self.db.execute("COMMIT")
+        except:
+            self.db.execute("ROLLBACK")
+            raise
+        log.info("queued %s tasks", added)
+        return added
+
+    def claim(self, worker=None):
+        """
+        Claims the next pending task, or a task whose lease has expired, for worker (by default, this host and
+        process).  Returns a SweepTask, or None if there are no tasks left to claim.
+        """
+        if worker is None:
+            worker = get_worker_id()
+        now = time.time()
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            # tasks abandoned by their workers on their last attempt are not run again
+            self.db.execute("UPDATE sweep_tasks SET status = ?, error = ? WHERE experiment = ? AND status = ? "
+                            "AND lease_expires < ? AND attempts >= ?",
+                            (FAILED, "lease expired", self.experiment, RUNNING, now, self.max_attempts))
+            row = self.db.execute("SELECT parameters, replicate, param_values, command, attempts FROM sweep_tasks "
+                                  "WHERE experiment = ? AND (status = ? OR (status = ? AND lease_expires < ?)) "
+                                  "ORDER BY attempts, rowid LIMIT 1",
+                                  (self.experiment, PENDING, RUNNING, now)).fetchone()
+            if row is None:
+                self.db.execute("COMMIT")
+                return None
+            (parameters, replicate, param_values, command, attempts) = row
+            self.db.execute("UPDATE sweep_tasks SET status = ?, worker = ?, lease_expires = ?, attempts = ? "
+                            "WHERE experiment = ? AND parameters = ? AND replicate = ?",
+                            (RUNNING, worker, now + self.lease_time, attempts + 1, self.experiment, parameters,
+                             replicate))
+            self.db.execute("COMMIT")
+        except:
+            self.db.execute("ROLLBACK")
+            raise
+        return SweepTask(self, str(parameters), replicate, json.loads(param_values), command, attempts + 1, worker)
+
+    def _update_task(self, task, assignments, values):
+        """
+        Updates a task, if it is still leased to the worker which claimed it, and returns whether it was.
+        """
+        cursor = self.db.execute("UPDATE sweep_tasks SET %s WHERE experiment = ? AND parameters = ? AND "
+                                 "replicate = ? AND status = ? AND worker = ?" % assignments,
+                                 tuple(values) + (self.experiment, task.parameters, task.replicate, RUNNING,
+                                                  task.worker))
+        return cursor.rowcount == 1
+
+    def get_counts(self):
+        """
+        Returns a dict of the number of tasks in each state.
+        """
+        counts = dict((status, 0) for status in (PENDING, RUNNING, COMPLETED, FAILED))
+        rows = self.db.execute("SELECT status, COUNT(*) FROM sweep_tasks WHERE experiment = ? GROUP BY status",
+                               (self.experiment,))
+        for (status, count) in rows:
+            counts[str(status)] = count
+        return counts
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+
+class SweepTask(object):
+    """
+    A task claimed from a SweepQueue.  The worker which claimed it renews its lease while it runs, and finally
+    marks it complete or failed.  Each of these returns False, and does nothing, if the lease has expired and
+    the task has been claimed by another worker.
+    """
+
+    def __init__(self, queue, parameters, replicate, param_combination, command, attempt, worker):
+        self.queue = queue
+        self.parameters = parameters
+        self.replicate = replicate
+        self.param_combination = param_combination
+        self.command = command
+        self.attempt = attempt
+        self.worker = worker
+
+    def renew(self):
+        return self.queue._update_task(self, "lease_expires = ?", [time.time() + self.queue.lease_time])
+
+    def complete(self, sim_id=None):
+        return self.queue._update_task(self, "status = ?, simulation_run_id = ?", [COMPLETED, sim_id])
+
+    def fail(self, error):
+        """
+        Returns the task to the queue to be run again, or marks it failed if it has used all its attempts.
+        """
+        status = PENDING
+        if self.attempt >= self.queue.max_attempts:
+            status = FAILED
+        return self.queue._update_task(self, "status = ?, error = ?, lease_expires = NULL", [status, error])
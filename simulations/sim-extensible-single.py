@@ -38,6 +38,12 @@ def setup():
     parser.add_argument("--periodic", help="Periodic boundary condition", choices=['1','0'], required=True)
     parser.add_argument("--diagram", help="Draw a diagram of the converged model", action="store_true")
     parser.add_argument("--drift_rate", help="Rate of drift")
+    parser.add_argument("--rejectionfree", help="Skip directly between steps which change the model (rejection-free sampling), instead of stepping every tick", action="store_true")
+    parser.add_argument("--sink", help="Where results are written: mongo (the default), or the sqlite or ndjson file given by --sinkpath", choices=data.SINK_TYPES, default="mongo")
+    parser.add_argument("--sinkpath", help="File for the sqlite or ndjson result sinks", required=False)
+    parser.add_argument("--sinkbatch", help="Number of result documents buffered and written together, defaults to 100", default="100")
+    parser.add_argument("--sinkthread", help="Write results on a background thread, so the simulation does not wait on the database", action="store_true")
+    parser.add_argument("--seed", help="Seed for the run's random number streams, defaults to one derived from the simulation ID", required=False)
 
 
     args = parser.parse_args()
@@ -53,8 +59,11 @@ def setup():
     data.set_experiment_name(args.experiment)
     data.set_database_hostname(args.dbhost)
     data.set_database_port(args.dbport)
-    config = data.getMingConfiguration(data.modules)
-    ming.configure(**config)
+    # Ming connects to MongoDB as soon as a document class is used, so it is only configured for the mongo sink
+    if args.sink == 'mongo':
+        config = data.getMingConfiguration(data.modules)
+        ming.configure(**config)
+    data.configure_result_sink(args.sink, args.sinkpath, int(args.sinkbatch), background=args.sinkthread)
 
     if args.drift_rate:
         simconfig.drift_rate = float(args.drift_rate)
@@ -65,6 +74,9 @@ def setup():
     simconfig.max_trait_value = int(args.maxtraitvalue)
 
     simconfig.sim_id = uuid.uuid4().urn
+    if args.seed is not None:
+        simconfig.random_seed = int(args.seed)
+    simconfig.seed_random_streams()
     if args.periodic == '1':
         simconfig.periodic = 1
     elif args.periodic == '0':
@@ -98,6 +110,17 @@ def main():
 
     counts = analysis.get_culture_counts_dbformat(model)
 
+    if args.rejectionfree:
+        # jump directly between steps which change the model; once no step can, the model has converged
+        scheduler = rules.RejectionFreeScheduler(ax)
+        while(1):
+            next_time = scheduler.step(timestep + 1)
+            if next_time is None:
+                log.info("Finalizing statistics at time: %s", model.get_time_last_interaction())
+                utils.sample_extensible_model(model, args, simconfig)
+                exit(0)
+            timestep = next_time
+
     while(1):
         timestep += 1
         if(timestep % 10000 == 0):
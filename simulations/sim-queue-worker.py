@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Runs simulations claimed from a sweep queue built by treestructured-parallel-builder.py --queue, until none are
+left.  Start as many workers as there are cores, on as many hosts as share the queue file.  Each run writes its
+simulation ID to the file given by --simidfile, which the worker records with the completed run in the queue.
+
+"""
+
+
+import logging as log
+import argparse
+import os
+import shlex
+import subprocess
+import tempfile
+import time
+import madsenlab.axelrod.utils as utils
+
+
+
+def setup():
+    global args
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--experiment", help="provide name for experiment", required=True)
+    parser.add_argument("--debug", help="turn on debugging output")
+    parser.add_argument("--queue", help="Database file, on a filesystem shared by every host running the sweep, from which runs are claimed", required=True)
+    parser.add_argument("--leasetime", help="Seconds a claimed run is leased to this worker without being renewed, after which another worker may claim it, defaults to 600", default="600")
+    parser.add_argument("--attempts", help="Number of times a run is attempted before it is marked failed, defaults to 2", default="2")
+    parser.add_argument("--wait", help="When no runs are left to claim, wait for those running on other workers, in case their leases expire", action="store_true")
+
+    args = parser.parse_args()
+
+    if args.debug == '1':
+        log.basicConfig(level=log.DEBUG, format='%(asctime)s %(levelname)s: %(message)s')
+    else:
+        log.basicConfig(level=log.INFO, format='%(asctime)s %(levelname)s: %(message)s')
+
+    log.debug("experiment name: %s", args.experiment)
+
+
+def main():
+    lease_time = float(args.leasetime)
+    queue = utils.SweepQueue(args.queue, args.experiment, lease_time=lease_time, max_attempts=int(args.attempts))
+    worker = utils.get_worker_id()
+    completed_count = 0
+
+    while True:
+        task = queue.claim(worker)
+        if task is None:
+            counts = queue.get_counts()
+            if args.wait and counts['running'] > 0:
+                time.sleep(lease_time / 4)
+                continue
+            log.info("worker %s: no runs left to claim, %s completed here; queue: %s", worker, completed_count, counts)
+            break
+
+        log.info("worker %s: starting %s replicate %s, attempt %s", worker, task.parameters, task.replicate,
+                 task.attempt)
+        (error, sim_id) = run_task(task, lease_time)
+        if error is None:
+            task.complete(sim_id)
+            completed_count += 1
+        else:
+            log.error("worker %s: %s replicate %s failed: %s", worker, task.parameters, task.replicate, error)
+            task.fail(error)
+
+    queue.close()
+
+
+def run_task(task, lease_time):
+    """
+    Runs the task's command, renewing its lease while the command runs, and returns a tuple of None and the
+    simulation ID the command reported if it succeeds, or a description of the failure and None.
+    """
+    (fd, simid_file) = tempfile.mkstemp(suffix=".simid")
+    os.close(fd)
+    try:
+        process = subprocess.Popen(shlex.split(task.command) + ["--simidfile", simid_file])
+        next_renewal = time.time() + lease_time / 4
+        while process.poll() is None:
+            time.sleep(1)
+            if time.time() >= next_renewal:
+                if task.renew() == False:
+                    # the lease expired before it could be renewed, and another worker has the run now
+                    process.terminate()
+                    process.wait()
+                    return ("lease lost", None)
+                next_renewal = time.time() + lease_time / 4
+        if process.returncode != 0:
+            return ("exited with status %s" % process.returncode, None)
+        return (None, read_sim_id(simid_file))
+    finally:
+        os.remove(simid_file)
+
+
+def read_sim_id(simid_file):
+    with open(simid_file, 'r') as f:
+        sim_id = f.read().strip()
+    if sim_id == '':
+        log.error("run completed without reporting its simulation ID")
+        return None
+    return sim_id
+
+
+if __name__ == "__main__":
+    setup()
+    main()
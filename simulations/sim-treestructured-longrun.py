@@ -14,6 +14,7 @@ convergence since it should be temporary with mutation/noise.
 import logging as log
 import ming
 import argparse
+import os
 import madsenlab.axelrod.utils as utils
 import madsenlab.axelrod.analysis as stats
 import madsenlab.axelrod.data as data
@@ -46,9 +47,18 @@ def setup():
     parser.add_argument("--branchingfactor", help="Value or mean for tree branching factor", required=True)
     parser.add_argument("--depthfactor", help="Value or mean for tree depth factor", required=True)
     parser.add_argument("--savetraitgraphs", help="Saves a snapshot of trait tree graphs", action="store_true")
+    parser.add_argument("--symmetrycache", help="Database file in which to share trait forest symmetry statistics between runs", required=False)
     parser.add_argument("--samplinginterval", help="Interval between samples, once sampling begins, defaults to 1M steps", default="1000000")
     parser.add_argument("--samplingstarttime", help="Time at which sampling begins, defaults to 1M steps", default="6000000")
     parser.add_argument("--simulationendtime", help="Time at which simulation and sampling end, defaults to 10000000 steps", default="10000000")
+    parser.add_argument("--sink", help="Where results are written: mongo (the default), or the sqlite or ndjson file given by --sinkpath", choices=data.SINK_TYPES, default="mongo")
+    parser.add_argument("--sinkpath", help="File for the sqlite or ndjson result sinks", required=False)
+    parser.add_argument("--sinkbatch", help="Number of result documents buffered and written together, defaults to 100", default="100")
+    parser.add_argument("--sinkthread", help="Write results on a background thread, so the simulation does not wait on the database", action="store_true")
+    parser.add_argument("--seed", help="Seed for the run's random number streams, defaults to one derived from the simulation ID", required=False)
+    parser.add_argument("--checkpointfile", help="File to which the state of the simulation is periodically saved", required=False)
+    parser.add_argument("--checkpointinterval", help="Interval between checkpoints, defaults to 5M steps", default="5000000")
+    parser.add_argument("--resume", help="Resume the simulation from --checkpointfile, if it exists", action="store_true")
 
     args = parser.parse_args()
 
@@ -63,8 +73,11 @@ def setup():
     data.set_experiment_name(args.experiment)
     data.set_database_hostname(args.dbhost)
     data.set_database_port(args.dbport)
-    config = data.getMingConfiguration(data.modules)
-    ming.configure(**config)
+    # Ming connects to MongoDB as soon as a document class is used, so it is only configured for the mongo sink
+    if args.sink == 'mongo':
+        config = data.getMingConfiguration(data.modules)
+        ming.configure(**config)
+    data.configure_result_sink(args.sink, args.sinkpath, int(args.sinkbatch), background=args.sinkthread)
 
     if args.swrewiring:
         simconfig.ws_rewiring = float(args.swrewiring)
@@ -81,7 +94,13 @@ def setup():
     simconfig.script = __file__
     simconfig.save_graphs = args.savetraitgraphs
 
+    if args.symmetrycache:
+        utils.set_symmetry_cache(stats.SymmetryStatisticsCache(path=args.symmetrycache))
+
     simconfig.sim_id = uuid.uuid4().urn
+    if args.seed is not None:
+        simconfig.random_seed = int(args.seed)
+    simconfig.seed_random_streams()
     if args.periodic == '1':
         simconfig.periodic = 1
     else:
@@ -110,11 +129,18 @@ def main():
     #counts = analysis.get_culture_counts(model)
 
 
-    log.info("Starting %s", simconfig.sim_id)
-
     ax = rule_constructor(model)
 
     timestep = 0
+    if args.resume and args.checkpointfile is not None and os.path.exists(args.checkpointfile):
+        timestep = utils.load_checkpoint(args.checkpointfile, model, ax)
+    checkpoint_interval = int(args.checkpointinterval)
+    next_checkpoint = (timestep // checkpoint_interval + 1) * checkpoint_interval
+
+    log.info("Starting %s at time %s", simconfig.sim_id, timestep)
+
+    # keeps the trait and culture statistics current as the rules change agents, for periodic sampling
+    stats.IncrementalPopulationStatistics(model)
 
 
     while(1):
@@ -126,6 +152,11 @@ def main():
 
         if timestep > int(args.samplingstarttime) and timestep % int(args.samplinginterval)  == 0:
             utils.sample_treestructured_model(model, args, simconfig, timestep, finalized=0)
+        if args.checkpointfile is not None and timestep >= next_checkpoint:
+            # samples taken before the checkpoint must not be lost, or repeated, on resuming
+            data.get_result_sink().flush()
+            utils.save_checkpoint(args.checkpointfile, model, ax, timestep)
+            next_checkpoint = (timestep // checkpoint_interval + 1) * checkpoint_interval
         # if model.get_time_last_interaction() != timestep:
         #     live = utils.check_liveness(ax, model, args, simconfig, timestep)
         #     if live == False:
@@ -140,6 +171,8 @@ def main():
             elapsed = endtime - start
             log.info("Completed: %s  Elapsed: %s", simconfig.sim_id, elapsed)
             data.store_simulation_timing(simconfig.sim_id,simconfig.INTERACTION_RULE_CLASS,simconfig.POPULATION_STRUCTURE_CLASS,simconfig.script,args.experiment,elapsed,timestep)
+            if args.checkpointfile is not None and os.path.exists(args.checkpointfile):
+                os.remove(args.checkpointfile)
             exit(0)
 
 # end main
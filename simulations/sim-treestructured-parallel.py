@@ -12,13 +12,9 @@ Description here
 import logging as log
 import ming
 import argparse
-import time
-import itertools
-import copy
 import os
 import uuid
 import pprint as pp
-import multiprocessing as mp
 import madsenlab.axelrod.utils as utils
 import madsenlab.axelrod.data as data
 import madsenlab.axelrod.rules as rules
@@ -37,6 +33,19 @@ def setup():
     parser.add_argument("--configuration", help="Configuration file for experiment", required=True)
     parser.add_argument("--parallelism", help="Number of concurrent processes to run", default="4")
     parser.add_argument("--diagram", help="Draw a diagram when complete", default=False)
+    parser.add_argument("--symmetrycache", help="Database file in which to share trait forest symmetry statistics between workers", required=False)
+    parser.add_argument("--sink", help="Where results are written: mongo (the default), or the sqlite or ndjson file given by --sinkpath", choices=data.SINK_TYPES, default="mongo")
+    parser.add_argument("--sinkpath", help="File for the sqlite or ndjson result sinks", required=False)
+    parser.add_argument("--sinkbatch", help="Number of result documents buffered and written together, defaults to 100", default="100")
+    parser.add_argument("--sinkthread", help="Write results on a background thread, so the simulation does not wait on the database", action="store_true")
+    parser.add_argument("--seed", help="Base seed from which each run's seed is derived, so the whole sweep can be reproduced; by default each run's seed is derived from its simulation ID", required=False)
+    parser.add_argument("--timeout", help="Wall clock limit in seconds for each simulation run, after which the run fails (default: no limit)", required=False)
+    parser.add_argument("--retries", help="Number of times a failed run is retried, defaults to 1", default="1")
+    parser.add_argument("--chunksize", help="Number of runs handed to a worker at a time, defaults to 1", default="1")
+    parser.add_argument("--ledger", help="Database file recording the completed runs of the sweep, so that running the sweep again runs only the missing ones", required=False)
+    parser.add_argument("--checkpointdir", help="Directory in which the state of each simulation is periodically saved", required=False)
+    parser.add_argument("--checkpointinterval", help="Interval between checkpoints, defaults to 5M steps", default="5000000")
+    parser.add_argument("--resume", help="Resume simulations from the checkpoints in --checkpointdir, skipping those already completed", action="store_true")
 
     args = parser.parse_args()
 
@@ -51,55 +60,42 @@ def setup():
     data.set_experiment_name(args.experiment)
     data.set_database_hostname(args.dbhost)
     data.set_database_port(args.dbport)
-    config = data.getMingConfiguration(data.modules)
-    ming.configure(**config)
+    # Ming connects to MongoDB as soon as a document class is used, so it is only configured for the mongo sink
+    if args.sink == 'mongo':
+        config = data.getMingConfiguration(data.modules)
+        ming.configure(**config)
 
 
 
 
 def main():
-    global work_queue, process_list
-    process_list = []
-
-    work_queue = mp.JoinableQueue()
-
     structure_class_name = simconfig.POPULATION_STRUCTURE_CLASS
     log.info("Configuring TreeStructured Axelrod model with structure class: %s", structure_class_name)
 
+    # failed runs are recorded through the parent's sink
+    data.configure_result_sink(args.sink, args.sinkpath, int(args.sinkbatch))
+
+    timeout = None
+    if args.timeout is not None:
+        timeout = float(args.timeout)
 
+    ledger = None
+    if args.ledger is not None:
+        ledger = utils.SweepLedger(args.ledger, args.experiment)
 
-    create_queueing_process(work_queue, queue_simulations)
-    time.sleep(1)
-    create_processes(work_queue, run_simulation_worker)
+    executor = utils.SweepExecutor(get_state_space(simconfig), simconfig.REPLICATIONS_PER_PARAM_SET, run_simulation,
+                                   processes=int(args.parallelism), timeout=timeout, retries=int(args.retries),
+                                   chunksize=int(args.chunksize), initializer=initialize_worker, initargs=(args,),
+                                   experiment=args.experiment, script=__file__, ledger=ledger)
     try:
-        work_queue.join()
+        executor.run()
     except KeyboardInterrupt:
-        log.info("simulations interrupted by ctrl-c")
-        for proc in process_list:
-            proc.terminate()
         exit(1)
 
 # End of main
 
 
-def create_queueing_process(queue, worker):
-    process = mp.Process(target=worker, args=(queue, args))
-    process.daemon = True
-    process_list.append(process)
-    process.start()
-
-
-def create_processes(queue, worker):
-    for i in range(0, int(args.parallelism)):
-        process = mp.Process(target=worker, args=(queue, args))
-        process.daemon = True
-        process_list.append(process)
-        process.start()
-
-
-def queue_simulations(queue, args):
-    basic_config = utils.TreeStructuredConfiguration(args.configuration)
-
+def get_state_space(basic_config):
     if basic_config.INTERACTION_RULE_CLASS == 'madsenlab.axelrod.rules.MultipleTreePrerequisitesLearningCopyingRule':
         state_space = [
             basic_config.POPULATION_SIZES_STUDIED,
@@ -115,101 +111,123 @@ def queue_simulations(queue, args):
         log.error("This parallel sim runner not compatible with rule class: %s", basic_config.INTERACTION_RULE_CLASS)
         exit(1)
 
-
     if basic_config.NETWORK_FACTORY_CLASS == 'madsenlab.axelrod.population.WattsStrogatzSmallWorldFactory':
         state_space.append(basic_config.WS_REWIRING_FACTOR)
 
-    for param_combination in itertools.product(*state_space):
-        # for each parameter combination, make a copy of the base configuration
-        # set the specific param combo values, and queue the object
-        for repl in range(0, basic_config.REPLICATIONS_PER_PARAM_SET):
-            #log.debug("param combination: %s", param_combination)
-            sc = copy.deepcopy(basic_config)
-            sc.popsize = int(param_combination[0])
-            sc.learning_rate = float(param_combination[1])
-            sc.maxtraits = int(param_combination[2])
-            sc.num_trees = int(param_combination[3])
-            sc.branching_factor = float(param_combination[4])
-            sc.depth_factor = float(param_combination[5])
-            sc.loss_rate = float(param_combination[6])
-            sc.innov_rate = float(param_combination[7])
-
-            if len(param_combination) == 9:
-                sc.ws_rewiring = float(param_combination[8])
-
-            sc.maxtime = sc.SIMULATION_CUTOFF_TIME
-            sc.sim_id = uuid.uuid4().urn
-            sc.script = __file__
-            sc.periodic = 0
-
-            queue.put(sc)
-
-
-    log.info("All simulation configurations queued")
-
-
-
-def run_simulation_worker(queue, args):
-
-    # pull a simconfig object off the queue
-
-    completed_count = 0
-    while True:
-        try:
-            simconfig = queue.get()
-
-            log.info("worker %s: starting pop: %s LR: %s init_trait: %s IR: %s LR: %s NT: %s BF: %s DF: %s WSR: %s",
-                     os.getpid(), simconfig.popsize, simconfig.learning_rate, simconfig.maxtraits,
-                     simconfig.innov_rate, simconfig.loss_rate, simconfig.num_trees,simconfig.branching_factor,
-                     simconfig.depth_factor, simconfig.ws_rewiring)
-            gf_constructor = utils.load_class(simconfig.NETWORK_FACTORY_CLASS)
-            model_constructor = utils.load_class(simconfig.POPULATION_STRUCTURE_CLASS)
-            rule_constructor = utils.load_class(simconfig.INTERACTION_RULE_CLASS)
-            trait_factory_constructor = utils.load_class(simconfig.TRAIT_FACTORY_CLASS)
-            trait_factory = trait_factory_constructor(simconfig)
-            graph_factory = gf_constructor(simconfig)
-            model = model_constructor(simconfig, graph_factory, trait_factory)
-            model.initialize_population()
-
-            ax = rule_constructor(model)
-
-            timestep = 0
-            last_interaction = 0
-            first_snapshot_time = simconfig.maxtime / 2
-
-            try:
-                while(1):
-                    timestep += 1
-                    ax.step(timestep)
-                    if timestep % 250000 == 0:
-                        log.debug("worker %s: time: %s active links: %s", os.getpid(), timestep, ax.get_fraction_links_active())
-                    if timestep > first_snapshot_time and timestep % 250000  == 0:
-                        utils.sample_treestructured_model(model, args, simconfig, timestep, finalized=0)
-                    if model.get_time_last_interaction() != timestep:
-                        live = utils.check_liveness(ax, model, args, simconfig, timestep)
-                        if live == False:
-                            utils.sample_treestructured_model(model, args, simconfig, timestep, finalized=1)
-                            break
-                            # if the simulation is cycling endlessly, and after the cutoff time, sample and end
-                    if timestep > simconfig.maxtime:
-                        log.info("Simulation has not converged within %s, taking final sample and terminating", simconfig.maxtime)
-                        utils.sample_treestructured_model(model, args, simconfig,  timestep, finalized=0)
-                        break
-            except:
-                log.error("FATAL EXCEPTION - starting pop: %s LR: %s init_trait: %s IR: %s LR: %s NT: %s BF: %s DF: %s",
-                     os.getpid(), simconfig.popsize, simconfig.learning_rate, simconfig.maxtraits,
-                     simconfig.innov_rate, simconfig.loss_rate, simconfig.num_trees,simconfig.branching_factor,
-                     simconfig.depth_factor)
-
-            # clean up before moving to next queue item
-            simconfig = None
-            model = None
-            completed_count += 1
-            if(completed_count % 100 == 0):
-                log.info("trait worker %s: completed %s samples", os.getpid(), completed_count )
-
-        finally:
-            queue.task_done()
+    return state_space
+
+
+def initialize_worker(args):
+    global worker_config
+
+    # each worker writes results through its own sink, flushed as each simulation finishes
+    data.configure_result_sink(args.sink, args.sinkpath, int(args.sinkbatch), per_process=True,
+                               background=args.sinkthread)
+
+    # each worker opens its own connection to the shared symmetry cache
+    if args.symmetrycache:
+        utils.set_symmetry_cache(stats.SymmetryStatisticsCache(path=args.symmetrycache))
+
+    # each worker reuses one configuration object, setting the parameters of each run on it
+    worker_config = utils.TreeStructuredConfiguration(args.configuration)
+
+
+def run_simulation(param_combination, repl):
+    simconfig = worker_config
+    simconfig.popsize = int(param_combination[0])
+    simconfig.learning_rate = float(param_combination[1])
+    simconfig.maxtraits = int(param_combination[2])
+    simconfig.num_trees = int(param_combination[3])
+    simconfig.branching_factor = float(param_combination[4])
+    simconfig.depth_factor = float(param_combination[5])
+    simconfig.loss_rate = float(param_combination[6])
+    simconfig.innov_rate = float(param_combination[7])
+
+    if len(param_combination) == 9:
+        simconfig.ws_rewiring = float(param_combination[8])
+
+    simconfig.maxtime = simconfig.SIMULATION_CUTOFF_TIME
+    simconfig.sim_id = uuid.uuid4().urn
+    simconfig.random_seed = None
+    if args.seed is not None:
+        simconfig.random_seed = utils.derive_seed(args.seed, repl, *param_combination)
+    simconfig.script = __file__
+    simconfig.periodic = 0
+    # names the simulation's checkpoint, which must be the same each time the sweep is run
+    simconfig.checkpoint_name = "-".join(str(p) for p in param_combination) + "-%s" % repl
+
+    checkpoint_path = None
+    if args.checkpointdir is not None:
+        checkpoint_path = get_checkpoint_path(simconfig)
+        if args.resume and os.path.exists(checkpoint_path + ".done"):
+            return
+
+    simconfig.seed_random_streams()
+
+    log.info("worker %s: starting pop: %s LR: %s init_trait: %s IR: %s LR: %s NT: %s BF: %s DF: %s WSR: %s",
+             os.getpid(), simconfig.popsize, simconfig.learning_rate, simconfig.maxtraits,
+             simconfig.innov_rate, simconfig.loss_rate, simconfig.num_trees,simconfig.branching_factor,
+             simconfig.depth_factor, simconfig.ws_rewiring)
+    gf_constructor = utils.load_class(simconfig.NETWORK_FACTORY_CLASS)
+    model_constructor = utils.load_class(simconfig.POPULATION_STRUCTURE_CLASS)
+    rule_constructor = utils.load_class(simconfig.INTERACTION_RULE_CLASS)
+    trait_factory_constructor = utils.load_class(simconfig.TRAIT_FACTORY_CLASS)
+    trait_factory = trait_factory_constructor(simconfig)
+    graph_factory = gf_constructor(simconfig)
+    model = model_constructor(simconfig, graph_factory, trait_factory)
+    model.initialize_population()
+
+    ax = rule_constructor(model)
+
+    timestep = 0
+    first_snapshot_time = simconfig.maxtime / 2
+
+    if checkpoint_path is not None and args.resume and os.path.exists(checkpoint_path):
+        timestep = utils.load_checkpoint(checkpoint_path, model, ax)
+    checkpoint_interval = int(args.checkpointinterval)
+    next_checkpoint = (timestep // checkpoint_interval + 1) * checkpoint_interval
+
+    while(1):
+        timestep += 1
+        ax.step(timestep)
+        if timestep % 250000 == 0:
+            log.debug("worker %s: time: %s active links: %s", os.getpid(), timestep, ax.get_fraction_links_active())
+        if timestep > first_snapshot_time and timestep % 250000  == 0:
+            utils.sample_treestructured_model(model, args, simconfig, timestep, finalized=0)
+        if checkpoint_path is not None and timestep >= next_checkpoint:
+            data.get_result_sink().flush()
+            utils.save_checkpoint(checkpoint_path, model, ax, timestep)
+            next_checkpoint = (timestep // checkpoint_interval + 1) * checkpoint_interval
+        if model.get_time_last_interaction() != timestep:
+            live = utils.check_liveness(ax, model, args, simconfig, timestep)
+            if live == False:
+                utils.sample_treestructured_model(model, args, simconfig, timestep, finalized=1)
+                complete_checkpoint(checkpoint_path)
+                break
+        # if the simulation is cycling endlessly, and after the cutoff time, sample and end
+        if timestep > simconfig.maxtime:
+            log.info("Simulation has not converged within %s, taking final sample and terminating", simconfig.maxtime)
+            utils.sample_treestructured_model(model, args, simconfig,  timestep, finalized=0)
+            complete_checkpoint(checkpoint_path)
+            break
+
+    return simconfig.sim_id
+
+
+def get_checkpoint_path(simconfig):
+    return os.path.join(args.checkpointdir, simconfig.checkpoint_name + ".npz")
+
+
+def complete_checkpoint(checkpoint_path):
+    """
+    Replaces the checkpoint of a completed simulation with a marker, so that resuming the sweep skips it.
+    """
+    if checkpoint_path is None:
+        return
+    data.get_result_sink().flush()
+    open(checkpoint_path + ".done", 'w').close()
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
 
 
 if __name__ == "__main__":
@@ -12,6 +12,7 @@ Description here
 import logging as log
 import ming
 import argparse
+import os
 import madsenlab.axelrod.utils as utils
 import madsenlab.axelrod.analysis as stats
 import madsenlab.axelrod.data as data
@@ -44,8 +45,21 @@ def setup():
     parser.add_argument("--branchingfactor", help="Value or mean for tree branching factor", required=True)
     parser.add_argument("--depthfactor", help="Value or mean for tree depth factor", required=True)
     parser.add_argument("--savetraitgraphs", help="Saves a snapshot of trait tree graphs", action="store_true")
+    parser.add_argument("--symmetrycache", help="Database file in which to share trait forest symmetry statistics between runs", required=False)
     parser.add_argument("--samplinginterval", help="Interval between samples, once sampling begins, defaults to 250K steps", default="250000")
     parser.add_argument("--samplingstarttime", help="Time at which sampling begins, defaults to 1000000 steps", default="1000000")
+    parser.add_argument("--rejectionfree", help="Skip directly between steps which change the model (rejection-free sampling), instead of stepping every tick", action="store_true")
+    parser.add_argument("--sink", help="Where results are written: mongo (the default), or the sqlite or ndjson file given by --sinkpath", choices=data.SINK_TYPES, default="mongo")
+    parser.add_argument("--sinkpath", help="File for the sqlite or ndjson result sinks", required=False)
+    parser.add_argument("--sinkbatch", help="Number of result documents buffered and written together, defaults to 100", default="100")
+    parser.add_argument("--sinkthread", help="Write results on a background thread, so the simulation does not wait on the database", action="store_true")
+    parser.add_argument("--seed", help="Seed for the run's random number streams, defaults to one derived from the simulation ID", required=False)
+    parser.add_argument("--checkpointfile", help="File to which the state of the simulation is periodically saved", required=False)
+    parser.add_argument("--checkpointinterval", help="Interval between checkpoints, defaults to 5M steps", default="5000000")
+    parser.add_argument("--resume", help="Resume the simulation from --checkpointfile, if it exists", action="store_true")
+    parser.add_argument("--ledger", help="Database file in which the run is recorded as complete, for sweeps built by treestructured-parallel-builder.py", required=False)
+    parser.add_argument("--replicate", help="Replicate number of the run within its parameter combination, recorded in --ledger", default="0")
+    parser.add_argument("--simidfile", help="File to which the simulation ID is written once the run completes, for sim-queue-worker.py", required=False)
 
 
     args = parser.parse_args()
@@ -61,8 +75,11 @@ def setup():
     data.set_experiment_name(args.experiment)
     data.set_database_hostname(args.dbhost)
     data.set_database_port(args.dbport)
-    config = data.getMingConfiguration(data.modules)
-    ming.configure(**config)
+    # Ming connects to MongoDB as soon as a document class is used, so it is only configured for the mongo sink
+    if args.sink == 'mongo':
+        config = data.getMingConfiguration(data.modules)
+        ming.configure(**config)
+    data.configure_result_sink(args.sink, args.sinkpath, int(args.sinkbatch), background=args.sinkthread)
 
     if args.swrewiring:
         simconfig.ws_rewiring = float(args.swrewiring)
@@ -79,7 +96,13 @@ def setup():
     simconfig.script = __file__
     simconfig.save_graphs = args.savetraitgraphs
 
+    if args.symmetrycache:
+        utils.set_symmetry_cache(stats.SymmetryStatisticsCache(path=args.symmetrycache))
+
     simconfig.sim_id = uuid.uuid4().urn
+    if args.seed is not None:
+        simconfig.random_seed = int(args.seed)
+    simconfig.seed_random_streams()
     if args.periodic == '1':
         simconfig.periodic = 1
     else:
@@ -115,34 +138,87 @@ def main():
     ax = rule_constructor(model)
 
     timestep = 0
+    if args.resume and args.checkpointfile is not None and os.path.exists(args.checkpointfile):
+        timestep = utils.load_checkpoint(args.checkpointfile, model, ax)
+    checkpoint_interval = int(args.checkpointinterval)
+    next_checkpoint = (timestep // checkpoint_interval + 1) * checkpoint_interval
+
+    # keeps the trait and culture statistics current as the rules change agents, for periodic sampling
+    stats.IncrementalPopulationStatistics(model)
     last_interaction = 0
     first_snapshot_time = simconfig.maxtime / 2
 
 
 
 
+    if args.rejectionfree:
+        scheduler = rules.RejectionFreeScheduler(ax)
+        sampling_interval = int(args.samplinginterval)
+        num_links = model.num_edges
+
     while(1):
-        timestep += 1
-        ax.step(timestep)
+        if args.rejectionfree:
+            # jump to the next step which changes the model, but stop at the next sampling time, the cutoff
+            # time, or the time at which a model without active links would be found to have converged
+            limit = min((timestep // sampling_interval + 1) * sampling_interval, simconfig.maxtime + 1)
+            if ax.get_fraction_links_active() == 0.0:
+                limit = min(limit, max(timestep + 1, model.get_time_last_interaction() + 5 * num_links + 1))
+            next_time = scheduler.step(timestep + 1, limit)
+            if next_time is None:
+                timestep = limit
+            else:
+                timestep = next_time
+        else:
+            timestep += 1
+            ax.step(timestep)
         if (timestep % 100000) == 0:
             log.debug("time: %s  active: %s  copies: %s  innov: %s losses: %s", timestep, ax.get_fraction_links_active(), model.get_interactions(), model.get_innovations(), model.get_losses())
         if timestep > int(args.samplingstarttime) and timestep % int(args.samplinginterval)  == 0:
             utils.sample_treestructured_model(model, args, simconfig, timestep, finalized=0)
+        if args.checkpointfile is not None and timestep >= next_checkpoint:
+            # samples taken before the checkpoint must not be lost, or repeated, on resuming
+            data.get_result_sink().flush()
+            utils.save_checkpoint(args.checkpointfile, model, ax, timestep)
+            next_checkpoint = (timestep // checkpoint_interval + 1) * checkpoint_interval
         if model.get_time_last_interaction() != timestep:
             live = utils.check_liveness(ax, model, args, simconfig, timestep)
             if live == False:
                 utils.sample_treestructured_model(model, args, simconfig, timestep, finalized=1)
+                complete_run()
                 exit(0)
 
         # if the simulation is cycling endlessly, and after the cutoff time, sample and end
         if timestep > simconfig.maxtime:
             log.info("Simulation has not converged within %s, taking final sample and terminating", simconfig.maxtime)
             utils.sample_treestructured_model(model, args, simconfig, timestep, finalized=0)
+            complete_run()
             exit(0)
 
 # end main
 
 
+def complete_run():
+    """
+    Records the completed run in the sweep ledger and the simulation ID file, once its results are written,
+    and removes its checkpoint.
+    """
+    data.get_result_sink().flush()
+    if args.ledger is not None:
+        param_combination = [simconfig.popsize, simconfig.learning_rate, simconfig.maxtraits, simconfig.num_trees,
+                             simconfig.branching_factor, simconfig.depth_factor, simconfig.loss_rate,
+                             simconfig.innov_rate]
+        if args.swrewiring:
+            param_combination.append(simconfig.ws_rewiring)
+        ledger = utils.SweepLedger(args.ledger, args.experiment)
+        ledger.mark_complete(param_combination, int(args.replicate), simconfig.sim_id)
+        ledger.close()
+    if args.simidfile is not None:
+        with open(args.simidfile, 'w') as f:
+            f.write(simconfig.sim_id)
+    if args.checkpointfile is not None and os.path.exists(args.checkpointfile):
+        os.remove(args.checkpointfile)
+
+
 
 
 if __name__ == "__main__":
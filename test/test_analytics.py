@@ -14,7 +14,9 @@ import madsenlab.axelrod.rules as rules
 import madsenlab.axelrod.population as pop
 import madsenlab.axelrod.traits as traits
 import madsenlab.axelrod.analysis as analysis
+import madsenlab.axelrod.analysis.order_parameters as order_parameters
 import logging as log
+import numpy as np
 import pprint as pp
 import tempfile
 
@@ -55,6 +57,23 @@ class AxelrodAnalytics(unittest.TestCase):
         klemm_val = analysis.klemm_normalized_L_axelrod(self.pop, self.config)
         log.info("klemm axelrod value: %s", klemm_val)
 
+    def test_klemm_matches_edge_loop(self):
+        F = self.config.num_features
+        z = self.pop.get_coordination_number()
+        sums = 0
+        for (a,b) in self.pop.agentgraph.edges_iter():
+            sums += F - analysis.calc_overlap_axelrod(self.pop.get_agent_by_id(a)[1], self.pop.get_agent_by_id(b)[1])
+        expected = 2.0 / (z * self.config.popsize * F) * sums
+
+        self.assertAlmostEqual(expected, analysis.klemm_normalized_L_axelrod(self.pop, self.config))
+
+        array_pop = pop.FixedTraitArrayPopulation(self.config, pop.SquareLatticeFactory(self.config),
+                                                  traits.AxelrodTraitFactory(self.config))
+        array_pop.initialize_population()
+        for nodename in self.pop.agentgraph.nodes():
+            array_pop.set_agent_traits(nodename, self.pop.get_agent_by_id(nodename)[1])
+        self.assertAlmostEqual(expected, analysis.klemm_normalized_L_axelrod(array_pop, self.config))
+
 
 class ExtensibleAnalytics(unittest.TestCase):
 
@@ -96,6 +115,47 @@ class ExtensibleAnalytics(unittest.TestCase):
         klemm_val = analysis.klemm_normalized_L_extensible(self.pop, self.config)
         log.info("klemm extensible value: %s", klemm_val)
 
+    def test_klemm_bitset_matches_sets(self):
+        bitset_pop = pop.ExtensibleTraitBitsetPopulation(self.config, pop.SquareLatticeFactory(self.config),
+                                                         traits.ExtensibleTraitFactory(self.config))
+        bitset_pop.initialize_population()
+        for nodename in self.pop.agentgraph.nodes():
+            bitset_pop.set_agent_traits(nodename, self.pop.get_agent_by_id(nodename)[1])
+
+        expected = analysis.klemm_normalized_L_extensible(self.pop, self.config)
+        self.assertAlmostEqual(expected, analysis.klemm_normalized_L_extensible(bitset_pop, self.config))
+
+    def test_edge_overlaps_match_edge_loop(self):
+        bitset_pop = pop.ExtensibleTraitBitsetPopulation(self.config, pop.SquareLatticeFactory(self.config),
+                                                         traits.ExtensibleTraitFactory(self.config))
+        bitset_pop.initialize_population()
+        for nodename in self.pop.agentgraph.nodes():
+            bitset_pop.set_agent_traits(nodename, self.pop.get_agent_by_id(nodename)[1])
+
+        (a, b) = analysis.get_edge_index_arrays(self.pop)
+        expected = [len(self.pop.agent_traits[i] & self.pop.agent_traits[j]) for (i, j) in zip(a, b)]
+        sizes = analysis.get_trait_set_sizes(self.pop)
+        self.assertEqual([len(t) for t in self.pop.agent_traits], list(sizes))
+        self.assertEqual(list(sizes), list(analysis.popcount_rows(bitset_pop.trait_bits)))
+
+        # small chunks, so that the edges are split over several of them
+        chunk_values = order_parameters.CHUNK_VALUES
+        try:
+            for values in [chunk_values, 7]:
+                order_parameters.CHUNK_VALUES = values
+                self.assertEqual(expected, list(analysis.calc_edge_overlaps_sets(self.pop.agent_traits, sizes, a, b)))
+                self.assertEqual(expected, list(analysis.calc_edge_overlaps_bitset(bitset_pop.trait_bits, a, b)))
+                self.assertEqual(list(sizes), list(analysis.popcount_rows(bitset_pop.trait_bits)))
+        finally:
+            order_parameters.CHUNK_VALUES = chunk_values
+
+    def test_popcount_rows(self):
+        words = np.random.randint(0, 2 ** 63, size=(50, 3)).astype(np.uint64) * np.uint64(2)
+        words[0, :] = np.uint64(2 ** 64 - 1)
+        words[1, :] = 0
+        expected = [sum(bin(int(w)).count('1') for w in row) for row in words]
+        self.assertEqual(expected, list(analysis.popcount_rows(words)))
+
 
 if __name__ == "__main__":
     unittest.main
\ No newline at end of file
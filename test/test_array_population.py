@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Description here
+
+"""
+
+import logging as log
+import unittest
+import madsenlab.axelrod.utils as utils
+import madsenlab.axelrod.population as pop
+import madsenlab.axelrod.traits as traits
+import madsenlab.axelrod.rules as rules
+import numpy as np
+import os
+import tempfile
+
+
+class FixedTraitArrayPopulationTest(unittest.TestCase):
+
+    def setUp(self):
+        log.basicConfig(level=log.DEBUG, format='%(asctime)s %(levelname)s: %(message)s')
+        self.tf = tempfile.NamedTemporaryFile(dir="/tmp", delete=False)
+        self.tf.write("""
+        {
+    "REPLICATIONS_PER_PARAM_SET" : 5,
+    "POPULATION_SIZES_STUDIED" : [500,1000],
+    "NUMBER_OF_DIMENSIONS_OR_FEATURES" : [1,2,4,8,16],
+    "NUMBER_OF_TRAITS_PER_DIMENSION" :  [2,3,4,6,8,12,16,32]
+}
+        """)
+        self.tf.flush()
+        config = utils.AxelrodConfiguration(self.tf.name)
+
+        config.popsize = 25
+        config.num_features = 4
+        config.num_traits = 3
+        config.periodic = 1
+        config.drift_rate = 0.1
+        self.config = config
+
+        graph_factory = pop.SquareLatticeFactory(config)
+        trait_factory = traits.AxelrodTraitFactory(config)
+        self.pop = pop.FixedTraitArrayPopulation(config, graph_factory, trait_factory)
+        self.pop.initialize_population()
+
+    def tearDown(self):
+        os.remove(self.tf.name)
+
+    def test_csr_matches_graph(self):
+        for nodename in self.pop.agentgraph.nodes():
+            expected = sorted(self.pop.agentgraph.neighbors(nodename))
+            obs = sorted(self.pop.get_all_neighbors_for_agent(nodename).tolist())
+            self.assertEqual(expected, obs)
+
+    def test_node_traits_are_matrix_views(self):
+        (agent_id, agent_traits) = self.pop.get_agent_by_id(7)
+        agent_traits[0] = 100000
+        self.assertEqual(100000, self.pop.agentgraph.node[7]['traits'][0])
+        self.assertEqual(100000, self.pop.traits[7, 0])
+
+    def test_random_neighbor(self):
+        for i in range(0, 100):
+            (agent_id, agent_traits) = self.pop.get_random_agent()
+            (neighbor_id, neighbor_traits) = self.pop.get_random_neighbor_for_agent(agent_id)
+            self.assertTrue(neighbor_id in self.pop.agentgraph.neighbors(agent_id))
+
+    def test_rules_step_on_matrix(self):
+        for rule in [rules.AxelrodRule(self.pop), rules.AxelrodDriftRule(self.pop)]:
+            self.assertTrue(rule.array_backed)
+            for timestep in range(1, 2000):
+                rule.step(timestep)
+
+        self.assertTrue(self.pop.get_interactions() > 0)
+        for nodename in self.pop.agentgraph.nodes():
+            self.assertTrue(np.array_equal(self.pop.traits[nodename], self.pop.agentgraph.node[nodename]['traits']))
+
+    def test_run_returns_last_timestep(self):
+        rule = rules.AxelrodRule(self.pop)
+        rule.batch_size = 128
+        last = rule.run(1, 1000)
+        self.assertEqual(1000, last)
+        self.assertTrue(self.pop.get_time_last_interaction() <= 1000)
+        for nodename in self.pop.agentgraph.nodes():
+            self.assertTrue(np.array_equal(self.pop.traits[nodename], self.pop.agentgraph.node[nodename]['traits']))
+
+    def test_run_matches_step_statistically(self):
+        initial = self.pop.traits.copy()
+        rule = rules.AxelrodRule(self.pop)
+        stepped = []
+        batched = []
+        for replicate in range(0, 20):
+            self.pop.traits[:] = initial
+            self.pop.interactions = 0
+            for timestep in range(1, 501):
+                rule.step(timestep)
+            stepped.append(self.pop.get_interactions())
+
+            self.pop.traits[:] = initial
+            self.pop.interactions = 0
+            rule.run(1, 500)
+            batched.append(self.pop.get_interactions())
+
+        log.info("mean interactions - step: %s run: %s", np.mean(stepped), np.mean(batched))
+        self.assertAlmostEqual(np.mean(stepped), np.mean(batched), delta=0.2 * np.mean(stepped))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Description here
+
+"""
+
+import logging as log
+import unittest
+import madsenlab.axelrod.utils as utils
+import madsenlab.axelrod.population as pop
+import madsenlab.axelrod.traits as traits
+import madsenlab.axelrod.rules as rules
+import madsenlab.axelrod.analysis as analysis
+import numpy as np
+import random
+import os
+import tempfile
+
+
+class BitsetTraitSetTest(unittest.TestCase):
+
+    def setUp(self):
+        log.basicConfig(level=log.DEBUG, format='%(asctime)s %(levelname)s: %(message)s')
+        self.tf = tempfile.NamedTemporaryFile(dir="/tmp", delete=False)
+        self.tf.write("""
+        {
+    "REPLICATIONS_PER_PARAM_SET" : 5,
+    "POPULATION_SIZES_STUDIED" : [500,1000],
+    "NUMBER_OF_DIMENSIONS_OR_FEATURES" : [1,2,4,8,16],
+    "NUMBER_OF_TRAITS_PER_DIMENSION" :  [2,3,4,6,8,12,16,32]
+}
+        """)
+        self.tf.flush()
+
+    def tearDown(self):
+        os.remove(self.tf.name)
+
+    def _random_pair(self, num_traits):
+        a = set(random.sample(range(0, num_traits), random.randint(0, 20)))
+        b = set(random.sample(range(0, num_traits), random.randint(0, 20)))
+        words = traits.bitset.num_words_for_traits(num_traits)
+        a_bits = traits.BitsetTraitSet.empty(words)
+        a_bits.update(a)
+        b_bits = traits.BitsetTraitSet.empty(words)
+        b_bits.update(b)
+        return (a, b, a_bits, b_bits)
+
+    def test_matches_builtin_set(self):
+        for i in range(0, 200):
+            (a, b, a_bits, b_bits) = self._random_pair(150)
+            self.assertEqual(a, set(a_bits))
+            self.assertEqual(len(a), len(a_bits))
+            self.assertEqual(a == b, a_bits == b_bits)
+            self.assertEqual(a.isdisjoint(b), a_bits.isdisjoint(b_bits))
+            self.assertEqual(a.issubset(b), a_bits.issubset(b_bits))
+            self.assertEqual(a.union(b), set(a_bits.union(b_bits)))
+            self.assertEqual(a.intersection(b), set(a_bits.intersection(b_bits)))
+            self.assertEqual(a - b, set(a_bits - b_bits))
+            self.assertEqual(a.difference(b), a_bits.difference(b))
+            self.assertEqual(a.symmetric_difference(b), set(a_bits.symmetric_difference(b_bits)))
+            self.assertAlmostEqual(analysis.calc_probability_interaction_extensible(a, b),
+                                   analysis.calc_probability_interaction_extensible(a_bits, b_bits))
+
+    def test_add_remove(self):
+        bits = traits.BitsetTraitSet.empty(2)
+        bits.add(0)
+        bits.add(63)
+        bits.add(64)
+        bits.add(127)
+        self.assertEqual([0, 63, 64, 127], list(bits))
+        bits.remove(63)
+        bits.discard(100)
+        self.assertRaises(KeyError, bits.remove, 100)
+        self.assertEqual(set([0, 64, 127]), bits)
+        self.assertFalse(200 in bits)
+        self.assertFalse(-1 in bits)
+        self.assertEqual(1, len(random.sample(bits, 1)))
+
+    def test_treestructured_population(self):
+        config = utils.TreeStructuredConfiguration(self.tf.name)
+        config.popsize = 25
+        config.maxtraits = 4
+        config.num_trees = 4
+        config.branching_factor = 2
+        config.depth_factor = 3
+        config.learning_rate = 0.2
+        config.loss_rate = 0.01
+        config.innov_rate = 0.01
+        config.periodic = 1
+        model = pop.TreeTraitBitsetPopulation(config, pop.SquareLatticeFactory(config),
+                                              traits.MultipleBalancedTreeStructuredTraitFactory(config))
+        model.initialize_population()
+        rule = rules.MultipleTreePrerequisitesLearningCopyingRule(model)
+        for timestep in range(1, 3000):
+            rule.step(timestep)
+
+        self.assertTrue(model.get_interactions() > 0)
+        for agent_id in range(0, model.num_agents):
+            self.assertEqual(list(traits.bitset.iter_set_bits(model.trait_bits[agent_id])),
+                             sorted(model.agent_traits[agent_id]))
+        incremental = set(rule.active_link_set)
+        rule.full_update_link_cache()
+        self.assertEqual(incremental, set(rule.active_link_set))
+
+        counts = analysis.get_culture_count_map(model)
+        distinct = set(frozenset(model.agentgraph.node[n]['traits']) for n in model.agentgraph.nodes())
+        self.assertEqual(len(distinct), len(counts))
+        analysis.klemm_normalized_L_extensible(model, config)
+        analyzer = analysis.PopulationTraitFrequencyAnalyzer(model)
+        analyzer.calculate_trait_frequencies()
+        self.assertTrue(analyzer.get_trait_richness() > 0)
+
+    def test_extensible_population(self):
+        config = utils.AxelrodExtensibleConfiguration(self.tf.name)
+        config.popsize = 25
+        config.maxtraits = 4
+        config.add_rate = 0.1
+        config.max_trait_value = 10
+        config.periodic = 1
+        model = pop.ExtensibleTraitBitsetPopulation(config, pop.SquareLatticeFactory(config),
+                                                    traits.ExtensibleTraitFactory(config))
+        model.initialize_population()
+        rule = rules.ExtensibleAxelrodRule(model)
+        for timestep in range(1, 3000):
+            rule.step(timestep)
+
+        self.assertTrue(model.get_interactions() > 0)
+        for n in model.agentgraph.nodes():
+            self.assertEqual(list(traits.bitset.iter_set_bits(model.trait_bits[n])),
+                             sorted(model.agentgraph.node[n]['traits']))
+
+    def test_trait_bitmap_encoding(self):
+        for i in range(0, 50):
+            (a, b, a_bits, b_bits) = self._random_pair(200)
+            self.assertEqual(traits.decode_trait_bitmap(traits.encode_trait_bitmap(a, 200)), sorted(a))
+            self.assertEqual(traits.encode_trait_bitmap(a_bits, 200), traits.encode_trait_bitmap(a, 200))
+        self.assertEqual(traits.decode_trait_bitmap(traits.encode_trait_bitmap(set(), 200)), [])
+
+    def test_compact_trait_forest(self):
+        config = utils.TreeStructuredConfiguration(self.tf.name)
+        config.popsize = 25
+        config.maxtraits = 4
+        config.num_trees = 4
+        config.branching_factor = 2
+        config.depth_factor = 3
+        config.periodic = 1
+        for constructor in [pop.TreeTraitStructurePopulation, pop.TreeTraitBitsetPopulation]:
+            model = constructor(config, pop.SquareLatticeFactory(config),
+                                traits.MultipleBalancedTreeStructuredTraitFactory(config))
+            model.initialize_population()
+            record = dict(branching_factor=2, depth_factor=3, num_trait_trees=4)
+            for n in model.agentgraph.nodes():
+                agent_traits = model.agentgraph.node[n]['traits']
+                entry = dict(cultureid=str(n), bitmap=model.trait_universe.get_trait_bitmap_for_culture(agent_traits))
+                compact = traits.CompactTraitForest.from_record(record, entry)
+                self.assertEqual(compact.get_traits(), sorted(agent_traits))
+                expected = model.trait_universe.get_trait_forest_from_traits(agent_traits)
+                graph = compact.get_graph()
+                self.assertEqual(sorted(graph.nodes()), sorted(expected.nodes()))
+                self.assertEqual(sorted(tuple(sorted(e)) for e in graph.edges()),
+                                 sorted(tuple(sorted(e)) for e in expected.edges()))
+                self.assertTrue(len(entry['bitmap']) < len(compact.get_graphml()))
+
+            # records saved before the compact encoding still carry GraphML
+            old_record = dict(culture_graphml_repr=[dict(cultureid='0', content=compact.get_graphml())])
+            self.assertEqual(len(utils.get_trait_graphs_for_record(old_record)[0]), len(compact.get_traits()))
+            new_record = dict(record, culture_trait_bitmaps=[entry])
+            self.assertEqual(sorted(utils.get_trait_graphs_for_record(new_record)[0].nodes()), compact.get_traits())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Description here
+
+"""
+
+import logging as log
+import unittest
+import madsenlab.axelrod.utils as utils
+import madsenlab.axelrod.population as pop
+import madsenlab.axelrod.traits as traits
+import madsenlab.axelrod.rules as rules
+import os
+import tempfile
+
+
+class CheckpointTest(unittest.TestCase):
+
+    def setUp(self):
+        log.basicConfig(level=log.DEBUG, format='%(asctime)s %(levelname)s: %(message)s')
+        self.tf = tempfile.NamedTemporaryFile(dir="/tmp", delete=False)
+        self.tf.write("""
+        {
+    "REPLICATIONS_PER_PARAM_SET" : 5,
+    "POPULATION_SIZES_STUDIED" : [500,1000],
+    "NUMBER_OF_DIMENSIONS_OR_FEATURES" : [1,2,4,8,16],
+    "NUMBER_OF_TRAITS_PER_DIMENSION" :  [2,3,4,6,8,12,16,32]
+}
+        """)
+        self.tf.flush()
+        self.checkpoint = tempfile.NamedTemporaryFile(dir="/tmp", suffix=".npz", delete=False)
+        self.checkpoint.close()
+
+    def tearDown(self):
+        os.remove(self.tf.name)
+        os.remove(self.checkpoint.name)
+
+    def _treestructured_config(self):
+        config = utils.TreeStructuredConfiguration(self.tf.name)
+        config.popsize = 25
+        config.maxtraits = 4
+        config.num_trees = 4
+        config.branching_factor = 2
+        config.depth_factor = 3
+        config.learning_rate = 0.2
+        config.loss_rate = 0.05
+        config.innov_rate = 0.05
+        config.periodic = 1
+        config.sim_id = "urn:test:original"
+        return config
+
+    def _build(self, constructor, config):
+        model = constructor(config, pop.SquareLatticeFactory(config),
+                            traits.MultipleBalancedTreeStructuredTraitFactory(config))
+        model.initialize_population()
+        rule = rules.MultipleTreePrerequisitesLearningCopyingRule(model)
+        return (model, rule)
+
+    def _state(self, model, rule):
+        agent_traits = [sorted(model.agentgraph.node[a]['traits']) for a in model.agentgraph.nodes()]
+        counters = (model.get_interactions(), model.get_innovations(), model.get_losses(), model.get_time_last_interaction())
+        return (agent_traits, counters, list(rule.active_link_set))
+
+    def test_round_trip(self):
+        for constructor in [pop.TreeTraitStructurePopulation, pop.TreeTraitBitsetPopulation]:
+            config = self._treestructured_config()
+            (model, rule) = self._build(constructor, config)
+            for timestep in range(1, 1000):
+                rule.step(timestep)
+            utils.save_checkpoint(self.checkpoint.name, model, rule, 999)
+
+            config2 = self._treestructured_config()
+            config2.sim_id = "urn:test:new"
+            (model2, rule2) = self._build(constructor, config2)
+            self.assertEqual(utils.load_checkpoint(self.checkpoint.name, model2, rule2), 999)
+            self.assertEqual(self._state(model, rule), self._state(model2, rule2))
+            self.assertEqual(config2.sim_id, "urn:test:original")
+
+    def test_resumed_run_matches_continuous_run(self):
+        for constructor in [pop.TreeTraitStructurePopulation, pop.TreeTraitBitsetPopulation,
+                            pop.TreeTraitIndexedPopulation, pop.TreeTraitInternedPopulation]:
+            config = self._treestructured_config()
+            (model, rule) = self._build(constructor, config)
+            for timestep in range(1, 1000):
+                rule.step(timestep)
+            utils.save_checkpoint(self.checkpoint.name, model, rule, 999)
+            for timestep in range(1000, 2000):
+                rule.step(timestep)
+
+            (model2, rule2) = self._build(constructor, self._treestructured_config())
+            resumed = utils.load_checkpoint(self.checkpoint.name, model2, rule2)
+            for timestep in range(resumed + 1, 2000):
+                rule2.step(timestep)
+            self.assertEqual(self._state(model, rule)[0:2], self._state(model2, rule2)[0:2])
+
+    def test_indexed_order_restored(self):
+        config = self._treestructured_config()
+        (model, rule) = self._build(pop.TreeTraitIndexedPopulation, config)
+        for timestep in range(1, 1000):
+            rule.step(timestep)
+        utils.save_checkpoint(self.checkpoint.name, model, rule, 999)
+
+        (model2, rule2) = self._build(pop.TreeTraitIndexedPopulation, self._treestructured_config())
+        utils.load_checkpoint(self.checkpoint.name, model2, rule2)
+        for agent_id in range(0, model.num_agents):
+            self.assertEqual(model.agent_traits[agent_id], model2.agent_traits[agent_id])
+            self.assertEqual(list(model.trait_index[agent_id]), list(model2.trait_index[agent_id]))
+
+    def test_mismatched_trait_universe(self):
+        config = self._treestructured_config()
+        (model, rule) = self._build(pop.TreeTraitBitsetPopulation, config)
+        utils.save_checkpoint(self.checkpoint.name, model, rule, 0)
+
+        config2 = self._treestructured_config()
+        config2.depth_factor = 2
+        (model2, rule2) = self._build(pop.TreeTraitBitsetPopulation, config2)
+        self.assertRaises(ValueError, utils.load_checkpoint, self.checkpoint.name, model2, rule2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Description here
+
+"""
+
+import logging as log
+import unittest
+import madsenlab.axelrod.utils as utils
+import madsenlab.axelrod.population as pop
+import madsenlab.axelrod.population.base_population_classes as bpc
+import madsenlab.axelrod.traits as traits
+import madsenlab.axelrod.rules as rules
+import numpy as np
+import networkx as nx
+import os
+import tempfile
+
+
+class CSRPopulationTest(unittest.TestCase):
+
+    def setUp(self):
+        log.basicConfig(level=log.DEBUG, format='%(asctime)s %(levelname)s: %(message)s')
+        self.tf = tempfile.NamedTemporaryFile(dir="/tmp", delete=False)
+        self.tf.write("""
+        {
+    "REPLICATIONS_PER_PARAM_SET" : 5,
+    "POPULATION_SIZES_STUDIED" : [500,1000],
+    "NUMBER_OF_DIMENSIONS_OR_FEATURES" : [1,2,4,8,16],
+    "NUMBER_OF_TRAITS_PER_DIMENSION" :  [2,3,4,6,8,12,16,32]
+}
+        """)
+        self.tf.flush()
+
+        config = utils.AxelrodExtensibleConfiguration(self.tf.name)
+        config.popsize = 25
+        config.maxtraits = 4
+        config.add_rate = 0.1
+        config.max_trait_value = 10
+        config.periodic = 1
+        config.ws_rewiring = 0.2
+        self.config = config
+
+    def tearDown(self):
+        os.remove(self.tf.name)
+
+    def test_edge_table(self):
+        table = bpc.compile_edge_table([(3, 1), (0, 2), (1, 3), (2, 1)])
+        self.assertEqual([[0, 2], [1, 2], [1, 3]], table.tolist())
+
+        (offsets, indices) = bpc.compile_csr_adjacency(5, table)
+        self.assertEqual([0, 1, 3, 5, 6, 6], offsets.tolist())
+        self.assertEqual([2, 2, 3, 0, 1, 1], indices.tolist())
+
+    def test_neighbors_match_graph(self):
+        for factory in [pop.SquareLatticeFactory(self.config), pop.WattsStrogatzSmallWorldFactory(self.config)]:
+            graph = factory.get_graph()
+            model = pop.ExtensibleTraitStructurePopulation(self.config, factory, traits.ExtensibleTraitFactory(self.config))
+            model.initialize_population()
+            self.assertEqual(model.num_edges, model.agentgraph.number_of_edges())
+            for agent_id in range(0, model.num_agents):
+                self.assertEqual(sorted(model.agentgraph.neighbors(agent_id)), model.get_all_neighbors_for_agent(agent_id))
+                self.assertEqual(len(model.agentgraph.neighbors(agent_id)), model.degrees[agent_id])
+                (neighbor_id, neighbor_traits) = model.get_random_neighbor_for_agent(agent_id)
+                self.assertTrue(model.agentgraph.has_edge(agent_id, neighbor_id))
+                self.assertTrue(neighbor_traits is model.agent_traits[neighbor_id])
+
+        # lattice positions survive the graph being released and rebuilt
+        self.assertEqual(sorted(nx.get_node_attributes(graph, 'pos').values()),
+                         sorted(nx.get_node_attributes(model.agentgraph, 'pos').values()))
+
+    def test_rebuilt_graph_follows_traits(self):
+        model = pop.ExtensibleTraitInternedPopulation(self.config, pop.SquareLatticeFactory(self.config),
+                                                      traits.ExtensibleTraitFactory(self.config))
+        model.initialize_population()
+        rule = rules.ExtensibleAxelrodRule(model)
+        graph = model.agentgraph
+        for timestep in range(1, 1000):
+            rule.step(timestep)
+        self.assertTrue(model.get_interactions() > 0)
+        # the built graph is kept, and its nodes follow the agents' traits
+        self.assertTrue(graph is model.agentgraph)
+        for agent_id in range(0, model.num_agents):
+            self.assertTrue(graph.node[agent_id]['traits'] is model.agent_traits[agent_id])
+
+        model.release_agentgraph()
+        model.set_agent_traits(0, set([1, 2]))
+        self.assertEqual(frozenset([1, 2]), model.agentgraph.node[0]['traits'])
+
+    def test_set_edges(self):
+        model = pop.ExtensibleTraitStructurePopulation(self.config, pop.SquareLatticeFactory(self.config),
+                                                       traits.ExtensibleTraitFactory(self.config))
+        model.initialize_population()
+        model.set_edges([(a, (a + 1) % model.num_agents) for a in range(0, model.num_agents)])
+        self.assertEqual(model.num_agents, model.num_edges)
+        self.assertEqual([1, 24], model.get_all_neighbors_for_agent(0))
+        self.assertTrue(np.all(model.degrees == 2))
+        self.assertEqual(model.num_agents, model.agentgraph.number_of_edges())
+
+
+if __name__ == "__main__":
+    unittest.main()
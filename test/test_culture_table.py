@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Description here
+
+"""
+
+import logging as log
+import unittest
+import madsenlab.axelrod.utils as utils
+import madsenlab.axelrod.population as pop
+import madsenlab.axelrod.traits as traits
+import madsenlab.axelrod.rules as rules
+import madsenlab.axelrod.analysis as analysis
+import madsenlab.axelrod.utils.sampling as sampling
+from collections import defaultdict
+import os
+import tempfile
+
+
+class CultureTableTest(unittest.TestCase):
+
+    def setUp(self):
+        log.basicConfig(level=log.DEBUG, format='%(asctime)s %(levelname)s: %(message)s')
+        self.tf = tempfile.NamedTemporaryFile(dir="/tmp", delete=False)
+        self.tf.write("""
+        {
+    "REPLICATIONS_PER_PARAM_SET" : 5,
+    "POPULATION_SIZES_STUDIED" : [500,1000],
+    "NUMBER_OF_DIMENSIONS_OR_FEATURES" : [1,2,4,8,16],
+    "NUMBER_OF_TRAITS_PER_DIMENSION" :  [2,3,4,6,8,12,16,32]
+}
+        """)
+        self.tf.flush()
+
+    def tearDown(self):
+        os.remove(self.tf.name)
+
+    def check_counts(self, model):
+        expected = defaultdict(int)
+        for agent_id in model.agentgraph.nodes():
+            agent_traits = model.agentgraph.node[agent_id]['traits']
+            self.assertTrue(agent_traits is model.culture_table.get_agent_record(agent_id).traits)
+            self.assertEqual(pop.get_trait_set_fingerprint(agent_traits), model.get_agent_culture(agent_id))
+            expected[model.get_traits_packed(agent_traits)] += 1
+        self.assertEqual(dict(expected), analysis.get_culture_count_map(model))
+        self.assertEqual(len(expected), len(model.culture_table))
+
+    def test_shared_records(self):
+        table = pop.CultureTable()
+        table.set_agent_traits(0, set([1, 2]))
+        table.set_agent_traits(1, [2, 1])
+        table.set_agent_traits(2, set([3]))
+        self.assertTrue(table.get_agent_record(0) is table.get_agent_record(1))
+        self.assertEqual(2, table.get_agent_record(0).count)
+        self.assertEqual(2, len(table))
+
+        # agent 2 moves to the culture of agents 0 and 1, and its old culture is dropped
+        table.replace_agent_trait(2, 3, 1)
+        table.add_agent_trait(2, 2)
+        self.assertTrue(table.get_agent_record(2) is table.get_agent_record(0))
+        self.assertEqual(3, table.get_agent_record(0).count)
+        self.assertEqual(1, len(table))
+
+        record = table.remove_agent_trait(0, 2)
+        self.assertEqual(frozenset([1]), record.traits)
+        self.assertEqual(pop.get_trait_set_fingerprint([1]), table[0])
+        self.assertEqual({table[0]: 1, table[1]: 2}, table.get_culture_count_map())
+        self.assertEqual(frozenset([1, 2]), table.get_traitset_map()[table[1]])
+
+    def test_tree_population(self):
+        config = utils.TreeStructuredConfiguration(self.tf.name)
+        config.popsize = 25
+        config.maxtraits = 4
+        config.num_trees = 4
+        config.branching_factor = 2
+        config.depth_factor = 3
+        config.learning_rate = 0.2
+        config.loss_rate = 0.05
+        config.innov_rate = 0.05
+        config.periodic = 1
+        model = pop.TreeTraitInternedPopulation(config, pop.SquareLatticeFactory(config),
+                                                traits.MultipleBalancedTreeStructuredTraitFactory(config))
+        model.initialize_population()
+        self.check_counts(model)
+        observer = analysis.IncrementalPopulationStatistics(model)
+
+        rule = rules.MultipleTreePrerequisitesLearningCopyingRule(model)
+        for timestep in range(1, 3000):
+            rule.step(timestep)
+        self.assertTrue(model.get_innovations() > 0 and model.get_losses() > 0)
+        self.check_counts(model)
+        self.assertEqual(analysis.get_culture_count_map(model), observer.get_culture_count_map())
+        traitsets = sampling.get_traitset_map(model)
+        for agent_id in model.agentgraph.nodes():
+            self.assertEqual(traitsets[model.get_agent_culture(agent_id)], model.agentgraph.node[agent_id]['traits'])
+
+        # traits stored from outside the rules, as by a checkpoint restore, are interned too
+        model.set_agent_traits(0, set(model.agentgraph.node[1]['traits']))
+        self.assertTrue(model.agentgraph.node[0]['traits'] is model.agentgraph.node[1]['traits'])
+        self.check_counts(model)
+
+    def test_extensible_population(self):
+        config = utils.AxelrodExtensibleConfiguration(self.tf.name)
+        config.popsize = 25
+        config.maxtraits = 4
+        config.add_rate = 0.1
+        config.max_trait_value = 10
+        config.periodic = 1
+        model = pop.ExtensibleTraitInternedPopulation(config, pop.SquareLatticeFactory(config),
+                                                      traits.ExtensibleTraitFactory(config))
+        model.initialize_population()
+        rule = rules.ExtensibleAxelrodRule(model)
+        for timestep in range(1, 3000):
+            rule.step(timestep)
+        self.assertTrue(model.get_interactions() > 0)
+        self.check_counts(model)
+        self.assertEqual(len(analysis.get_culture_counts_dbformat(model)), len(model.culture_table))
+
+
+if __name__ == "__main__":
+    unittest.main()
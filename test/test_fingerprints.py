@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Description here
+
+"""
+
+import logging as log
+import unittest
+import madsenlab.axelrod.utils as utils
+import madsenlab.axelrod.population as pop
+import madsenlab.axelrod.traits as traits
+import madsenlab.axelrod.rules as rules
+import madsenlab.axelrod.analysis as analysis
+import os
+import tempfile
+
+
+class CultureFingerprintTest(unittest.TestCase):
+
+    def setUp(self):
+        log.basicConfig(level=log.DEBUG, format='%(asctime)s %(levelname)s: %(message)s')
+        self.tf = tempfile.NamedTemporaryFile(dir="/tmp", delete=False)
+        self.tf.write("""
+        {
+    "REPLICATIONS_PER_PARAM_SET" : 5,
+    "POPULATION_SIZES_STUDIED" : [500,1000],
+    "NUMBER_OF_DIMENSIONS_OR_FEATURES" : [1,2,4,8,16],
+    "NUMBER_OF_TRAITS_PER_DIMENSION" :  [2,3,4,6,8,12,16,32]
+}
+        """)
+        self.tf.flush()
+
+    def tearDown(self):
+        os.remove(self.tf.name)
+
+    def _treestructured_config(self):
+        config = utils.TreeStructuredConfiguration(self.tf.name)
+        config.popsize = 25
+        config.maxtraits = 4
+        config.num_trees = 4
+        config.branching_factor = 2
+        config.depth_factor = 3
+        config.learning_rate = 0.2
+        config.loss_rate = 0.05
+        config.innov_rate = 0.05
+        config.periodic = 1
+        return config
+
+    def test_stable_values(self):
+        # fingerprints must not change between processes or releases, since they are stored as culture ID's
+        self.assertEqual(16461413153285654432, pop.get_trait_set_fingerprint([0, 1, 2]))
+        self.assertEqual(12502588860892328204, pop.get_trait_list_fingerprint([3, 1, 4, 1]))
+        self.assertEqual(0, pop.get_trait_set_fingerprint(set()))
+
+    def test_representations_agree(self):
+        trait_list = [3, 17, 64, 65, 200]
+        bits = traits.BitsetTraitSet.empty(4)
+        bits.update(trait_list)
+        expected = pop.get_trait_set_fingerprint(set(trait_list))
+        self.assertEqual(expected, pop.get_trait_set_fingerprint(bits))
+        self.assertEqual(expected, pop.get_trait_set_fingerprint(traits.IndexedTraitSet(reversed(trait_list))))
+        self.assertNotEqual(expected, pop.get_trait_set_fingerprint(trait_list[1:]))
+
+        # the feature each trait belongs to matters in the original model
+        self.assertNotEqual(pop.get_trait_list_fingerprint([1, 2]), pop.get_trait_list_fingerprint([2, 1]))
+        self.assertNotEqual(pop.get_trait_list_fingerprint([1, 12]), pop.get_trait_list_fingerprint([11, 2]))
+
+    def test_tracker_follows_rules(self):
+        config = self._treestructured_config()
+        for constructor in [pop.TreeTraitStructurePopulation, pop.TreeTraitBitsetPopulation,
+                            pop.TreeTraitIndexedPopulation]:
+            model = constructor(config, pop.SquareLatticeFactory(config),
+                                traits.MultipleBalancedTreeStructuredTraitFactory(config))
+            model.initialize_population()
+            tracker = model.track_fingerprints()
+            self.assertTrue(model.track_fingerprints() is tracker)
+            rule = rules.MultipleTreePrerequisitesLearningCopyingRule(model)
+            for timestep in range(1, 3000):
+                rule.step(timestep)
+
+            self.assertTrue(model.get_innovations() > 0 and model.get_losses() > 0)
+            for agent_id in model.agentgraph.nodes():
+                agent_traits = model.agentgraph.node[agent_id]['traits']
+                self.assertEqual(model.get_traits_packed(agent_traits), model.get_agent_culture(agent_id))
+
+            counts = analysis.get_culture_count_map(model)
+            distinct = set(frozenset(model.agentgraph.node[n]['traits']) for n in model.agentgraph.nodes())
+            self.assertEqual(len(distinct), len(counts))
+
+    def test_extensible_tracker(self):
+        config = utils.AxelrodExtensibleConfiguration(self.tf.name)
+        config.popsize = 25
+        config.maxtraits = 4
+        config.add_rate = 0.1
+        config.max_trait_value = 10
+        config.periodic = 1
+        model = pop.ExtensibleTraitStructurePopulation(config, pop.SquareLatticeFactory(config),
+                                                       traits.ExtensibleTraitFactory(config))
+        model.initialize_population()
+        model.track_fingerprints()
+        rule = rules.ExtensibleAxelrodRule(model)
+        for timestep in range(1, 3000):
+            rule.step(timestep)
+        for agent_id in model.agentgraph.nodes():
+            self.assertEqual(model.get_traits_packed(model.agentgraph.node[agent_id]['traits']),
+                             model.get_agent_culture(agent_id))
+
+
+if __name__ == "__main__":
+    unittest.main()
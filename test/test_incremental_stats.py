@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Description here
+
+"""
+
+import logging as log
+import unittest
+import madsenlab.axelrod.utils as utils
+import madsenlab.axelrod.population as pop
+import madsenlab.axelrod.traits as traits
+import madsenlab.axelrod.rules as rules
+import madsenlab.axelrod.analysis as analysis
+import os
+import tempfile
+
+
+class IncrementalPopulationStatisticsTest(unittest.TestCase):
+
+    def setUp(self):
+        log.basicConfig(level=log.DEBUG, format='%(asctime)s %(levelname)s: %(message)s')
+        self.tf = tempfile.NamedTemporaryFile(dir="/tmp", delete=False)
+        self.tf.write("""
+        {
+    "REPLICATIONS_PER_PARAM_SET" : 5,
+    "POPULATION_SIZES_STUDIED" : [500,1000],
+    "NUMBER_OF_DIMENSIONS_OR_FEATURES" : [1,2,4,8,16],
+    "NUMBER_OF_TRAITS_PER_DIMENSION" :  [2,3,4,6,8,12,16,32]
+}
+        """)
+        self.tf.flush()
+
+    def tearDown(self):
+        os.remove(self.tf.name)
+
+    def _assert_matches_full_scan(self, model, observer):
+        self.assertEqual(analysis.get_culture_count_map(model), observer.get_culture_count_map())
+        self.assertEqual(sorted(analysis.get_culture_counts_dbformat(model)),
+                         sorted(observer.get_culture_counts_dbformat()))
+
+        (mean, sd) = analysis.get_num_traits_per_individual_stats(model)
+        (obs_mean, obs_sd) = observer.get_num_traits_per_individual_stats()
+        self.assertAlmostEqual(mean, obs_mean)
+        self.assertAlmostEqual(sd, obs_sd)
+
+        analyzer = analysis.PopulationTraitFrequencyAnalyzer(model)
+        analyzer.calculate_trait_frequencies()
+        self.assertEqual(analyzer.get_trait_frequencies(), observer.get_trait_frequencies())
+        self.assertEqual(analyzer.get_trait_richness(), observer.get_trait_richness())
+        self.assertEqual(sorted(analyzer.get_trait_spectrum()), sorted(observer.get_trait_spectrum()))
+
+    def _treestructured_config(self):
+        config = utils.TreeStructuredConfiguration(self.tf.name)
+        config.popsize = 25
+        config.maxtraits = 4
+        config.num_trees = 4
+        config.branching_factor = 2
+        config.depth_factor = 3
+        config.learning_rate = 0.2
+        config.loss_rate = 0.05
+        config.innov_rate = 0.05
+        config.periodic = 1
+        return config
+
+    def test_treestructured_rule(self):
+        config = self._treestructured_config()
+        for constructor in [pop.TreeTraitStructurePopulation, pop.TreeTraitBitsetPopulation]:
+            model = constructor(config, pop.SquareLatticeFactory(config),
+                                traits.MultipleBalancedTreeStructuredTraitFactory(config))
+            model.initialize_population()
+            observer = analysis.IncrementalPopulationStatistics(model)
+            rule = rules.MultipleTreePrerequisitesLearningCopyingRule(model)
+            for timestep in range(1, 3000):
+                rule.step(timestep)
+                if timestep % 1000 == 0:
+                    self._assert_matches_full_scan(model, observer)
+
+    def test_extensible_rule(self):
+        config = utils.AxelrodExtensibleConfiguration(self.tf.name)
+        config.popsize = 25
+        config.maxtraits = 4
+        config.add_rate = 0.3
+        config.max_trait_value = 10
+        config.periodic = 1
+        model = pop.ExtensibleTraitStructurePopulation(config, pop.SquareLatticeFactory(config),
+                                                       traits.ExtensibleTraitFactory(config))
+        model.initialize_population()
+        observer = analysis.IncrementalPopulationStatistics(model)
+        rule = rules.ExtensibleAxelrodRule(model)
+        for timestep in range(1, 3000):
+            rule.step(timestep)
+        self._assert_matches_full_scan(model, observer)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Description here
+
+"""
+
+import logging as log
+import unittest
+import madsenlab.axelrod.utils as utils
+import madsenlab.axelrod.population as pop
+import madsenlab.axelrod.traits as traits
+import madsenlab.axelrod.rules as rules
+import madsenlab.axelrod.analysis as analysis
+import random
+import os
+import tempfile
+
+
+class IndexedTraitSetTest(unittest.TestCase):
+
+    def setUp(self):
+        log.basicConfig(level=log.DEBUG, format='%(asctime)s %(levelname)s: %(message)s')
+        self.tf = tempfile.NamedTemporaryFile(dir="/tmp", delete=False)
+        self.tf.write("""
+        {
+    "REPLICATIONS_PER_PARAM_SET" : 5,
+    "POPULATION_SIZES_STUDIED" : [500,1000],
+    "NUMBER_OF_DIMENSIONS_OR_FEATURES" : [1,2,4,8,16],
+    "NUMBER_OF_TRAITS_PER_DIMENSION" :  [2,3,4,6,8,12,16,32]
+}
+        """)
+        self.tf.flush()
+
+    def tearDown(self):
+        os.remove(self.tf.name)
+
+    def test_matches_builtin_set(self):
+        for i in range(0, 200):
+            a = set(random.sample(range(0, 50), random.randint(0, 20)))
+            b = set(random.sample(range(0, 50), random.randint(0, 20)))
+            a_idx = traits.IndexedTraitSet(a)
+            b_idx = traits.IndexedTraitSet(b)
+            self.assertEqual(a, set(a_idx))
+            self.assertEqual(len(a), len(a_idx))
+            self.assertEqual(a == b, a_idx == b_idx)
+            self.assertEqual(a == b, a_idx == b)
+            self.assertEqual(a.isdisjoint(b), a_idx.isdisjoint(b_idx))
+            self.assertEqual(a.issubset(b), a_idx.issubset(b_idx))
+            self.assertEqual(a.issuperset(b), a_idx.issuperset(b))
+            self.assertEqual(a.union(b), a_idx.union(b_idx))
+            self.assertEqual(a.intersection(b), a_idx.intersection(b_idx))
+            self.assertEqual(a - b, a_idx - b_idx)
+            self.assertEqual(a - b, a - b_idx)
+            self.assertEqual(a.difference(b), a_idx.difference(b))
+            self.assertEqual(a.symmetric_difference(b), a_idx.symmetric_difference(b_idx))
+            self.assertTrue(isinstance(a_idx - b_idx, traits.IndexedTraitSet))
+            self.assertEqual(hash(frozenset(a)), hash(frozenset(a_idx)))
+            self.assertAlmostEqual(analysis.calc_probability_interaction_extensible(a, b),
+                                   analysis.calc_probability_interaction_extensible(a_idx, b_idx))
+
+    def test_add_remove(self):
+        idx = traits.IndexedTraitSet([5, 7, 9])
+        idx.add(11)
+        idx.add(5)
+        idx.remove(7)
+        idx.discard(100)
+        self.assertRaises(KeyError, idx.remove, 100)
+        self.assertEqual(set([5, 9, 11]), idx)
+        self.assertEqual(3, len(idx))
+        self.assertEqual(set([5, 9, 11]), set(idx[i] for i in range(0, len(idx))))
+        copied = idx.copy()
+        copied.add(13)
+        self.assertFalse(13 in idx)
+
+    def test_random_trait(self):
+        idx = traits.IndexedTraitSet(range(0, 5))
+        counts = dict((t, 0) for t in range(0, 5))
+        for i in range(0, 5000):
+            counts[traits.get_random_trait(idx)] += 1
+        for t in range(0, 5):
+            self.assertTrue(800 < counts[t] < 1200)
+        self.assertTrue(traits.get_random_trait(set([3, 4])) in [3, 4])
+
+    def test_treestructured_population(self):
+        config = utils.TreeStructuredConfiguration(self.tf.name)
+        config.popsize = 25
+        config.maxtraits = 4
+        config.num_trees = 4
+        config.branching_factor = 2
+        config.depth_factor = 3
+        config.learning_rate = 0.2
+        config.loss_rate = 0.01
+        config.innov_rate = 0.01
+        config.periodic = 1
+        model = pop.TreeTraitIndexedPopulation(config, pop.SquareLatticeFactory(config),
+                                               traits.MultipleBalancedTreeStructuredTraitFactory(config))
+        model.initialize_population()
+        rule = rules.MultipleTreePrerequisitesLearningCopyingRule(model)
+        for timestep in range(1, 3000):
+            rule.step(timestep)
+
+        self.assertTrue(model.get_interactions() > 0)
+        self.assertTrue(model.get_losses() > 0)
+        self._check_index(model)
+        incremental = set(rule.active_link_set)
+        rule.full_update_link_cache()
+        self.assertEqual(incremental, set(rule.active_link_set))
+
+        counts = analysis.get_culture_count_map(model)
+        distinct = set(frozenset(model.agentgraph.node[n]['traits']) for n in model.agentgraph.nodes())
+        self.assertEqual(len(distinct), len(counts))
+
+        # stored trait sets, e.g. from a checkpoint, are indexed as they are stored
+        model.set_agent_traits(0, [0, 1])
+        self.assertEqual(set([0, 1]), model.agentgraph.node[0]['traits'])
+        self._check_index(model)
+
+    def test_extensible_population(self):
+        config = utils.AxelrodExtensibleConfiguration(self.tf.name)
+        config.popsize = 25
+        config.maxtraits = 4
+        config.add_rate = 0.1
+        config.max_trait_value = 10
+        config.periodic = 1
+        model = pop.ExtensibleTraitIndexedPopulation(config, pop.SquareLatticeFactory(config),
+                                                     traits.ExtensibleTraitFactory(config))
+        model.initialize_population()
+        rule = rules.ExtensibleAxelrodRule(model)
+        for timestep in range(1, 3000):
+            rule.step(timestep)
+
+        self.assertTrue(model.get_interactions() > 0)
+        self._check_index(model)
+
+    def _check_index(self, model):
+        for n in model.agentgraph.nodes():
+            agent_traits = model.agentgraph.node[n]['traits']
+            self.assertTrue(type(agent_traits) is set)
+            self.assertEqual(agent_traits, set(model.trait_index[n]))
+            self.assertEqual(len(agent_traits), len(model.trait_index[n]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Description here
+
+"""
+
+import logging as log
+import unittest
+import madsenlab.axelrod.utils as utils
+import madsenlab.axelrod.population as pop
+import madsenlab.axelrod.traits as traits
+import madsenlab.axelrod.rules as rules
+import os
+import tempfile
+
+
+class ActiveLinkCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        log.basicConfig(level=log.DEBUG, format='%(asctime)s %(levelname)s: %(message)s')
+        self.tf = tempfile.NamedTemporaryFile(dir="/tmp", delete=False)
+        self.tf.write("""
+        {
+    "REPLICATIONS_PER_PARAM_SET" : 5,
+    "POPULATION_SIZES_STUDIED" : [500,1000],
+    "NUMBER_OF_DIMENSIONS_OR_FEATURES" : [1,2,4,8,16],
+    "NUMBER_OF_TRAITS_PER_DIMENSION" :  [2,3,4,6,8,12,16,32]
+}
+        """)
+        self.tf.flush()
+
+    def tearDown(self):
+        os.remove(self.tf.name)
+
+    def _assert_cache_consistent(self, rule, steps):
+        for timestep in range(1, steps):
+            rule.step(timestep)
+        incremental = set(rule.active_link_set)
+        rule.full_update_link_cache()
+        self.assertEqual(rule.active_link_set, incremental)
+        self.assertAlmostEqual(rule.get_fraction_links_active(),
+                               float(len(incremental)) / rule.model.agentgraph.number_of_edges())
+
+    def _axelrod_config(self):
+        config = utils.AxelrodConfiguration(self.tf.name)
+        config.popsize = 25
+        config.num_features = 4
+        config.num_traits = 3
+        config.periodic = 1
+        config.drift_rate = 0.05
+        return config
+
+    def test_axelrod_rule(self):
+        config = self._axelrod_config()
+        for constructor in [pop.FixedTraitStructurePopulation, pop.FixedTraitArrayPopulation]:
+            model = constructor(config, pop.SquareLatticeFactory(config), traits.AxelrodTraitFactory(config))
+            model.initialize_population()
+            self._assert_cache_consistent(rules.AxelrodRule(model), 2000)
+            self._assert_cache_consistent(rules.AxelrodDriftRule(model), 2000)
+
+    def test_axelrod_rule_run(self):
+        config = self._axelrod_config()
+        model = pop.FixedTraitArrayPopulation(config, pop.SquareLatticeFactory(config), traits.AxelrodTraitFactory(config))
+        model.initialize_population()
+        rule = rules.AxelrodDriftRule(model)
+        rule.run(1, 2000)
+        self._assert_cache_consistent(rule, 1)
+
+    def test_extensible_rule(self):
+        config = utils.AxelrodExtensibleConfiguration(self.tf.name)
+        config.popsize = 25
+        config.maxtraits = 4
+        config.add_rate = 0.1
+        config.max_trait_value = 10
+        config.periodic = 1
+        model = pop.ExtensibleTraitStructurePopulation(config, pop.SquareLatticeFactory(config),
+                                                       traits.ExtensibleTraitFactory(config))
+        model.initialize_population()
+        self._assert_cache_consistent(rules.ExtensibleAxelrodRule(model), 2000)
+
+    def test_treestructured_rule(self):
+        config = utils.TreeStructuredConfiguration(self.tf.name)
+        config.popsize = 25
+        config.maxtraits = 4
+        config.num_trees = 4
+        config.branching_factor = 2
+        config.depth_factor = 3
+        config.learning_rate = 0.2
+        config.loss_rate = 0.01
+        config.innov_rate = 0.01
+        config.periodic = 1
+        model = pop.TreeTraitStructurePopulation(config, pop.SquareLatticeFactory(config),
+                                                 traits.MultipleBalancedTreeStructuredTraitFactory(config))
+        model.initialize_population()
+        self._assert_cache_consistent(rules.MultipleTreePrerequisitesLearningCopyingRule(model), 2000)
+
+
+if __name__ == "__main__":
+    unittest.main()
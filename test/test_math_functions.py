@@ -48,6 +48,18 @@ class MathFunctionsTest(unittest.TestCase):
 
         snk = stats.num_ordered_trees_by_leaves(n, k)
 
+    def test_trait_graph_symmetry_ratios(self):
+        # a cherry and a single vertex
+        r = stats.calculate_trait_graph_symmetry_ratios([1, 2, 1], 2.0, 2, 24.0 ** 5, False)
+        self.assertEqual(r['order'], 4)
+        self.assertAlmostEqual(r['msg_lambda'], 0.25)
+        self.assertAlmostEqual(r['msg_beta'], stats.ratio_order_automorphism_to_symmetric_group(2.0, 4))
+        self.assertAlmostEqual(r['mem_beta'], stats.ratio_log_order_automorphism_to_order_balanced_forest(2.0, 24.0 ** 5, 2, 4))
+
+        empty = stats.calculate_trait_graph_symmetry_ratios([], 1.0, 2, 24.0 ** 5, False)
+        self.assertEqual(empty['order'], 0)
+        self.assertEqual(empty['msg_lambda'], 0.0)
+
 
 
 if __name__ == "__main__":
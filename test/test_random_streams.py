@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Description here
+
+"""
+
+import logging as log
+import unittest
+import madsenlab.axelrod.utils as utils
+import madsenlab.axelrod.population as pop
+import madsenlab.axelrod.traits as traits
+import madsenlab.axelrod.rules as rules
+import os
+import tempfile
+
+
+class RandomStreamsTest(unittest.TestCase):
+
+    def setUp(self):
+        log.basicConfig(level=log.DEBUG, format='%(asctime)s %(levelname)s: %(message)s')
+        self.tf = tempfile.NamedTemporaryFile(dir="/tmp", delete=False)
+        self.tf.write("""
+        {
+    "REPLICATIONS_PER_PARAM_SET" : 5,
+    "POPULATION_SIZES_STUDIED" : [500,1000],
+    "NUMBER_OF_DIMENSIONS_OR_FEATURES" : [1,2,4,8,16],
+    "NUMBER_OF_TRAITS_PER_DIMENSION" :  [2,3,4,6,8,12,16,32]
+}
+        """)
+        self.tf.flush()
+
+    def tearDown(self):
+        os.remove(self.tf.name)
+
+    def _treestructured_config(self, sim_id, seed=None):
+        config = utils.TreeStructuredConfiguration(self.tf.name)
+        config.popsize = 25
+        config.maxtraits = 4
+        config.num_trees = 4
+        config.branching_factor = 2
+        config.depth_factor = 3
+        config.learning_rate = 0.2
+        config.loss_rate = 0.05
+        config.innov_rate = 0.05
+        config.periodic = 1
+        config.sim_id = sim_id
+        config.random_seed = seed
+        config.seed_random_streams()
+        return config
+
+    def _run(self, constructor, config):
+        model = constructor(config, pop.SquareLatticeFactory(config),
+                            traits.MultipleBalancedTreeStructuredTraitFactory(config))
+        model.initialize_population()
+        rule = rules.MultipleTreePrerequisitesLearningCopyingRule(model)
+        for timestep in range(1, 1000):
+            rule.step(timestep)
+        return [sorted(model.agentgraph.node[a]['traits']) for a in model.agentgraph.nodes()]
+
+    def test_seed_derived_from_sim_id(self):
+        config = self._treestructured_config("urn:uuid:1")
+        self.assertEqual(config.random_seed, utils.derive_seed("urn:uuid:1"))
+        self.assertNotEqual(config.random_seed, self._treestructured_config("urn:uuid:2").random_seed)
+        self.assertTrue(0 <= config.random_seed < 2 ** 63)
+
+        explicit = self._treestructured_config("urn:uuid:1", seed=42)
+        self.assertEqual(explicit.random_seed, 42)
+
+    def test_large_seed_masked(self):
+        config = self._treestructured_config("urn:uuid:1", seed=2 ** 64 + 42)
+        self.assertEqual(config.random_seed, 42)
+        self.assertTrue(0 <= self._treestructured_config("urn:uuid:1", seed=-1).random_seed < 2 ** 63)
+
+    def test_substreams_independent(self):
+        a = utils.get_random_stream(42, 'population').randint(0, 2 ** 30, size=10)
+        b = utils.get_random_stream(42, 'traits').randint(0, 2 ** 30, size=10)
+        c = utils.get_random_stream(43, 'population').randint(0, 2 ** 30, size=10)
+        a2 = utils.get_random_stream(42, 'population').randint(0, 2 ** 30, size=10)
+        self.assertEqual(list(a), list(a2))
+        self.assertNotEqual(list(a), list(b))
+        self.assertNotEqual(list(a), list(c))
+
+    def test_runs_reproducible(self):
+        for constructor in [pop.TreeTraitStructurePopulation, pop.TreeTraitBitsetPopulation]:
+            first = self._run(constructor, self._treestructured_config("urn:uuid:1"))
+            second = self._run(constructor, self._treestructured_config("urn:uuid:1"))
+            other = self._run(constructor, self._treestructured_config("urn:uuid:2"))
+            self.assertEqual(first, second)
+            self.assertNotEqual(first, other)
+
+
+if __name__ == "__main__":
+    unittest.main()
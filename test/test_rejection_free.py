@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Description here
+
+"""
+
+import logging as log
+import unittest
+import madsenlab.axelrod.utils as utils
+import madsenlab.axelrod.population as pop
+import madsenlab.axelrod.traits as traits
+import madsenlab.axelrod.rules as rules
+import numpy as np
+import copy
+import os
+import tempfile
+
+
+class RejectionFreeSchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        log.basicConfig(level=log.DEBUG, format='%(asctime)s %(levelname)s: %(message)s')
+        self.tf = tempfile.NamedTemporaryFile(dir="/tmp", delete=False)
+        self.tf.write("""
+        {
+    "REPLICATIONS_PER_PARAM_SET" : 5,
+    "POPULATION_SIZES_STUDIED" : [500,1000],
+    "NUMBER_OF_DIMENSIONS_OR_FEATURES" : [1,2,4,8,16],
+    "NUMBER_OF_TRAITS_PER_DIMENSION" :  [2,3,4,6,8,12,16,32]
+}
+        """)
+        self.tf.flush()
+        config = utils.AxelrodConfiguration(self.tf.name)
+        config.popsize = 25
+        config.num_features = 4
+        config.num_traits = 3
+        config.periodic = 1
+        self.config = config
+
+    def tearDown(self):
+        os.remove(self.tf.name)
+
+    def _axelrod_model(self):
+        model = pop.FixedTraitStructurePopulation(self.config, pop.SquareLatticeFactory(self.config),
+                                                  traits.AxelrodTraitFactory(self.config))
+        model.initialize_population()
+        return model
+
+    def test_link_weights_consistent(self):
+        rule = rules.AxelrodRule(self._axelrod_model())
+        scheduler = rules.RejectionFreeScheduler(rule)
+        timestep = 0
+        for i in range(0, 200):
+            timestep = scheduler.step(timestep + 1)
+            if timestep is None:
+                break
+
+        incremental = dict(rule.link_weights)
+        total = rule.total_link_weight
+        rule.full_update_link_cache()
+        self.assertEqual(set(incremental.keys()), set(rule.link_weights.keys()))
+        self.assertAlmostEqual(total, rule.total_link_weight)
+
+    def test_frozen_model_and_limit(self):
+        model = self._axelrod_model()
+        for nodename in model.agentgraph.nodes():
+            model.set_agent_traits(nodename, [0, 0, 0, 0])
+        rule = rules.AxelrodRule(model)
+        scheduler = rules.RejectionFreeScheduler(rule)
+        self.assertEqual(None, scheduler.step(1))
+
+        model.set_agent_traits(0, [0, 0, 1, 1])
+        rule.update_link_cache_for_agent(0, model.get_agent_by_id(0)[1])
+        self.assertTrue(scheduler.get_event_probability() > 0.0)
+        self.assertEqual(1, scheduler.step(1, limit=1))
+        self.assertTrue(scheduler.step(1, limit=1000000) <= 1000000)
+
+    def test_matches_step_statistically(self):
+        model = self._axelrod_model()
+        initial = copy.deepcopy([model.get_agent_by_id(n)[1] for n in model.agentgraph.nodes()])
+        stepped = []
+        scheduled = []
+        horizon = 2000
+        for replicate in range(0, 20):
+            for n in model.agentgraph.nodes():
+                model.set_agent_traits(n, list(initial[n]))
+            model.interactions = 0
+            rule = rules.AxelrodRule(model)
+            for timestep in range(1, horizon + 1):
+                rule.step(timestep)
+            stepped.append(model.get_interactions())
+
+            for n in model.agentgraph.nodes():
+                model.set_agent_traits(n, list(initial[n]))
+            model.interactions = 0
+            scheduler = rules.RejectionFreeScheduler(rules.AxelrodRule(model))
+            timestep = 0
+            while timestep is not None and timestep < horizon:
+                timestep = scheduler.step(timestep + 1, limit=horizon)
+            scheduled.append(model.get_interactions())
+
+        log.info("mean interactions - step: %s rejection-free: %s", np.mean(stepped), np.mean(scheduled))
+        self.assertAlmostEqual(np.mean(stepped), np.mean(scheduled), delta=0.2 * np.mean(stepped))
+
+    def test_treestructured_rule(self):
+        config = utils.TreeStructuredConfiguration(self.tf.name)
+        config.popsize = 25
+        config.maxtraits = 4
+        config.num_trees = 4
+        config.branching_factor = 2
+        config.depth_factor = 3
+        config.learning_rate = 0.2
+        config.loss_rate = 0.01
+        config.innov_rate = 0.01
+        config.periodic = 1
+        model = pop.TreeTraitStructurePopulation(config, pop.SquareLatticeFactory(config),
+                                                 traits.MultipleBalancedTreeStructuredTraitFactory(config))
+        model.initialize_population()
+        rule = rules.MultipleTreePrerequisitesLearningCopyingRule(model)
+        scheduler = rules.RejectionFreeScheduler(rule)
+        timestep = 0
+        while timestep < 5000:
+            timestep = scheduler.step(timestep + 1, limit=5000)
+
+        self.assertTrue(model.get_innovations() > 0)
+        incremental = set(rule.active_link_set)
+        total = rule.total_link_weight
+        rule.full_update_link_cache()
+        self.assertEqual(incremental, set(rule.active_link_set))
+        self.assertAlmostEqual(total, rule.total_link_weight)
+
+
+if __name__ == "__main__":
+    unittest.main()
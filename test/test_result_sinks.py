@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Description here
+
+"""
+
+
+import unittest
+import ming
+from ming.config import configure_from_nested_dict
+import madsenlab.axelrod.data as data
+import logging as log
+import os
+import tempfile
+import threading
+
+
+class ResultSinkTest(unittest.TestCase):
+
+    def setUp(self):
+        self.outfile = tempfile.NamedTemporaryFile(dir="/tmp", delete=False)
+        self.outfile.close()
+        os.remove(self.outfile.name)
+
+    def tearDown(self):
+        data.set_result_sink(None)
+        if os.path.exists(self.outfile.name):
+            os.remove(self.outfile.name)
+
+    def store_results(self):
+        data.store_simulation_timing("sim-1", "rule", "pop", "script.py", "test", 12.5, 1000)
+        data.store_stats_axelrod_treestructured(100, "sim-1", 4, 1.0, 0.01, 0.01, 4, 3, 3, "rule", "pop", "network",
+                                                "script.py", 2, [dict(popcount=60, numtraits=4)], 5000, 5000,
+                                                [dict(cultureid="a", count=60), dict(cultureid="b", count=40)], 0.5, 3.0, 1.0,
+                                                [], [dict(cultureid="a", order=4)], 4, 1.0, False, 0.0,
+                                                trait_bitmaps=[dict(cultureid="a", bitmap="\x0f\x00")], random_seed=2 ** 62)
+
+    def check_results(self):
+        results = list(data.read_result_file(self.outfile.name, data.document_classes))
+        self.assertEqual(len(results), 2)
+        by_class = dict((doc_class, doc) for (doc_class, doc) in results)
+
+        timing = by_class[data.SimulationTiming]
+        self.assertEqual(timing['simulation_run_id'], "sim-1")
+        self.assertEqual(timing['run_length'], 1000)
+        self.assertAlmostEqual(timing['elapsed_time'], 12.5)
+
+        stats = by_class[data.AxelrodStatsTreestructured]
+        self.assertEqual([c['count'] for c in stats['culture_counts']], [60, 40])
+        self.assertEqual(stats['trait_graph_stats'][0]['order'], 4)
+        self.assertEqual(str(stats['culture_trait_bitmaps'][0]['bitmap']), "\x0f\x00")
+        self.assertEqual(stats['random_seed'], 2 ** 62)
+        self.assertNotEqual(stats['_id'], timing['_id'])
+
+    def test_sqlite_sink(self):
+        data.configure_result_sink('sqlite', self.outfile.name, batch_size=10)
+        self.store_results()
+        data.get_result_sink().close()
+        self.check_results()
+
+    def test_ndjson_sink(self):
+        data.configure_result_sink('ndjson', self.outfile.name, batch_size=10)
+        self.store_results()
+        data.get_result_sink().close()
+        self.check_results()
+
+    def test_file_sink_without_database(self):
+        # Ming configured for a server which does not exist, as the simulation scripts used to do for every sink
+        data.set_experiment_name("test")
+        data.set_database_hostname("127.0.0.1")
+        data.set_database_port("1")
+        ming.configure(**data.getMingConfiguration(data.modules))
+        try:
+            data.configure_result_sink('ndjson', self.outfile.name, batch_size=10)
+            self.store_results()
+            data.get_result_sink().close()
+            self.check_results()
+        finally:
+            configure_from_nested_dict(dict())
+
+    def test_batching(self):
+        sink = data.configure_result_sink('ndjson', self.outfile.name, batch_size=3)
+        for i in range(5):
+            data.store_simulation_timing("sim-%s" % i, "rule", "pop", "script.py", "test", 1.0, i)
+        self.assertEqual(len(sink.pending), 2)
+        self.assertEqual(len(list(data.read_result_file(self.outfile.name, data.document_classes))), 3)
+        sink.flush()
+        self.assertEqual(len(list(data.read_result_file(self.outfile.name, data.document_classes))), 5)
+
+    def test_merge_sqlite_into_ndjson(self):
+        data.configure_result_sink('sqlite', self.outfile.name)
+        self.store_results()
+        data.get_result_sink().close()
+
+        merged = self.outfile.name + ".ndjson"
+        sink = data.configure_result_sink('ndjson', merged)
+        for (doc_class, doc) in data.read_result_file(self.outfile.name, data.document_classes):
+            sink.write(doc_class, doc)
+        sink.close()
+
+        original = sorted(str(doc['_id']) for (c, doc) in data.read_result_file(self.outfile.name, data.document_classes))
+        copied = sorted(str(doc['_id']) for (c, doc) in data.read_result_file(merged, data.document_classes))
+        os.remove(merged)
+        self.assertEqual(original, copied)
+
+    def test_background_sink(self):
+        data.configure_result_sink('sqlite', self.outfile.name, batch_size=10, background=True)
+        self.store_results()
+        data.get_result_sink().flush()
+        self.check_results()
+        data.get_result_sink().close()
+
+    def test_background_backpressure(self):
+        inner = BlockingSink()
+        sink = data.BufferedResultSink(inner, max_pending=2)
+        writer = threading.Thread(target=lambda: [sink.write(data.SimulationTiming, dict(run_length=i)) for i in range(6)])
+        writer.start()
+        writer.join(0.5)
+        # one document is held by the writer thread and two are queued, so the fourth write waits
+        self.assertTrue(writer.is_alive())
+        inner.release.set()
+        writer.join()
+        sink.close()
+        self.assertEqual([doc['run_length'] for doc in inner.written], range(6))
+
+    def test_background_error(self):
+        sink = data.BufferedResultSink(FailingSink())
+        sink.write(data.SimulationTiming, dict(run_length=1))
+        self.assertRaises(IOError, sink.flush)
+        sink.close()
+
+
+class BlockingSink(data.ResultSink):
+    def __init__(self):
+        super(BlockingSink, self).__init__()
+        self.release = threading.Event()
+        self.written = []
+
+    def _write_batch(self, doc_class, docs):
+        self.release.wait()
+        self.written.extend(docs)
+
+
+class FailingSink(data.ResultSink):
+    def _write_batch(self, doc_class, docs):
+        raise IOError("database unavailable")
+
+
+if __name__ == "__main__":
+    unittest.main()
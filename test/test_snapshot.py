@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Description here
+
+"""
+
+import logging as log
+import unittest
+import madsenlab.axelrod.utils as utils
+import madsenlab.axelrod.population as pop
+import madsenlab.axelrod.traits as traits
+import madsenlab.axelrod.rules as rules
+import madsenlab.axelrod.analysis as analysis
+import os
+import tempfile
+
+
+class PopulationSnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        log.basicConfig(level=log.DEBUG, format='%(asctime)s %(levelname)s: %(message)s')
+        self.tf = tempfile.NamedTemporaryFile(dir="/tmp", delete=False)
+        self.tf.write("""
+        {
+    "REPLICATIONS_PER_PARAM_SET" : 5,
+    "POPULATION_SIZES_STUDIED" : [500,1000],
+    "NUMBER_OF_DIMENSIONS_OR_FEATURES" : [1,2,4,8,16],
+    "NUMBER_OF_TRAITS_PER_DIMENSION" :  [2,3,4,6,8,12,16,32]
+}
+        """)
+        self.tf.flush()
+
+    def tearDown(self):
+        os.remove(self.tf.name)
+
+    def _treestructured_config(self):
+        config = utils.TreeStructuredConfiguration(self.tf.name)
+        config.popsize = 25
+        config.maxtraits = 4
+        config.num_trees = 4
+        config.branching_factor = 2
+        config.depth_factor = 3
+        config.learning_rate = 0.2
+        config.loss_rate = 0.05
+        config.innov_rate = 0.05
+        config.periodic = 1
+        return config
+
+    def _assert_matches_full_scan(self, model, config, snapshot):
+        self.assertEqual(analysis.get_culture_count_map(model), snapshot.culture_count_map)
+        self.assertEqual(sorted(analysis.get_culture_counts_dbformat(model)),
+                         sorted(snapshot.culture_counts_dbformat))
+        self.assertEqual(len(snapshot.culture_count_map), snapshot.get_num_cultures())
+
+        (mean, sd) = analysis.get_num_traits_per_individual_stats(model)
+        self.assertAlmostEqual(mean, snapshot.mean_traits)
+        self.assertAlmostEqual(sd, snapshot.sd_traits)
+
+        analyzer = analysis.PopulationTraitFrequencyAnalyzer(model)
+        analyzer.calculate_trait_frequencies()
+        self.assertEqual(analyzer.get_trait_frequencies(), snapshot.trait_frequencies)
+        self.assertEqual(analyzer.get_trait_richness(), snapshot.trait_richness)
+        self.assertEqual(sorted(analyzer.get_trait_spectrum()), sorted(snapshot.trait_spectrum))
+
+        self.assertAlmostEqual(analysis.klemm_normalized_L_extensible(model, config), snapshot.klemm)
+
+        for culture, traitset in snapshot.traitset_map.items():
+            self.assertEqual(culture, model.get_traits_packed(traitset))
+
+    def test_treestructured_snapshot(self):
+        config = self._treestructured_config()
+        for constructor in [pop.TreeTraitStructurePopulation, pop.TreeTraitBitsetPopulation]:
+            for use_observer in [False, True]:
+                model = constructor(config, pop.SquareLatticeFactory(config),
+                                    traits.MultipleBalancedTreeStructuredTraitFactory(config))
+                model.initialize_population()
+                observer = None
+                if use_observer:
+                    observer = analysis.IncrementalPopulationStatistics(model)
+                rule = rules.MultipleTreePrerequisitesLearningCopyingRule(model)
+                for timestep in range(1, 2000):
+                    rule.step(timestep)
+                snapshot = analysis.take_population_snapshot(model, config, observer)
+                self._assert_matches_full_scan(model, config, snapshot)
+
+
+if __name__ == "__main__":
+    unittest.main()
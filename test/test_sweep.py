@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Description here
+
+"""
+
+
+import unittest
+import madsenlab.axelrod.data as data
+import madsenlab.axelrod.utils as utils
+import logging as log
+import multiprocessing as mp
+import os
+import shutil
+import tempfile
+import time
+
+
+# tasks run by the sweeps below, which must be module level so the worker processes can find them
+
+attempt_dir = None
+
+
+def record_attempt(param_combination, replicate):
+    name = os.path.join(attempt_dir, "%s-%s" % ("-".join(str(p) for p in param_combination), replicate))
+    with open(name, 'a') as f:
+        f.write("x")
+    with open(name) as f:
+        return len(f.read())
+
+
+def succeed(param_combination, replicate):
+    record_attempt(param_combination, replicate)
+    return "sim-%s-%s" % (param_combination[0], replicate)
+
+
+def fail_first_attempt(param_combination, replicate):
+    if record_attempt(param_combination, replicate) == 1:
+        raise ValueError("first attempt fails")
+
+
+def fail_always(param_combination, replicate):
+    record_attempt(param_combination, replicate)
+    if param_combination[0] == 2:
+        raise ValueError("parameter 2 always fails")
+
+
+def run_too_long(param_combination, replicate):
+    record_attempt(param_combination, replicate)
+    if param_combination[0] == 2:
+        time.sleep(10)
+
+
+def claim_all(path, results):
+    queue = utils.SweepQueue(path, "test")
+    claimed = []
+    while True:
+        task = queue.claim()
+        if task is None:
+            break
+        claimed.append((task.parameters, task.replicate))
+        task.complete()
+    queue.close()
+    results.put(claimed)
+
+
+class SweepExecutorTest(unittest.TestCase):
+
+    def setUp(self):
+        global attempt_dir
+        attempt_dir = tempfile.mkdtemp(dir="/tmp")
+        self.outfile = os.path.join(attempt_dir, "results.ndjson")
+        data.configure_result_sink('ndjson', self.outfile)
+
+    def tearDown(self):
+        data.set_result_sink(None)
+        shutil.rmtree(attempt_dir)
+
+    def get_attempts(self):
+        attempts = dict()
+        for name in os.listdir(attempt_dir):
+            if name.endswith(".ndjson") or name.endswith(".db"):
+                continue
+            with open(os.path.join(attempt_dir, name)) as f:
+                attempts[name] = len(f.read())
+        return attempts
+
+    def get_stored_failures(self):
+        data.get_result_sink().close()
+        if not os.path.exists(self.outfile):
+            return []
+        return [doc for (doc_class, doc) in data.read_result_file(self.outfile, data.document_classes)
+                if doc_class == data.SweepFailure]
+
+    def test_all_tasks_run(self):
+        executor = utils.SweepExecutor([[1, 2, 3], [0.1, 0.2]], 2, succeed, processes=3, chunksize=2)
+        failures = executor.run()
+        self.assertEqual(failures, [])
+        self.assertEqual(executor.num_completed, 12)
+        attempts = self.get_attempts()
+        self.assertEqual(len(attempts), 12)
+        self.assertEqual(set(attempts.values()), set([1]))
+        self.assertEqual(self.get_stored_failures(), [])
+
+    def test_retry(self):
+        executor = utils.SweepExecutor([[1, 2]], 3, fail_first_attempt, processes=2, retries=1)
+        failures = executor.run()
+        self.assertEqual(failures, [])
+        self.assertEqual(executor.num_completed, 6)
+        self.assertEqual(set(self.get_attempts().values()), set([2]))
+
+    def test_failure_recorded(self):
+        executor = utils.SweepExecutor([[1, 2]], 2, fail_always, processes=2, retries=2,
+                                       experiment="test", script="test_sweep.py")
+        failures = executor.run()
+        self.assertEqual(executor.num_completed, 2)
+        self.assertEqual(len(failures), 2)
+        self.assertEqual(sorted(f['replicate'] for f in failures), [0, 1])
+        self.assertEqual(self.get_attempts()["2-0"], 3)
+
+        stored = self.get_stored_failures()
+        self.assertEqual(len(stored), 2)
+        self.assertEqual(stored[0]['parameters'], [2.0])
+        self.assertEqual(stored[0]['attempts'], 3)
+        self.assertEqual(stored[0]['experiment_name'], "test")
+        self.assertTrue(stored[0]['error'].startswith("ValueError"))
+        self.assertTrue("fail_always" in stored[0]['traceback'])
+
+    def test_timeout(self):
+        start = time.time()
+        executor = utils.SweepExecutor([[1, 2]], 1, run_too_long, processes=2, timeout=1, retries=0)
+        failures = executor.run()
+        self.assertTrue(time.time() - start < 8)
+        self.assertEqual(executor.num_completed, 1)
+        self.assertEqual(len(failures), 1)
+        self.assertTrue(failures[0]['error'].startswith("SweepTimeout"))
+
+    def test_ledger_skips_completed(self):
+        ledger = utils.SweepLedger(os.path.join(attempt_dir, "ledger.db"), "test")
+        ledger.mark_complete((1, 0.1), 0)
+        ledger.mark_complete((3, 0.2), 1, "sim-earlier")
+
+        executor = utils.SweepExecutor([[1, 2, 3], [0.1, 0.2]], 2, succeed, processes=2, ledger=ledger)
+        executor.run()
+        self.assertEqual(executor.num_completed, 10)
+        attempts = self.get_attempts()
+        self.assertFalse("1-0.1-0" in attempts)
+        self.assertFalse("3-0.2-1" in attempts)
+        self.assertEqual(len(attempts), 10)
+
+        self.assertEqual(len(ledger), 12)
+        self.assertEqual(ledger.count_completed((2, 0.1)), 2)
+        row = ledger.db.execute("SELECT simulation_run_id FROM sweep_ledger WHERE parameters = ? AND replicate = 1",
+                                (utils.get_parameter_key((2, 0.1)),)).fetchone()
+        self.assertEqual(row[0], "sim-2-1")
+
+        # everything is recorded, so running the sweep again runs nothing
+        executor = utils.SweepExecutor([[1, 2, 3], [0.1, 0.2]], 2, succeed, processes=2, ledger=ledger)
+        executor.run()
+        self.assertEqual(executor.num_completed, 0)
+        ledger.close()
+
+    def test_ledger_keys(self):
+        ledger = utils.SweepLedger(os.path.join(attempt_dir, "ledger.db"), "test")
+        ledger.mark_complete((100, 0.01, 4), 2)
+        # parameters parsed from the command line match those from the configuration file
+        self.assertTrue(ledger.is_complete([float("100"), float(str(0.01)), int("4")], 2))
+        self.assertFalse(ledger.is_complete((100, 0.01, 4), 1))
+        self.assertFalse(ledger.is_complete((100, 0.02, 4), 2))
+
+        # experiments sharing a ledger file are kept apart
+        other = utils.SweepLedger(os.path.join(attempt_dir, "ledger.db"), "other")
+        self.assertFalse(other.is_complete((100, 0.01, 4), 2))
+        self.assertEqual(len(other), 0)
+        other.close()
+        ledger.close()
+
+
+class SweepQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(dir="/tmp")
+        self.path = os.path.join(self.tmpdir, "queue.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def add_tasks(self, queue):
+        return queue.add_tasks(((p, 0.1), r, "run %s %s" % (p, r)) for p in range(0, 5) for r in range(0, 4))
+
+    def test_claim_and_complete(self):
+        queue = utils.SweepQueue(self.path, "test")
+        self.assertEqual(self.add_tasks(queue), 20)
+        # queueing the sweep again adds nothing
+        self.assertEqual(self.add_tasks(queue), 0)
+
+        task = queue.claim("w1")
+        self.assertEqual(task.param_combination, [0, 0.1])
+        self.assertEqual(task.replicate, 0)
+        self.assertEqual(task.command, "run 0 0")
+        self.assertEqual(task.attempt, 1)
+        self.assertTrue(task.renew())
+        self.assertTrue(task.complete("sim-1"))
+        counts = queue.get_counts()
+        self.assertEqual(counts['completed'], 1)
+        self.assertEqual(counts['pending'], 19)
+        queue.close()
+
+    def test_expired_lease(self):
+        queue = utils.SweepQueue(self.path, "test", lease_time=-1, max_attempts=2)
+        queue.add_tasks([((1, 0.1), 0, "run")])
+        first = queue.claim("w1")
+        # the first worker's lease has already expired, so the task can be claimed by another
+        second = queue.claim("w2")
+        self.assertEqual(second.attempt, 2)
+        self.assertFalse(first.renew())
+        self.assertFalse(first.complete())
+        # and after its last attempt's lease expires, it fails
+        self.assertEqual(queue.claim("w3"), None)
+        self.assertEqual(queue.get_counts()['failed'], 1)
+        queue.close()
+
+    def test_failed_task_retried(self):
+        queue = utils.SweepQueue(self.path, "test", max_attempts=2)
+        queue.add_tasks([((1, 0.1), 0, "run")])
+        queue.claim("w1").fail("exited with status 1")
+        task = queue.claim("w1")
+        self.assertEqual(task.attempt, 2)
+        task.fail("exited with status 1")
+        self.assertEqual(queue.claim("w1"), None)
+        self.assertEqual(queue.get_counts()['failed'], 1)
+        queue.close()
+
+    def test_concurrent_workers(self):
+        queue = utils.SweepQueue(self.path, "test")
+        self.add_tasks(queue)
+        queue.close()
+
+        results = mp.Queue()
+        workers = [mp.Process(target=claim_all, args=(self.path, results)) for i in range(0, 4)]
+        for worker in workers:
+            worker.start()
+        claimed = []
+        for worker in workers:
+            claimed.extend(results.get())
+        for worker in workers:
+            worker.join()
+        # every task was claimed exactly once
+        self.assertEqual(len(claimed), 20)
+        self.assertEqual(len(set(claimed)), 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Description here
+
+"""
+
+
+import unittest
+import madsenlab.axelrod.analysis as stats
+import madsenlab.axelrod.utils as utils
+import madsenlab.axelrod.utils.sampling as sampling
+import madsenlab.axelrod.population as pop
+import madsenlab.axelrod.traits as traits
+import networkx as nx
+import logging as log
+import os
+import tempfile
+
+
+class SymmetryCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tf = tempfile.NamedTemporaryFile(dir="/tmp", delete=False)
+        self.tf.write("""
+        {
+    "REPLICATIONS_PER_PARAM_SET" : 5,
+    "POPULATION_SIZES_STUDIED" : [500,1000],
+    "NUMBER_OF_DIMENSIONS_OR_FEATURES" : [1,2,4,8,16],
+    "NUMBER_OF_TRAITS_PER_DIMENSION" :  [2,3,4,6,8,12,16,32]
+}
+        """)
+        self.tf.flush()
+        self.dbfile = tempfile.NamedTemporaryFile(dir="/tmp", suffix=".sqlite", delete=False)
+        self.dbfile.close()
+
+    def tearDown(self):
+        os.remove(self.tf.name)
+        os.remove(self.dbfile.name)
+        utils.set_symmetry_cache(None)
+
+    def test_canonical_key_isomorphic_forests(self):
+        g1 = nx.Graph()
+        g1.add_edges_from([(0, 1), (0, 2), (2, 3), (10, 11)])
+        g2 = nx.Graph()
+        g2.add_edges_from([('x', 'y'), ('a', 'b'), ('b', 'c'), ('a', 'd')])
+        g3 = nx.path_graph(4)
+        g3.add_edge(10, 11)
+        g4 = nx.star_graph(3)
+        g4.add_edge(10, 11)
+
+        self.assertEqual(stats.get_forest_canonical_key(g1), stats.get_forest_canonical_key(g2))
+        self.assertEqual(stats.get_forest_canonical_key(g1), stats.get_forest_canonical_key(g3))
+        self.assertNotEqual(stats.get_forest_canonical_key(g1), stats.get_forest_canonical_key(g4))
+        self.assertEqual(stats.get_forest_canonical_key(nx.cycle_graph(4)), None)
+
+    def test_lru_eviction(self):
+        cache = stats.SymmetryStatisticsCache(maxsize=2)
+        cache.put('a', dict(v=1))
+        cache.put('b', dict(v=2))
+        self.assertEqual(cache.get('a'), dict(v=1))
+        cache.put('c', dict(v=3))
+        # 'b' was the least recently used
+        self.assertFalse('b' in cache)
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('a'), dict(v=1))
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.hits, 2)
+        self.assertEqual(cache.misses, 1)
+
+    def test_persistent_store(self):
+        cache = stats.SymmetryStatisticsCache(path=self.dbfile.name)
+        cache.put('forest', dict(autgroupsize=float("inf"), orbit_multiplicities=[1, 4, 16]))
+        cache.close()
+
+        other = stats.SymmetryStatisticsCache(path=self.dbfile.name)
+        entry = other.get('forest')
+        self.assertEqual(entry['orbit_multiplicities'], [1, 4, 16])
+        self.assertEqual(entry['autgroupsize'], float("inf"))
+        other.close()
+
+    def test_cached_tree_symmetries(self):
+        config = utils.TreeStructuredConfiguration(self.tf.name)
+        config.popsize = 25
+        config.maxtraits = 4
+        config.num_trees = 4
+        config.branching_factor = 2
+        config.depth_factor = 3
+        config.periodic = 1
+        model = pop.TreeTraitStructurePopulation(config, pop.SquareLatticeFactory(config),
+                                                 traits.MultipleBalancedTreeStructuredTraitFactory(config))
+        model.initialize_population()
+
+        cache = stats.SymmetryStatisticsCache()
+        utils.set_symmetry_cache(cache)
+        culture_count_map = stats.get_culture_count_map(model)
+        traitset_map = sampling.get_traitset_map(model)
+        for i in range(0, 2):
+            for culture, traitset in traitset_map.items():
+                r = sampling.get_tree_symmetries_for_traitset(model, config, culture, traitset, culture_count_map)
+                forest = model.trait_universe.get_trait_forest_from_traits(traitset)
+                expected = sampling.get_tree_shape_statistics(model, config, traitset, forest)
+                self.assertEqual(r['autgroupsize'], expected['autgroupsize'])
+                self.assertEqual(sorted(r['orbit_multiplicities']), sorted(expected['orbit_multiplicities']))
+                self.assertAlmostEqual(r['mean_radii'], expected['mean_radii'])
+                self.assertAlmostEqual(r['mean_degree'], expected['mean_degree'])
+                self.assertEqual(r['culture_count'], culture_count_map[culture])
+        self.assertTrue(cache.hits >= len(traitset_map))
+        self.assertTrue(len(cache) <= len(traitset_map))
+
+
+if __name__ == "__main__":
+    unittest.main()
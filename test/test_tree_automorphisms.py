@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Description here
+
+"""
+
+
+import unittest
+import madsenlab.axelrod.analysis as stats
+import madsenlab.axelrod.utils as utils
+import networkx as nx
+import logging as log
+import os
+import tempfile
+from distutils.spawn import find_executable
+
+
+class TreeAutomorphismTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tf = tempfile.NamedTemporaryFile(dir="/tmp", delete=False)
+        self.tf.write("""
+        {
+    "REPLICATIONS_PER_PARAM_SET" : 5,
+    "POPULATION_SIZES_STUDIED" : [500,1000],
+    "NUMBER_OF_DIMENSIONS_OR_FEATURES" : [1,2,4,8,16],
+    "NUMBER_OF_TRAITS_PER_DIMENSION" :  [2,3,4,6,8,12,16,32]
+}
+        """)
+        self.tf.flush()
+        self.sc = utils.TreeStructuredConfiguration(self.tf.name)
+        self.sc.branching_factor = 4
+        self.sc.depth_factor = 4
+        self.sc.num_trees = 1
+
+    def tearDown(self):
+        os.remove(self.tf.name)
+
+    def test_balanced_tree(self):
+        g = nx.balanced_tree(4, 4)
+        results = stats.calculate_forest_symmetries(g)
+        log.info("results: %s", results)
+        self.assertEqual(results['orbits'], 5)
+        self.assertEqual(results['orbitcounts'], [1, 4, 16, 64, 256])
+        self.assertAlmostEqual(results['groupsize'] / (24.0 ** 85), 1.0)
+
+    def test_bicentral_tree(self):
+        g = nx.path_graph(4)
+        results = stats.calculate_forest_symmetries(g)
+        self.assertEqual(results['orbitcounts'], [2, 2])
+        self.assertEqual(results['groupsize'], 2.0)
+
+        # the halves of the central edge differ, so only the leaves of the longer half can swap
+        g.add_edge(2, 4)
+        results = stats.calculate_forest_symmetries(g)
+        self.assertEqual(results['orbitcounts'], [1, 1, 1, 2])
+        self.assertEqual(results['groupsize'], 2.0)
+
+    def test_forest_with_isomorphic_components(self):
+        g = nx.Graph()
+        g.add_edges_from([(0, 1), (0, 2), (3, 4), (3, 5), (6, 7), (8, 9)])
+        g.add_node(10)
+        results = stats.calculate_forest_symmetries(g)
+        # two cherries (2 * 2 * 2!), two single edges (2 * 2 * 2!), and an isolated vertex
+        self.assertEqual(results['groupsize'], 64.0)
+        self.assertEqual(results['orbitcounts'], [2, 4, 4, 1])
+        self.assertEqual(results['orbits'], 4)
+
+    def test_mixed_components(self):
+        g = nx.Graph()
+        g.add_edges_from([(0, 1), (1, 2), (3, 4)])
+        results = stats.calculate_forest_symmetries(g)
+        self.assertEqual(results['orbitcounts'], [2, 1, 2])
+        self.assertEqual(results['groupsize'], 4.0)
+
+    def test_asymmetric_tree(self):
+        g = nx.read_adjlist("testdata/asymmetric-tree.adjlist", nodetype=int)
+        g = nx.convert_node_labels_to_integers(g)
+        results = stats.calculate_forest_symmetries(g)
+        self.assertEqual(len(results['orbitcounts']), 26)
+        self.assertEqual(sum(results['orbitcounts']), g.number_of_nodes())
+
+    def test_not_a_forest(self):
+        self.assertFalse(stats.is_forest(nx.cycle_graph(5)))
+        self.assertEqual(stats.calculate_forest_symmetries(nx.cycle_graph(5)), None)
+
+    def test_graph_symmetries_default_backend(self):
+        sym = stats.BalancedTreeAutomorphismStatistics(self.sc)
+        results = sym.calculate_graph_symmetries(nx.balanced_tree(4, 4))
+        self.assertEqual(results['orbits'], 5)
+        self.assertEqual(results['remainingdensity'], 1.0)
+
+    def test_unknown_backend(self):
+        self.assertRaises(ValueError, stats.BalancedTreeAutomorphismStatistics, self.sc, 'bliss')
+
+    @unittest.skipIf(find_executable('dreadnaut') is None, "dreadnaut is not on the path")
+    def test_matches_nauty(self):
+        sym = stats.BalancedTreeAutomorphismStatistics(self.sc, backend='nauty')
+        graphs = [nx.balanced_tree(3, 3), nx.path_graph(6),
+                  nx.read_adjlist("testdata/asymmetric-tree.adjlist", nodetype=int)]
+        for graph in graphs:
+            g = nx.convert_node_labels_to_integers(graph)
+            expected = sym.calculate_graph_symmetries(g)
+            results = stats.calculate_forest_symmetries(g)
+            self.assertTrue(sym._results_agree(results, expected))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -12,12 +12,15 @@ import unittest
 import madsenlab.axelrod.utils as utils
 import madsenlab.axelrod.traits as traits
 import madsenlab.axelrod.population as pop
+import madsenlab.axelrod.rules as rules
 import madsenlab.axelrod.analysis as analysis
 import networkx as nx
 import matplotlib.pyplot as plt
 import logging as log
 import pprint as pp
 import tempfile
+import random
+import numpy as np
 
 class TreeStructuredTraitTest(unittest.TestCase):
 
@@ -127,6 +130,40 @@ class TreeStructuredTraitTest(unittest.TestCase):
         log.info("mult tree path - expected: %s obs: %s", expected, path)
         self.assertEqual(expected,path)
 
+    def test_ancestor_tables_match_graph(self):
+        self.config.depth_factor = 3
+        self.config.branching_factor = 3
+        self.config.num_trees = 3
+
+        factory = traits.MultipleBalancedTreeStructuredTraitFactory(self.config)
+        trait_univ = factory.initialize_traits()
+        balanced_parents = trait_univ.parent_array.copy()
+        balanced_depths = trait_univ.depth_array.copy()
+        trait_univ._compile_ancestor_tables(trait_univ.roots)
+        self.assertEqual(balanced_parents.tolist(), trait_univ.parent_array.tolist())
+        self.assertEqual(balanced_depths.tolist(), trait_univ.depth_array.tolist())
+
+        for node in trait_univ.graph.nodes():
+            root = trait_univ._get_root_for_node(node)
+            if node == root:
+                self.assertEqual([], trait_univ.get_parents_for_node(node))
+                continue
+            expected = nx.all_simple_paths(trait_univ.graph, source=root, target=node).next()
+            expected.pop()
+            self.assertEqual(expected, trait_univ.get_parents_for_node(node))
+            self.assertEqual(len(expected), trait_univ.depth_array[node])
+
+    def test_deepest_missing_prereq(self):
+        self.config.depth_factor = 3
+        self.config.branching_factor = 2
+        self.config.num_trees = 2
+
+        factory = traits.MultipleBalancedTreeStructuredTraitFactory(self.config)
+        trait_univ = factory.initialize_traits()
+        self.assertFalse(trait_univ.has_prereq_for_trait(29, set([15, 17])))
+        self.assertEqual(21, trait_univ.get_deepest_missing_prereq_for_trait(29, set([15, 17])))
+        self.assertEqual(17, trait_univ.get_deepest_missing_prereq_for_trait(29, set([15, 21])))
+
     def test_prereq_mult_trees(self):
         self.config.depth_factor = 3
         self.config.branching_factor = 2
@@ -147,6 +184,70 @@ class TreeStructuredTraitTest(unittest.TestCase):
         for i in range(0, 10):
             log.info("example rand path: %s", trait_univ.get_random_trait_path())
 
+    def test_random_trait_not_in_set(self):
+        self.config.depth_factor = 3
+        self.config.branching_factor = 2
+        self.config.num_trees = 2
+        factory = traits.MultipleBalancedTreeStructuredTraitFactory(self.config)
+        trait_univ = factory.initialize_traits()
+        num_traits = trait_univ.graph.number_of_nodes()
+
+        # sparse agents are handled by rejection, and nearly complete agents by rank among the missing traits
+        for agent_traits in [set([0, 1, 2]), set(range(0, num_traits)) - set([5, 17, 29])]:
+            missing = set(range(0, num_traits)) - agent_traits
+            counts = dict()
+            for i in range(0, 3000):
+                trait = trait_univ.get_random_trait_not_in_set(agent_traits)
+                self.assertTrue(trait in missing)
+                counts[trait] = counts.get(trait, 0) + 1
+            if len(missing) == 3:
+                self.assertEqual(set(counts.keys()), missing)
+                for trait in missing:
+                    self.assertTrue(800 < counts[trait] < 1200)
+
+        # an agent with every trait still gets a trait from the universe
+        self.assertTrue(0 <= trait_univ.get_random_trait_not_in_set(set(range(0, num_traits))) < num_traits)
+
+    def test_missing_trait_by_rank(self):
+        agent_traits = set([0, 1, 3, 4, 8])
+        missing = [t for t in range(0, 12) if t not in agent_traits]
+        for rank in range(0, len(missing)):
+            self.assertEqual(missing[rank], traits.treestructured.get_missing_trait_by_rank(agent_traits, rank))
+
+    def test_missing_trait_tracker(self):
+        self.config.depth_factor = 3
+        self.config.branching_factor = 3
+        self.config.num_trees = 8
+        self.config.maxtraits = 6
+        self.config.popsize = 25
+        self.config.learning_rate = 0.2
+        self.config.loss_rate = 0.01
+        self.config.innov_rate = 0.05
+        self.config.periodic = 1
+        model = pop.TreeTraitStructurePopulation(self.config, pop.SquareLatticeFactory(self.config),
+                                                 traits.MultipleBalancedTreeStructuredTraitFactory(self.config))
+        model.initialize_population()
+        num_traits = model.trait_universe.graph.number_of_nodes()
+        tracker = model.track_missing_traits()
+        self.assertTrue(model.track_missing_traits() is tracker)
+
+        # an agent missing only a few traits, whose counts are kept by notification
+        model.set_agent_traits(0, set(range(0, num_traits)) - set([5, 17, num_traits - 1]))
+        tracker.rebuild()
+        rule = rules.MultipleTreePrerequisitesLearningCopyingRule(model)
+        for timestep in range(1, 2000):
+            rule.step(timestep)
+        self.assertTrue(model.get_innovations() > 0)
+
+        counts = [list(agent_counts) for agent_counts in tracker.counts]
+        tracker.rebuild()
+        self.assertEqual(counts, [list(agent_counts) for agent_counts in tracker.counts])
+        for agent_id in range(0, model.num_agents):
+            agent_traits = model.agent_traits[agent_id]
+            for rank in range(0, num_traits - len(agent_traits)):
+                self.assertEqual(traits.treestructured.get_missing_trait_by_rank(agent_traits, rank),
+                                 tracker.get_missing_trait_by_rank(agent_id, rank))
+
     def test_mult_tree_population(self):
         self.config.depth_factor = 3
         self.config.branching_factor = 3
@@ -162,6 +263,24 @@ class TreeStructuredTraitTest(unittest.TestCase):
 
         #self.pop.draw_network_colored_by_culture()
 
+    def test_initial_traits_from_trait_stream(self):
+        # initial trait paths depend only on the run's seed, not on the global generators
+        self.config.depth_factor = 3
+        self.config.branching_factor = 3
+        self.config.num_trees = 8
+        self.config.maxtraits = 6
+        self.config.popsize = 25
+        self.config.random_seed = 7
+        populations = []
+        for global_seed in [1, 2]:
+            np.random.seed(global_seed)
+            random.seed(global_seed)
+            model = pop.TreeTraitStructurePopulation(self.config, pop.SquareLatticeFactory(self.config),
+                                                     traits.MultipleBalancedTreeStructuredTraitFactory(self.config))
+            model.initialize_population()
+            populations.append(model.agent_traits)
+        self.assertEqual(populations[0], populations[1])
+
     def test_agent_disjointness_multtree(self):
         focal = set()
         focal.add((40, 41, 44, 53))